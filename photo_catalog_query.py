@@ -2,6 +2,7 @@
 
 import argparse
 import sqlite3
+import sys
 from pathlib import Path
 from typing import Optional
 
@@ -13,26 +14,26 @@ def connect_db(db_path: Path) -> sqlite3.Connection:
 
 
 def list_unprocessed_raws(conn: sqlite3.Connection):
-    cur = conn.cursor()
-    cur.execute("""
+    # The "no linked outputs" filter runs in SQLite; the table is written in one call
+    rows = conn.execute("""
         SELECT f.id, f.dest_path, m.capture_datetime, m.camera_model
         FROM files f
         LEFT JOIN media_metadata m ON f.id = m.file_id
         WHERE f.type = 'raw'
+          AND NOT EXISTS (SELECT 1 FROM raw_outputs ro WHERE ro.raw_file_id = f.id)
         ORDER BY m.capture_datetime
     """)
-    raws = cur.fetchall()
-
-    cur.execute("SELECT DISTINCT raw_file_id FROM raw_outputs")
-    linked_raw_ids = {row[0] for row in cur.fetchall()}
 
-    print("Unprocessed RAW files (no linked outputs):")
-    print("raw_id | capture_datetime        | camera_model              | dest_path")
-    print("-------+--------------------------+---------------------------+----------")
-    for raw_id, dest_path, capture_str, cam in raws:
-        if raw_id in linked_raw_ids:
-            continue
-        print(f"{raw_id:6d} | {(capture_str or '').ljust(24)} | {(cam or '').ljust(25)} | {dest_path or ''}")
+    lines = [
+        "Unprocessed RAW files (no linked outputs):",
+        "raw_id | capture_datetime        | camera_model              | dest_path",
+        "-------+--------------------------+---------------------------+----------",
+    ]
+    lines.extend(
+        f"{raw_id:6d} | {(capture_str or '').ljust(24)} | {(cam or '').ljust(25)} | {dest_path or ''}"
+        for raw_id, dest_path, capture_str, cam in rows
+    )
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def _resolve_raw_id_from_path(conn: sqlite3.Connection, path: Path) -> Optional[int]:
@@ -109,11 +110,16 @@ def list_unknown_files(conn: sqlite3.Connection):
         print("No files with type='other' found.")
         return
 
-    print("Files with unhandled type='other':")
-    print("id   | ext   | size_bytes | seed | first_seen           | last_seen            | orig_path")
-    print("-----+-------+------------+------+----------------------+----------------------+----------")
-    for fid, ext, orig_path, size_bytes, is_seed, first_seen, last_seen in rows:
-        print(f"{fid:4d} | {ext.ljust(5)} | {str(size_bytes or 0).rjust(10)} | {int(is_seed)}    | {first_seen or ''} | {last_seen or ''} | {orig_path}")
+    lines = [
+        "Files with unhandled type='other':",
+        "id   | ext   | size_bytes | seed | first_seen           | last_seen            | orig_path",
+        "-----+-------+------------+------+----------------------+----------------------+----------",
+    ]
+    lines.extend(
+        f"{fid:4d} | {ext.ljust(5)} | {str(size_bytes or 0).rjust(10)} | {int(is_seed)}    | {first_seen or ''} | {last_seen or ''} | {orig_path}"
+        for fid, ext, orig_path, size_bytes, is_seed, first_seen, last_seen in rows
+    )
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def parse_args():
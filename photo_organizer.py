@@ -1,19 +1,27 @@
 #!/usr/bin/env python
 
 import argparse
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import csv
+import errno
 import hashlib
 import logging
+import math
+import mmap
 import os
 import re
 import shutil
 import sqlite3
+import string
+import sys
 from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime, UTC
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple, Iterable, Set
+from typing import Optional, Dict, List, Tuple, Iterable, Iterator, Set, Union
 
 import exifread
 from PIL import Image
@@ -31,6 +39,11 @@ try:
 except ImportError:
     imagehash = None
 
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
 
 # ---------------------- CONFIG & CONSTANTS ----------------------
 
@@ -42,7 +55,35 @@ TIFF_EXTS = {'.tif', '.tiff'}
 
 SIDECAR_EXTS = {'.xmp', '.vrd', '.dop', '.dpp', '.pp3'}
 
+# One lookup per file in classify_extension; anything not listed is "other"
+EXT_TO_TYPE: Dict[str, str] = {
+    ext: ftype
+    for exts, ftype in (
+        (RAW_EXTS, "raw"),
+        (JPEG_EXTS, "jpeg"),
+        (VIDEO_EXTS, "video"),
+        (PSD_EXTS, "psd"),
+        (TIFF_EXTS, "tiff"),
+        (SIDECAR_EXTS, "sidecar"),
+    )
+    for ext in exts
+}
+
 DEFAULT_HASH_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB chunks to cut syscall overhead
+# "blake3" (SIMD) or "sha256", for NEW catalogs. BLAKE3 hashes are stored
+# with a "b3-" prefix so they never equal a SHA-256 hash. init_db records
+# each catalog's algorithm (catalog_meta) and switches this to it.
+HASH_ALGORITHM = "blake3"
+# Files at least this large are hashed from a read-only mapping (no copy
+# into Python buffers; BLAKE3 then also spreads the work across cores).
+MMAP_HASH_THRESHOLD = 8 * 1024 * 1024
+# Files whose size no other catalogued file shares cannot be duplicates, so
+# they get a quick "sz:<size>:<digest of first 4KB>" key instead of a full
+# hash. The first time a second file of that size shows up, the earlier
+# file is re-hashed in full (see upgrade_quick_hashes).
+SIZE_PREFILTER = True
+QUICK_HASH_BYTES = 4096
+QUICK_HASH_PREFIX = "sz:"
 
 DATE_TAGS = [
     'EXIF DateTimeOriginal',
@@ -71,7 +112,7 @@ class FileRecord:
     type: str               # raw/jpeg/video/psd/sidecar/tiff/other
     ext: str
     orig_name: str
-    orig_path: Path
+    orig_path: str          # as walked (scandir path string)
     size_bytes: int
     is_seed: bool
     name_score: int
@@ -83,18 +124,30 @@ class FileRecord:
     duration_sec: Optional[float] = None
     aspect_ratio: Optional[float] = None
     phash: Optional[str] = None
+    # (mtime_ns, hash, capture_datetime, camera, lens) when the file was read rather than cached
+    scan_cache_entry: Optional[Tuple[int, str, Optional[str], Optional[str], Optional[str]]] = None
 
 
 # ---------------------- UTILS ----------------------
 
+# CAMERA_PATTERNS as one alternation, and the other scoring regex, compiled once
+_CAMERA_NAME_RE = re.compile("|".join(f"(?:{pat})" for pat in CAMERA_PATTERNS))
+_COPY_WORD_RE = re.compile(r'\bcopy\b')
+# str.translate tables deleting ASCII letters / digits: the length difference counts them in C
+_DROP_ASCII_LETTERS = str.maketrans('', '', string.ascii_lowercase)
+_DROP_ASCII_DIGITS = str.maketrans('', '', string.digits)
+
+
+@lru_cache(maxsize=4096)
 def descriptiveness_score(stem: str) -> int:
+    """Memoised: a RAW, its JPEG and its sidecar share one stem."""
     s = stem.lower()
     score = 0
 
-    if any(re.match(pat, s) for pat in CAMERA_PATTERNS):
+    if _CAMERA_NAME_RE.match(s):
         score -= 5
 
-    if re.search(r'\bcopy\b', s):
+    if _COPY_WORD_RE.search(s):
         score -= 4  # de-prioritize copy/duplicate suffixes
 
     # word separators
@@ -103,8 +156,12 @@ def descriptiveness_score(stem: str) -> int:
     if '-' in s or '_' in s:
         score += 1
 
-    num_alpha = sum(c.isalpha() for c in s)
-    num_digit = sum(c.isdigit() for c in s)
+    if s.isascii():
+        num_alpha = len(s) - len(s.translate(_DROP_ASCII_LETTERS))
+        num_digit = len(s) - len(s.translate(_DROP_ASCII_DIGITS))
+    else:
+        num_alpha = sum(map(str.isalpha, s))
+        num_digit = sum(map(str.isdigit, s))
     if num_alpha > num_digit:
         score += 2
 
@@ -114,15 +171,36 @@ def descriptiveness_score(stem: str) -> int:
     return score
 
 
+def _new_hasher(multithreaded: bool = False):
+    """Returns (hash object, prefix for its hex digest) for HASH_ALGORITHM."""
+    if HASH_ALGORITHM == "blake3":
+        if multithreaded:
+            return blake3.blake3(max_threads=blake3.blake3.AUTO), "b3-"
+        return blake3.blake3(), "b3-"
+    return hashlib.sha256(), ""
+
+
+def _hash_mapped(fileobj) -> Optional[str]:
+    """
+    Hashes a large regular file through mmap, or returns None when the handle
+    is small, not a real file (pipe, BytesIO) or cannot be mapped.
+    """
+    try:
+        if not fileobj.seekable() or os.fstat(fileobj.fileno()).st_size < MMAP_HASH_THRESHOLD:
+            return None
+        with mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            h, prefix = _new_hasher(multithreaded=True)
+            h.update(mm)
+            return prefix + h.hexdigest()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
 def compute_file_hash(path: Path, chunk_size: int = DEFAULT_HASH_CHUNK_SIZE) -> str:
-    h = hashlib.sha256()
     with open(path, 'rb') as f:
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            h.update(chunk)
-    return h.hexdigest()
+        return compute_file_hash_from_handle(f, chunk_size)
 
 
 def compute_file_hash_from_handle(fileobj, chunk_size: int = DEFAULT_HASH_CHUNK_SIZE) -> str:
@@ -130,16 +208,39 @@ def compute_file_hash_from_handle(fileobj, chunk_size: int = DEFAULT_HASH_CHUNK_
     Compute hash using an existing open handle to avoid reopening the file.
     Caller should ensure the handle is at position 0.
     """
-    h = hashlib.sha256()
-    while True:
-        chunk = fileobj.read(chunk_size)
-        if not chunk:
-            break
-        h.update(chunk)
-    return h.hexdigest()
+    mapped = _hash_mapped(fileobj)
+    if mapped is not None:
+        return mapped
 
+    h, prefix = _new_hasher()
+    if not hasattr(fileobj, "readinto"):
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+        return prefix + h.hexdigest()
+
+    # One reused buffer, no bytes object per chunk. Below the mmap threshold
+    # the whole file usually fits, so size the buffer to it.
+    try:
+        chunk_size = min(chunk_size, max(os.fstat(fileobj.fileno()).st_size, 4096))
+    except (AttributeError, OSError, ValueError):
+        pass
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    while n := fileobj.readinto(buf):
+        h.update(view[:n])
+    return prefix + h.hexdigest()
 
-def fallback_file_datetime(path: Path) -> datetime:
+
+def compute_quick_hash_from_handle(fileobj, size_bytes: int) -> str:
+    """Size-tagged digest of the first QUICK_HASH_BYTES; only unique for a unique size."""
+    head = fileobj.read(QUICK_HASH_BYTES)
+    return f"{QUICK_HASH_PREFIX}{size_bytes}:{hashlib.sha256(head).hexdigest()}"
+
+
+def fallback_file_datetime(path: Union[str, Path]) -> datetime:
     ts = os.path.getmtime(path)
     return datetime.fromtimestamp(ts)
 
@@ -233,7 +334,7 @@ def parse_exif_datetime(dt_str: str) -> Optional[datetime]:
         return None
 
 
-def get_image_metadata_exif(path: Path, fileobj=None) -> Tuple[Optional[datetime], Optional[str], Optional[str]]:
+def get_image_metadata_exif(path: Union[str, Path], fileobj=None) -> Tuple[Optional[datetime], Optional[str], Optional[str]]:
     """Use exifread to get datetime, camera, lens (if any)."""
     tags = {}
     if fileobj is None:
@@ -313,13 +414,15 @@ def _parse_mediainfo_datetime(dt_str: Optional[str], is_local_hint: bool) -> Opt
     return dt.astimezone().replace(tzinfo=None)
 
 
-def get_video_metadata(path: Path) -> Tuple[Optional[datetime], Optional[float], Optional[str]]:
+def get_video_metadata(path: Union[str, Path]) -> Tuple[Optional[datetime], Optional[float], Optional[str]]:
     if MediaInfo is None:
         logging.info("pymediainfo not installed; skipping video metadata for %s", path)
         return None, None, None
 
     try:
-        media_info = MediaInfo.parse(path)
+        # parse_speed=0: container headers only. The General track's dates,
+        # duration and performer/encoder are all there; stream details are not needed.
+        media_info = MediaInfo.parse(path, parse_speed=0)
     except Exception as e:
         logging.warning("MediaInfo.parse failed for %s: %s", path, e)
         return None, None, None
@@ -355,11 +458,68 @@ def get_video_metadata(path: Path) -> Tuple[Optional[datetime], Optional[float],
     return dt, duration_sec, camera_model
 
 
-def compute_phash(path: Path) -> Optional[str]:
+# pHashes already in the catalog, by content hash, and per-path scan results
+# (hash and EXIF, valid while mtime and size match). Set per scan (and in each
+# scan worker process) so unchanged files are not read again.
+ScanCacheRow = Tuple[int, int, str, Optional[str], Optional[str], Optional[str]]
+_PHASH_CACHE: Dict[str, str] = {}
+_SCAN_CACHE: Dict[str, ScanCacheRow] = {}
+
+
+def _set_scan_caches(phash_cache: Dict[str, str], scan_cache: Dict[str, ScanCacheRow]):
+    global _PHASH_CACHE, _SCAN_CACHE
+    _PHASH_CACHE = phash_cache
+    _SCAN_CACHE = scan_cache
+
+
+def _init_scan_worker(hash_algorithm: str, phash_cache: Dict[str, str], scan_cache: Dict[str, ScanCacheRow]):
+    """Process pool initializer: spawned workers start from the module defaults."""
+    global HASH_ALGORITHM
+    HASH_ALGORITHM = hash_algorithm
+    _set_scan_caches(phash_cache, scan_cache)
+
+
+def load_phash_cache(conn: sqlite3.Connection) -> Dict[str, str]:
+    """hash -> phash for every catalogued file that has one."""
+    return dict(conn.execute("""
+        SELECT f.hash, m.phash
+        FROM files f
+        JOIN media_metadata m ON m.file_id = f.id
+        WHERE m.phash IS NOT NULL
+    """))
+
+
+def load_scan_cache(conn: sqlite3.Connection) -> Dict[str, ScanCacheRow]:
+    """path -> (mtime_ns, size, hash, capture_datetime, camera, lens) from earlier scans."""
+    return {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT path, mtime_ns, size, hash, capture_datetime, camera_model, lens_model FROM scan_cache"
+        )
+    }
+
+
+def _scan_cache_lookup(path: str, size_bytes: int, mtime_ns: int) -> Optional[Tuple[str, Optional[str], Optional[str], Optional[str]]]:
+    """(hash, capture_datetime, camera, lens) if the file is unchanged since it was cached."""
+    cached = _SCAN_CACHE.get(path)
+    if cached is None or cached[0] != mtime_ns or cached[1] != size_bytes:
+        return None
+    return cached[2:]
+
+
+# Smallest decode size requested from the JPEG draft mode (4x the 32px DCT input)
+_PHASH_DRAFT_SIZE = 128
+
+
+def compute_phash(path: Union[str, Path]) -> Optional[str]:
     if imagehash is None:
         return None
     try:
         with Image.open(path) as im:
+            # pHash only looks at a 32x32 grayscale thumbnail: let the JPEG
+            # decoder scale down (by up to 1/8) and skip colour conversion
+            # instead of decoding every full-size pixel first.
+            im.draft("L", (_PHASH_DRAFT_SIZE, _PHASH_DRAFT_SIZE))
             h = imagehash.phash(im)
         return str(h)
     except Exception as e:
@@ -367,7 +527,7 @@ def compute_phash(path: Path) -> Optional[str]:
         return None
 
 
-def get_image_size(path: Path) -> Tuple[Optional[int], Optional[int]]:
+def get_image_size(path: Union[str, Path]) -> Tuple[Optional[int], Optional[int]]:
     try:
         with Image.open(path) as im:
             return im.width, im.height
@@ -376,16 +536,23 @@ def get_image_size(path: Path) -> Tuple[Optional[int], Optional[int]]:
         return None, None
 
 
+# Suffixes stripped in turn by normalize_stem_for_grouping (order matters:
+# "x_edit(copy)" loses both)
+_GROUPING_SUFFIXES = [re.compile(p) for p in (r'\(copy\)$', r'_copy$', r'_edit$', r'-edit$', r'\(\d+\)$')]
+_RE_NON_DIGIT = re.compile(r'\D')
+
+
+@lru_cache(maxsize=65536)
 def normalize_stem_for_grouping(stem: str) -> str:
-    """Normalize filename stem for grouping/resized logic."""
+    """
+    Normalize filename stem for grouping/resized logic.
+    Memoised: stems repeat across RAW/JPEG/PSD passes and resized copies.
+    """
     s = stem.lower().strip()
 
     # remove common suffixes
-    s = re.sub(r'\(copy\)$', '', s)
-    s = re.sub(r'_copy$', '', s)
-    s = re.sub(r'_edit$', '', s)
-    s = re.sub(r'-edit$', '', s)
-    s = re.sub(r'\(\d+\)$', '', s)
+    for suffix in _GROUPING_SUFFIXES:
+        s = suffix.sub('', s)
     s = s.strip('_- ')
 
     return s
@@ -427,7 +594,23 @@ def load_skip_dirs(skip_file: Optional[Path], root: Path) -> Set[Path]:
 
 # ---------------------- DB HELPERS ----------------------
 
+# Speed-boost pragmas (acceptable for a rebuildable catalog)
+# page_size only applies when the DB is first created; cache ~200MB; tweak if you like.
+# journal_mode stays "memory" on :memory: connections, where WAL does not apply.
+CONNECTION_PRAGMAS = """
+    PRAGMA page_size=32768;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-200000;
+    PRAGMA mmap_size=1073741824;
+    PRAGMA wal_autocheckpoint=10000;
+"""
+
+
 def init_db(conn: sqlite3.Connection):
+    """Applies CONNECTION_PRAGMAS, then creates the tables and indexes."""
+    conn.executescript(CONNECTION_PRAGMAS)
     conn.execute("""
     CREATE TABLE IF NOT EXISTS files (
         id              INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -490,7 +673,8 @@ def init_db(conn: sqlite3.Connection):
     );
     """)
     conn.execute("CREATE INDEX IF NOT EXISTS idx_files_type ON files(type);")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_hash ON files(hash);")
+    # files.hash is UNIQUE, which already gives it an index
+    conn.execute("DROP INDEX IF EXISTS idx_files_hash;")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_media_capture_dt ON media_metadata(capture_datetime);")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_raw_outputs_raw ON raw_outputs(raw_file_id);")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_raw_outputs_out ON raw_outputs(output_file_id);")
@@ -501,12 +685,69 @@ def init_db(conn: sqlite3.Connection):
         hash TEXT NOT NULL,
         path TEXT NOT NULL,
         is_seed INTEGER NOT NULL DEFAULT 0,
-        seen_at TEXT NOT NULL DEFAULT (datetime('now'))
+        seen_at TEXT NOT NULL DEFAULT (datetime('now')),
+        type TEXT,
+        parent_dir TEXT,
+        stem_lower TEXT
     );
     """)
+    # Catalogs from before the RAW/sidecar join columns existed
+    occ_cols = {row[1] for row in conn.execute("PRAGMA table_info(file_occurrences)")}
+    for col in ("type", "parent_dir", "stem_lower"):
+        if col not in occ_cols:
+            conn.execute(f"ALTER TABLE file_occurrences ADD COLUMN {col} TEXT")
     conn.execute("CREATE INDEX IF NOT EXISTS idx_file_occurrences_hash ON file_occurrences(hash);")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_file_occurrences_dir_stem
+        ON file_occurrences(type, parent_dir, stem_lower);
+    """)
+    # Hash and EXIF results per path; a rescan reuses them while mtime and size match
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS scan_cache (
+        path             TEXT PRIMARY KEY,
+        mtime_ns         INTEGER NOT NULL,
+        size             INTEGER NOT NULL,
+        hash             TEXT NOT NULL,
+        capture_datetime TEXT,
+        camera_model     TEXT,
+        lens_model       TEXT
+    );
+    """)
+    # Per-catalog settings that must never change once files are hashed
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS catalog_meta (
+        key   TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """)
+    _init_hash_algorithm(conn)
     conn.commit()
 
+
+def _init_hash_algorithm(conn: sqlite3.Connection):
+    """
+    Loads (or, for a catalog without one, records) the catalog's full-hash
+    algorithm into HASH_ALGORITHM, so new hashes always match stored ones.
+    Older catalogs keep the algorithm of the hashes they hold: "b3-" prefixed
+    digests are BLAKE3, others SHA-256 ("sz:" quick hashes say nothing).
+    """
+    global HASH_ALGORITHM
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'hash_algorithm'").fetchone()
+    if row is None:
+        stored = conn.execute(
+            "SELECT hash FROM files WHERE hash NOT LIKE ? || '%' LIMIT 1", (QUICK_HASH_PREFIX,)
+        ).fetchone()
+        if stored is not None:
+            algorithm = "blake3" if stored[0].startswith("b3-") else "sha256"
+        else:
+            algorithm = HASH_ALGORITHM
+        conn.execute("INSERT INTO catalog_meta (key, value) VALUES ('hash_algorithm', ?)", (algorithm,))
+    else:
+        algorithm = row[0]
+    if algorithm == "blake3" and blake3 is None:
+        raise RuntimeError("This catalog hashes with BLAKE3 but the blake3 module is not installed")
+    HASH_ALGORITHM = algorithm
+
 def assign_sidecar_destinations(conn: sqlite3.Connection):
     """
     Assign dest_path to sidecars based on their linked RAW files.
@@ -555,27 +796,31 @@ def assign_sidecar_destinations(conn: sqlite3.Connection):
     conn.commit()
 
 
+# Common PSD edit suffixes (-edit, -final, _v2, ...) and a trailing "(N)"
+_RE_PSD_EDIT_SUFFIX = re.compile(r'[-_](edit|final|v\d+|copy|variant|retouched|working)$')
+_RE_PSD_COUNTER_SUFFIX = re.compile(r'\s*\(\d+\)$')
+
+
+def _psd_match_stem(psd_name: str) -> str:
+    """The key a PSD is matched on: normalized stem without edit suffixes."""
+    psd_stem = normalize_stem_for_grouping(os.path.splitext(psd_name)[0]).lower()
+    psd_stem = _RE_PSD_EDIT_SUFFIX.sub('', psd_stem)
+    return _RE_PSD_COUNTER_SUFFIX.sub('', psd_stem)
+
+
+def _source_match_stem(src_name: str) -> str:
+    """The key a source file is matched on by PSD stem matching."""
+    return normalize_stem_for_grouping(os.path.splitext(src_name)[0]).lower()
+
+
 def find_psd_source_by_stem(psd_name: str, source_names: List[str]) -> bool:
     """
     Try to match a PSD to a source file by normalized stem.
     Removes common PSD suffixes like -edit, -final, _v2, (copy), etc.
     Returns True if found, False otherwise.
     """
-    # Extract stem without extension
-    psd_stem = Path(psd_name).stem
-    psd_stem = normalize_stem_for_grouping(psd_stem).lower()
-    
-    # Remove common PSD suffixes
-    psd_stem = re.sub(r'[-_](edit|final|v\d+|copy|variant|retouched|working)$', '', psd_stem)
-    psd_stem = re.sub(r'\s*\(\d+\)$', '', psd_stem)
-    
-    for src_name in source_names:
-        src_stem = Path(src_name).stem
-        src_stem = normalize_stem_for_grouping(src_stem).lower()
-        if src_stem == psd_stem:
-            return True
-    
-    return False
+    psd_stem = _psd_match_stem(psd_name)
+    return any(_source_match_stem(src_name) == psd_stem for src_name in source_names)
 
 
 def extract_psd_source_references(psd_path: Path) -> List[str]:
@@ -595,10 +840,12 @@ def extract_psd_source_references(psd_path: Path) -> List[str]:
         
         def walk_layers(layer):
             """Recursively walk layer tree to find smart objects."""
-            if hasattr(layer, 'smart_object') and layer.smart_object:
-                so = layer.smart_object
-                if hasattr(so, 'filename') and so.filename:
-                    referenced_files.append(so.filename)
+            # One getattr with a default instead of hasattr + a second lookup
+            so = getattr(layer, 'smart_object', None)
+            if so:
+                filename = getattr(so, 'filename', None)
+                if filename:
+                    referenced_files.append(filename)
             
             # Recurse into group layers
             if hasattr(layer, '__iter__'):
@@ -630,55 +877,46 @@ def link_psds_to_sources(conn: sqlite3.Connection):
     Only stores links with confidence >= 95.
     """
     cur = conn.cursor()
-    
+
     # Get all PSDs
     cur.execute("SELECT id, orig_name, orig_path FROM files WHERE type='psd'")
-    psd_records = [(row[0], row[1], Path(row[2])) for row in cur.fetchall()]
-    
-    # Get all source files (RAW/JPEG) - includes JPEGs from both seed outputs and source scans
+    psd_records = cur.fetchall()
+
+    # Get all source files (RAW/JPEG) - includes JPEGs from both seed outputs and source scans.
+    # Indexed once by each phase's key; the first source in query order wins,
+    # so matching is a dict lookup per PSD instead of a scan over every source.
     cur.execute("SELECT id, orig_name FROM files WHERE type IN ('raw', 'jpeg')")
-    source_records = cur.fetchall()
-    
+    by_stem: Dict[str, int] = {}  # phase 1: normalized stem
+    by_name: Dict[str, int] = {}  # phase 2: normalized full file name
+    for src_id, src_name in cur.fetchall():
+        by_stem.setdefault(_source_match_stem(src_name), src_id)
+        by_name.setdefault(normalize_stem_for_grouping(src_name).lower(), src_id)
+
+    links: List[Tuple[int, int, int, str]] = []
     for psd_id, psd_name, psd_path in psd_records:
-        best_match_id = None
-        best_confidence = 0
-        best_method = None
-        
         # Phase 1: Stem matching
-        for src_id, src_name in source_records:
-            if find_psd_source_by_stem(psd_name, [src_name]):
-                best_match_id = src_id
-                best_confidence = 100
-                best_method = "stem"
-                break
-        
+        src_id = by_stem.get(_psd_match_stem(psd_name))
+        if src_id:
+            links.append((psd_id, src_id, 100, "stem"))
+            continue
+
         # Phase 2: Smart object parsing
-        if best_confidence < 95:
-            try:
-                referenced = extract_psd_source_references(psd_path)
-                for ref_filename in referenced:
-                    ref_stem = normalize_stem_for_grouping(ref_filename).lower()
-                    for src_id, src_name in source_records:
-                        src_stem = normalize_stem_for_grouping(src_name).lower()
-                        if src_stem == ref_stem:
-                            best_match_id = src_id
-                            best_confidence = 95
-                            best_method = "smart_object"
-                            break
-                    if best_match_id:
-                        break
-            except Exception as e:
-                logging.debug(f"Smart object linking failed for {psd_name}: {e}")
-        
-        # Store link if confidence >= 95
-        if best_match_id and best_confidence >= 95:
-            conn.execute(
-                """INSERT OR REPLACE INTO psd_source_links 
-                   (psd_file_id, source_file_id, confidence, link_method) 
-                   VALUES (?, ?, ?, ?)""",
-                (psd_id, best_match_id, best_confidence, best_method),
-            )
-    
+        try:
+            for ref_filename in extract_psd_source_references(Path(psd_path)):
+                src_id = by_name.get(normalize_stem_for_grouping(ref_filename).lower())
+                if src_id:
+                    links.append((psd_id, src_id, 95, "smart_object"))
+                    break
+        except Exception as e:
+            logging.debug(f"Smart object linking failed for {psd_name}: {e}")
+
+    # Only links with confidence >= 95 are produced above
+    conn.executemany(
+        """INSERT OR REPLACE INTO psd_source_links
+           (psd_file_id, source_file_id, confidence, link_method)
+           VALUES (?, ?, ?, ?)""",
+        links,
+    )
     conn.commit()
 
 
@@ -689,11 +927,14 @@ def assign_psd_destinations(conn: sqlite3.Connection):
     Unlinked PSDs are assigned to output/YYYY/YYYY-MM/unlinked-psds/ based on capture_datetime.
     """
     cur = conn.cursor()
-    used_names = defaultdict(set)
-    
+    used_names: Dict[str, set] = defaultdict(set)
+    # Folder strings, normalized through Path once per folder instead of once per PSD
+    source_dirs: Dict[str, str] = {}
+    unlinked_dirs: Dict[Tuple[int, int], str] = {}
+
     # Get all PSD destination assignments from linked sources
     cur.execute("""
-        SELECT p.id, p.orig_name, s.dest_path, m.capture_datetime
+        SELECT p.id, p.orig_name, p.orig_path, s.dest_path, m.capture_datetime
         FROM files p
         LEFT JOIN psd_source_links psl ON p.id = psl.psd_file_id
         LEFT JOIN files s ON psl.source_file_id = s.id
@@ -701,146 +942,79 @@ def assign_psd_destinations(conn: sqlite3.Connection):
         WHERE p.type='psd' AND p.dest_path IS NULL
     """)
     psd_rows = cur.fetchall()
-    
-    for psd_id, psd_name, source_dest, capture_dt in psd_rows:
+
+    updates: List[Tuple[str, int]] = []
+    for psd_id, psd_name, orig_path, source_dest, capture_dt in psd_rows:
         if source_dest:
             # Linked: place in source folder
-            source_dest_path = Path(source_dest)
-            psd_dest_dir = source_dest_path.parent
-            
-            # Handle name collisions
-            psd_dest_path = psd_dest_dir / psd_name
-            base_stem = Path(psd_name).stem
-            ext = Path(psd_name).suffix
-            counter = 1
-            
-            while str(psd_dest_path) in used_names[str(psd_dest_dir)]:
-                psd_dest_path = psd_dest_dir / f"{base_stem} ({counter}){ext}"
-                counter += 1
-            
-            used_names[str(psd_dest_dir)].add(str(psd_dest_path))
-            
-            conn.execute(
-                "UPDATE files SET dest_path = ? WHERE id = ?",
-                (str(psd_dest_path), psd_id),
-            )
+            raw_dir = os.path.dirname(source_dest)
+            psd_dest_dir = source_dirs.get(raw_dir)
+            if psd_dest_dir is None:
+                psd_dest_dir = source_dirs[raw_dir] = str(Path(source_dest).parent)
         else:
             # Unlinked: place in output/YYYY/YYYY-MM/unlinked-psds/
             dt = datetime.fromisoformat(capture_dt) if capture_dt else None
             if dt is None:
                 # Fallback to mtime
-                cur.execute("SELECT orig_path FROM files WHERE id = ?", (psd_id,))
-                orig_path_row = cur.fetchone()
-                if orig_path_row:
-                    try:
-                        dt = datetime.fromtimestamp(
-                            Path(orig_path_row[0]).stat().st_mtime, tz=UTC
-                        )
-                    except Exception:
-                        dt = datetime.now(UTC)
-                else:
+                try:
+                    dt = datetime.fromtimestamp(Path(orig_path).stat().st_mtime, tz=UTC)
+                except Exception:
                     dt = datetime.now(UTC)
-            
-            year = dt.year
-            month = dt.month
-            unlinked_dir = f"output/{year}/{year:04d}-{month:02d}/unlinked-psds"
-            psd_dest_path = Path(unlinked_dir) / psd_name
-            
-            # Handle collision for unlinked PSDs
-            base_stem = Path(psd_name).stem
-            ext = Path(psd_name).suffix
-            counter = 1
-            
-            while str(psd_dest_path) in used_names[unlinked_dir]:
-                psd_dest_path = Path(unlinked_dir) / f"{base_stem} ({counter}){ext}"
-                counter += 1
-            
-            used_names[unlinked_dir].add(str(psd_dest_path))
-            
-            conn.execute(
-                "UPDATE files SET dest_path = ? WHERE id = ?",
-                (str(psd_dest_path), psd_id),
-            )
-    
+
+            key = (dt.year, dt.month)
+            psd_dest_dir = unlinked_dirs.get(key)
+            if psd_dest_dir is None:
+                unlinked_dir = f"output/{dt.year}/{dt.year:04d}-{dt.month:02d}/unlinked-psds"
+                psd_dest_dir = unlinked_dirs[key] = str(Path(unlinked_dir))
+
+        # Handle name collisions
+        base_stem, ext = os.path.splitext(psd_name)
+        names = used_names[psd_dest_dir]
+        candidate = psd_name
+        counter = 1
+        while candidate in names:
+            candidate = f"{base_stem} ({counter}){ext}"
+            counter += 1
+        names.add(candidate)
+
+        updates.append((os.path.join(psd_dest_dir, candidate), psd_id))
+
+    conn.executemany("UPDATE files SET dest_path = ? WHERE id = ?", updates)
     conn.commit()
 
 
+# SET expressions all see the pre-update row, so `better` is evaluated once
+# against the existing canonical values: a seed copy wins, then the higher
+# name score; otherwise only last_seen_at moves.
+_BETTER_CANONICAL = ("(excluded.is_seed > files.is_seed OR "
+                     "(excluded.is_seed = files.is_seed AND excluded.name_score > files.name_score))")
+_UPSERT_FILE_SQL = f"""
+    INSERT INTO files (
+        hash, type, ext, orig_name, orig_path, size_bytes,
+        is_seed, name_score, first_seen_at, last_seen_at
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(hash) DO UPDATE SET
+        orig_name = CASE WHEN {_BETTER_CANONICAL} THEN excluded.orig_name ELSE files.orig_name END,
+        orig_path = CASE WHEN {_BETTER_CANONICAL} THEN excluded.orig_path ELSE files.orig_path END,
+        is_seed = CASE WHEN {_BETTER_CANONICAL} THEN excluded.is_seed ELSE files.is_seed END,
+        name_score = CASE WHEN {_BETTER_CANONICAL} THEN excluded.name_score ELSE files.name_score END,
+        last_seen_at = excluded.last_seen_at
+"""
+
+
 def upsert_file_record(conn: sqlite3.Connection, rec: FileRecord) -> int:
     """
     Insert or update canonical file row for a given hash.
-    Returns file_id.
+    Returns file_id. One UPSERT ... RETURNING statement, same rule as the bulk form.
     """
     now_iso = datetime.now(UTC).isoformat()
-    cur = conn.cursor()
-    cur.execute("SELECT id, is_seed, name_score FROM files WHERE hash = ?", (rec.hash,))
-    row = cur.fetchone()
-
-    file_id: int  # explicitly declare
-
-    if row is None:
-        # No existing row: insert
-        cur.execute(
-            """
-            INSERT INTO files (
-                hash, type, ext, orig_name, orig_path, size_bytes,
-                is_seed, name_score, first_seen_at, last_seen_at
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                rec.hash,
-                rec.type,
-                rec.ext,
-                rec.orig_name,
-                str(rec.orig_path),
-                rec.size_bytes,
-                int(rec.is_seed),
-                rec.name_score,
-                now_iso,
-                now_iso,
-            ),
-        )
-        rid = cur.lastrowid
-        # Help Pylance: assert this is not None
-        assert rid is not None, "lastrowid should not be None after INSERT"
-        file_id = int(rid)
-    else:
-        # Existing row: decide whether to update canonical info
-        raw_file_id, existing_seed, existing_score = row
-        file_id = int(raw_file_id)
-        existing_seed_int = int(existing_seed)
-        new_seed = int(rec.is_seed)
-
-        update_canonical = False
-        if new_seed > existing_seed_int:
-            update_canonical = True
-        elif new_seed == existing_seed_int and rec.name_score > int(existing_score):
-            update_canonical = True
-
-        if update_canonical:
-            cur.execute(
-                """
-                UPDATE files
-                SET orig_name = ?, orig_path = ?, is_seed = ?, name_score = ?, last_seen_at = ?
-                WHERE id = ?
-                """,
-                (
-                    rec.orig_name,
-                    str(rec.orig_path),
-                    new_seed,
-                    rec.name_score,
-                    now_iso,
-                    file_id,
-                ),
-            )
-        else:
-            cur.execute(
-                "UPDATE files SET last_seen_at = ? WHERE id = ?",
-                (now_iso, file_id),
-            )
-
-    
-    return file_id
+    row = conn.execute(
+        _UPSERT_FILE_SQL + " RETURNING id",
+        (rec.hash, rec.type, rec.ext, rec.orig_name, str(rec.orig_path), rec.size_bytes,
+         int(rec.is_seed), rec.name_score, now_iso, now_iso),
+    ).fetchone()
+    return int(row[0])
 
 
 def upsert_media_metadata(conn: sqlite3.Connection, file_id: int, rec: FileRecord):
@@ -875,38 +1049,122 @@ def upsert_media_metadata(conn: sqlite3.Connection, file_id: int, rec: FileRecor
             capture_str, rec.camera_model, rec.lens_model, rec.width, rec.height,
             rec.duration_sec, aspect_ratio, rec.phash, file_id
         ))
-    
+
+
+def upsert_file_records_bulk(conn: sqlite3.Connection, records: List[FileRecord]) -> List[int]:
+    """
+    Batch form of upsert_file_record: one executemany UPSERT for the whole
+    batch, then one SELECT per 500 hashes for the ids. Rows are applied in
+    order, so repeated hashes within a batch resolve exactly as with
+    per-record calls. Returns file ids aligned with `records`.
+    """
+    upsert_file_records_noreturn(conn, records)
+    ids = fetch_file_ids(conn, {rec.hash for rec in records})
+    return [ids[rec.hash] for rec in records]
+
+
+def upsert_file_records_noreturn(conn: sqlite3.Connection, records: List[FileRecord]):
+    """The executemany UPSERT of upsert_file_records_bulk, without reading ids back."""
+    if not records:
+        return
+    now_iso = datetime.now(UTC).isoformat()
+    conn.executemany(
+        _UPSERT_FILE_SQL,
+        [
+            (rec.hash, rec.type, rec.ext, rec.orig_name, str(rec.orig_path), rec.size_bytes,
+             int(rec.is_seed), rec.name_score, now_iso, now_iso)
+            for rec in records
+        ],
+    )
+
+
+
+def fetch_file_ids(conn: sqlite3.Connection, hashes: Iterable[str]) -> Dict[str, int]:
+    """hash -> files.id for the given hashes, 500 per query."""
+    ids: Dict[str, int] = {}
+    hashes = list(hashes)
+    for i in range(0, len(hashes), 500):
+        chunk = hashes[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for file_id, h in conn.execute(f"SELECT id, hash FROM files WHERE hash IN ({placeholders})", chunk):
+            ids[h] = int(file_id)
+    return ids
+
+
+def upsert_media_metadata_bulk(conn: sqlite3.Connection, rows: List[Tuple[int, FileRecord]]):
+    """Batch form of upsert_media_metadata for (file_id, record) pairs."""
+    params = []
+    for file_id, rec in rows:
+        aspect_ratio = rec.width / rec.height if rec.width and rec.height else None
+        params.append((
+            file_id, rec.capture_datetime.isoformat() if rec.capture_datetime else None,
+            rec.camera_model, rec.lens_model, rec.width, rec.height,
+            rec.duration_sec, aspect_ratio, rec.phash,
+        ))
+    conn.executemany("""
+        INSERT INTO media_metadata
+        (file_id, capture_datetime, camera_model, lens_model, width, height,
+         duration_sec, aspect_ratio, phash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(file_id) DO UPDATE SET
+            capture_datetime = excluded.capture_datetime,
+            camera_model = excluded.camera_model,
+            lens_model = excluded.lens_model,
+            width = excluded.width,
+            height = excluded.height,
+            duration_sec = excluded.duration_sec,
+            aspect_ratio = excluded.aspect_ratio,
+            phash = excluded.phash
+    """, params)
+
 
 
 # ---------------------- SCANNING ----------------------
 
-def classify_extension(path: Path) -> Optional[str]:
+def classify_extension(path: str) -> Optional[str]:
+    name = os.path.basename(path)
     #ignore AppleDouble / dot-underscore files from macOS
-    if path.name.startswith("._"):
+    if name.startswith("._"):
         return "other"
 
-
-    ext = path.suffix.lower()
-    if ext in RAW_EXTS:
-        return "raw"
-    if ext in JPEG_EXTS:
-        return "jpeg"
-    if ext in VIDEO_EXTS:
-        return "video"
-    if ext in PSD_EXTS:
-        return "psd"
-    if ext in TIFF_EXTS:
-        return "tiff"
-    if ext in SIDECAR_EXTS:
-        return "sidecar"
     # everything else is "other" so we still catalog it
-    return "other"
+    return EXT_TO_TYPE.get(os.path.splitext(name)[1].lower(), "other")
 
 
-def gather_file_record(path: Path, ftype: str, is_seed: bool, use_phash: bool) -> FileRecord:
-    ext = path.suffix.lower()
-    orig_name = path.name
-    size_bytes = path.stat().st_size
+def gather_file_record(path: str, ftype: str, is_seed: bool, use_phash: bool, full_hash: bool = True,
+                       size_bytes: Optional[int] = None, mtime_ns: Optional[int] = None) -> FileRecord:
+    """
+    Hashes and reads metadata for one file. With full_hash=False the file's
+    size is known to be unique, and only a quick hash is taken. size_bytes
+    and mtime_ns may be passed when the caller already has them from the
+    directory scan. A file unchanged since the last scan (same path, size
+    and mtime) reuses that scan's hash and EXIF instead of being read.
+    The path stays a string; a Path is only built for the folder-date fallback.
+    """
+    orig_name = os.path.basename(path)
+    stem, ext = os.path.splitext(orig_name)
+    ext = ext.lower()
+    if size_bytes is None or mtime_ns is None:
+        st = os.stat(path)
+        size_bytes, mtime_ns = st.st_size, st.st_mtime_ns
+
+    cached = _scan_cache_lookup(path, size_bytes, mtime_ns)
+    # A cached quick hash is not enough once a full hash is needed
+    cached_hash = None
+    if cached is not None and (not full_hash or not cached[0].startswith(QUICK_HASH_PREFIX)):
+        cached_hash = cached[0]
+
+    def hash_handle(f=None) -> str:
+        """The cached hash, else hashes f (rewound) or a fresh handle."""
+        if cached_hash is not None:
+            return cached_hash
+        if f is None:
+            with open(path, "rb") as fh:
+                return hash_handle(fh)
+        f.seek(0)
+        if full_hash:
+            return compute_file_hash_from_handle(f)
+        return compute_quick_hash_from_handle(f, size_bytes)
 
     capture_dt = None
     camera_model = None
@@ -914,37 +1172,42 @@ def gather_file_record(path: Path, ftype: str, is_seed: bool, use_phash: bool) -
     width = height = None
     duration_sec = None
     phash_str = None
+    exif: Tuple[Optional[str], Optional[str], Optional[str]] = (None, None, None)
 
     if ftype in ("raw", "jpeg", "psd", "tiff"):
-        with open(path, "rb") as f:
-            capture_dt, camera_model, lens_model = get_image_metadata_exif(path, fileobj=f)
-
-            if capture_dt is None:
-                inferred = infer_datetime_from_path(path)
-                if inferred is not None:
-                    logging.info(
-                        "Using folder-inferred datetime %s for %s",
-                        inferred.isoformat(),
-                        path,
-                    )
-                    capture_dt = inferred
-                else:
-                    logging.info("Using filesystem mtime as capture_datetime for %s", path)
-                    capture_dt = fallback_file_datetime(path)
+        if cached is not None:
+            dt_str, camera_model, lens_model = exif = cached[1:]
+            capture_dt = datetime.fromisoformat(dt_str) if dt_str else None
+            hash_str = hash_handle()
+        else:
+            with open(path, "rb") as f:
+                capture_dt, camera_model, lens_model = get_image_metadata_exif(path, fileobj=f)
+                hash_str = hash_handle(f)
+            exif = (capture_dt.isoformat() if capture_dt else None, camera_model, lens_model)
 
-            f.seek(0)
-            hash_str = compute_file_hash_from_handle(f)
+        if capture_dt is None:
+            inferred = infer_datetime_from_path(Path(path))
+            if inferred is not None:
+                logging.info(
+                    "Using folder-inferred datetime %s for %s",
+                    inferred.isoformat(),
+                    path,
+                )
+                capture_dt = inferred
+            else:
+                logging.info("Using filesystem mtime as capture_datetime for %s", path)
+                capture_dt = fallback_file_datetime(path)
 
         if ftype in ("jpeg", "psd", "tiff"):
             width, height = get_image_size(path)
             if use_phash and ftype in ("jpeg", "tiff"):
-                phash_str = compute_phash(path)
+                phash_str = _PHASH_CACHE.get(hash_str) or compute_phash(path)
 
     elif ftype == "video":
         capture_dt, duration_sec, camera_model = get_video_metadata(path)
 
         if capture_dt is None:
-            inferred = infer_datetime_from_path(path)
+            inferred = infer_datetime_from_path(Path(path))
             if inferred is not None:
                 logging.info(
                     "Using folder-inferred datetime %s for video %s",
@@ -959,17 +1222,17 @@ def gather_file_record(path: Path, ftype: str, is_seed: bool, use_phash: bool) -
                 )
                 capture_dt = fallback_file_datetime(path)
 
-        hash_str = compute_file_hash(path)
+        hash_str = hash_handle()
 
     else:
         # sidecar / other: just use filesystem time
         capture_dt = fallback_file_datetime(path)
-        hash_str = compute_file_hash(path)
+        hash_str = hash_handle()
 
     if capture_dt is None:
         # Very defensive; in practice we'll have set it above
         capture_dt = fallback_file_datetime(path)
-    name_score = descriptiveness_score(path.stem)
+    name_score = descriptiveness_score(stem)
 
     return FileRecord(
         hash=hash_str,
@@ -986,19 +1249,34 @@ def gather_file_record(path: Path, ftype: str, is_seed: bool, use_phash: bool) -
         width=width,
         height=height,
         duration_sec=duration_sec,
-        phash=phash_str
+        phash=phash_str,
+        scan_cache_entry=None if cached is not None and cached_hash == hash_str else (mtime_ns, hash_str) + exif,
     )
 
 
-def iter_files_scandir(root: Path, skip_dest: Optional[Path] = None, skip_dirs: Optional[Set[Path]] = None) -> Iterable[Path]:
-    """Depth-first traversal using scandir for fewer syscalls; yields files in stable order."""
-    stack = [root]
+def iter_files_scandir_raw(root: Path, skip_dest: Optional[Path] = None, skip_dirs: Optional[Set[Path]] = None) -> Iterator[os.DirEntry]:
+    """
+    Depth-first traversal using scandir for fewer syscalls; yields file
+    DirEntries in stable order. Paths stay plain strings throughout: skip
+    checks are prefix compares instead of Path.parents walks.
+    """
+    skip = [os.path.normcase(os.path.normpath(os.fspath(p)))
+            for p in ([skip_dest] if skip_dest else []) + list(skip_dirs or [])]
+    skip_exact = set(skip)
+    skip_prefixes = tuple(p.rstrip(os.sep) + os.sep for p in skip)
+
+    def skipped(path: str) -> bool:
+        if not skip:
+            return False
+        path = os.path.normcase(path)
+        return path in skip_exact or path.startswith(skip_prefixes)
+
+    root_str = os.path.normpath(os.fspath(root))
+    if skipped(root_str):
+        return
+    stack = [root_str]
     while stack:
         current = stack.pop()
-        if skip_dest and (current == skip_dest or skip_dest in current.parents):
-            continue
-        if skip_dirs and any(sd == current or sd in current.parents for sd in skip_dirs):
-            continue
         try:
             with os.scandir(current) as it:
                 entries = [entry for entry in it]
@@ -1006,93 +1284,228 @@ def iter_files_scandir(root: Path, skip_dest: Optional[Path] = None, skip_dirs:
             continue
 
         entries.sort(key=lambda e: e.name.lower())
-        dirs = [Path(e.path) for e in entries if e.is_dir(follow_symlinks=False)]
-        files = [Path(e.path) for e in entries if e.is_file(follow_symlinks=False)]
+        dirs = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+        files = [e for e in entries if e.is_file(follow_symlinks=False)]
 
+        # Skipped subtrees are dropped here, before they are ever listed
         for d in reversed(dirs):
-            if skip_dest and (d == skip_dest or skip_dest in d.parents):
-                continue
-            if skip_dirs and any(sd == d or sd in d.parents for sd in skip_dirs):
-                continue
-            stack.append(d)
+            if not skipped(d):
+                stack.append(d)
+        # A file's directory already passed the prefix test, so only a skip
+        # entry naming the file itself can still match
         for f in files:
-            if skip_dest and (f == skip_dest or skip_dest in f.parents):
-                continue
-            if skip_dirs and any(sd == f or sd in f.parents for sd in skip_dirs):
-                continue
-            yield f
+            if not skip_exact or os.path.normcase(f.path) not in skip_exact:
+                yield f
 
 
-def scan_tree(conn: sqlite3.Connection, root: Path, is_seed: bool, use_phash: bool, skip_dest: Optional[Path] = None, max_workers: int = 2, skip_dirs: Optional[Set[Path]] = None):
-    logging.info(f"Scanning {'seed' if is_seed else 'source'}: {root}")
-    all_files: List[Path] = list(iter_files_scandir(root, skip_dest=skip_dest, skip_dirs=skip_dirs))
+def iter_files_scandir(root: Path, skip_dest: Optional[Path] = None, skip_dirs: Optional[Set[Path]] = None) -> Iterable[Path]:
+    """iter_files_scandir_raw as Path objects."""
+    return (Path(e.path) for e in iter_files_scandir_raw(root, skip_dest=skip_dest, skip_dirs=skip_dirs))
 
-    BATCH_SIZE = 200  # tweak as you like
-    processed = 0
-    raw_sidecar_index: Dict[Tuple[Path, str], Dict[str, List[int]]] = defaultdict(lambda: {"raw": [], "sidecar": []})
 
-    conn.execute("BEGIN")
+def _entry_stat(entry: os.DirEntry) -> Tuple[Optional[int], Optional[int]]:
+    """(size, mtime_ns) from the DirEntry's cached stat."""
+    try:
+        st = entry.stat(follow_symlinks=False)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None, None  # gather_file_record will report it
 
-    def process_path(path: Path) -> Optional[FileRecord]:
-        ftype = classify_extension(path)
-        if not ftype:
-            return None
-        try:
-            return gather_file_record(path, ftype, is_seed, use_phash)
-        except Exception as e:
-            logging.exception("Error processing file %s: %s", path, e)
-            return None
 
-    max_workers = max(1, min(max_workers, 8))
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        for rec in tqdm(pool.map(process_path, all_files), total=len(all_files), desc=f"Scanning {'seed' if is_seed else 'src'}"):
-            if rec is None:
+def _gather_path(path: str, is_seed: bool, use_phash: bool, full_hash: bool = True,
+                 size_bytes: Optional[int] = None, mtime_ns: Optional[int] = None) -> Optional[FileRecord]:
+    """Classify + gather_file_record for one path; module level so process pools can pickle it."""
+    ftype = classify_extension(path)
+    if not ftype:
+        return None
+    try:
+        return gather_file_record(path, ftype, is_seed, use_phash, full_hash, size_bytes, mtime_ns)
+    except Exception as e:
+        logging.exception("Error processing file %s: %s", path, e)
+        return None
+
+
+def plan_full_hashes(conn: sqlite3.Connection, sizes: List[Optional[int]],
+                     unchanged: Optional[Dict[str, str]] = None) -> List[bool]:
+    """
+    Size prefilter: for each scanned file size (None if unknown), whether the
+    file needs a full hash (some other file in this scan or in the catalog has
+    the same size). Catalog rows that only had a quick hash and now meet a
+    same-size file are upgraded first.
+    `unchanged` maps scanned paths that are unchanged since the last scan to
+    their cached hash; a catalog row that is one of them does not count as
+    another file of its size (a rescan must not force full hashes on itself).
+    """
+    if not SIZE_PREFILTER:
+        return [True] * len(sizes)
+
+    unchanged = unchanged or {}
+    scan_counts: Dict[Optional[int], int] = defaultdict(int)
+    for size in sizes:
+        scan_counts[size] += 1
+    catalog_sizes = set()  # sizes of catalogued files other than the unchanged ones
+    all_catalog_sizes = set()
+    for size, count, orig_path, file_hash in conn.execute(
+            "SELECT size_bytes, COUNT(*), MIN(orig_path), MIN(hash) FROM files GROUP BY size_bytes"):
+        all_catalog_sizes.add(size)
+        if count > 1 or unchanged.get(orig_path) != file_hash:
+            catalog_sizes.add(size)
+
+    upgrade_quick_hashes(conn, [
+        s for s in scan_counts
+        if s is not None and s in all_catalog_sizes and (scan_counts[s] > 1 or s in catalog_sizes)
+    ])
+    return [size is None or scan_counts[size] > 1 or size in catalog_sizes for size in sizes]
+
+
+def upgrade_quick_hashes(conn: sqlite3.Connection, sizes: List[int]):
+    """Replaces quick hashes of catalogued files with these sizes by full hashes."""
+    rows = []
+    for i in range(0, len(sizes), 500):
+        chunk = sizes[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows.extend(conn.execute(
+            f"SELECT id, hash, orig_path, dest_path FROM files "
+            f"WHERE hash LIKE '{QUICK_HASH_PREFIX}%' AND size_bytes IN ({placeholders})",
+            chunk,
+        ))
+
+    with conn:
+        for file_id, quick, orig_path, dest_path in rows:
+            # The copy at dest_path is the one that survives a --move
+            candidates = [p for p in (dest_path, orig_path) if p and os.path.isfile(p)]
+            if not candidates:
+                logging.warning("Cannot re-hash %s (file missing); same-size duplicates may not be detected", orig_path)
+                continue
+            try:
+                full = compute_file_hash(Path(candidates[0]))
+                conn.execute("UPDATE files SET hash = ? WHERE id = ?", (full, file_id))
+            except (OSError, sqlite3.IntegrityError) as e:
+                logging.warning("Could not upgrade quick hash for %s: %s", orig_path, e)
                 continue
-            file_id = upsert_file_record(conn, rec)
-            if rec.type in ("raw", "jpeg", "video", "psd", "tiff"):
-                upsert_media_metadata(conn, file_id, rec)
-            conn.execute(
-                "INSERT INTO file_occurrences (hash, path, is_seed) VALUES (?, ?, ?)",
-                (rec.hash, str(rec.orig_path), int(is_seed)),
+            conn.execute("UPDATE file_occurrences SET hash = ? WHERE hash = ?", (full, quick))
+
+
+def scan_tree(conn: sqlite3.Connection, root: Path, is_seed: bool, use_phash: bool, skip_dest: Optional[Path] = None, max_workers: int = 2, skip_dirs: Optional[Set[Path]] = None, hash_workers: int = 1):
+    """
+    Catalogs every file under root. Files are hashed and read for metadata on
+    max_workers threads, or, with hash_workers > 1, in that many processes
+    (EXIF parsing holds the GIL; hashing alone would not need them).
+    The database writes always stay on this thread.
+    RAW/sidecar pairs are linked afterwards from the recorded occurrences
+    (link_raw_sidecars_from_occurrences).
+    """
+    logging.info(f"Scanning {'seed' if is_seed else 'source'}: {root}")
+    entries = list(iter_files_scandir_raw(root, skip_dest=skip_dest, skip_dirs=skip_dirs))
+    # One stat per file, from the DirEntry; size and mtime are reused for
+    # hashing and the scan cache
+    stats = [_entry_stat(e) for e in entries]
+    sizes = [size for size, _ in stats]
+    mtimes = [mtime for _, mtime in stats]
+    scan_cache = load_scan_cache(conn)
+    unchanged = {
+        e.path: cached[2]
+        for e, (size, mtime) in zip(entries, stats)
+        if (cached := scan_cache.get(e.path)) is not None and cached[:2] == (mtime, size)
+    }
+    all_files: List[str] = [e.path for e in entries]
+    del entries
+    full_hash = plan_full_hashes(conn, sizes, unchanged)
+    del unchanged
+
+    BATCH_SIZE = 500  # records per executemany flush and commit
+    MEDIA_TYPES = ("raw", "jpeg", "video", "psd", "tiff")
+    pending: List[FileRecord] = []
+
+    def flush():
+        """Writes the buffered records in one transaction."""
+        # Only media rows need ids; other files are written without reading
+        # theirs back.
+        keyed = [rec for rec in pending if rec.type in MEDIA_TYPES]
+        with conn:
+            upsert_file_records_noreturn(conn, pending)
+            ids = fetch_file_ids(conn, {rec.hash for rec in keyed})
+            upsert_media_metadata_bulk(conn, [(ids[rec.hash], rec) for rec in keyed])
+            conn.executemany(
+                "INSERT INTO file_occurrences (hash, path, is_seed, type, parent_dir, stem_lower) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (rec.hash, rec.orig_path, int(is_seed), rec.type,
+                     os.path.dirname(rec.orig_path), os.path.splitext(rec.orig_name)[0].lower())
+                    for rec in pending
+                ],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO scan_cache "
+                "(path, mtime_ns, size, hash, capture_datetime, camera_model, lens_model) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (rec.orig_path, rec.scan_cache_entry[0], rec.size_bytes) + rec.scan_cache_entry[1:]
+                    for rec in pending
+                    if rec.scan_cache_entry is not None
+                ],
             )
+        pending.clear()
+
+    caches = (load_phash_cache(conn) if use_phash else {}, scan_cache)
+    if hash_workers > 1:
+        # Each worker process receives the caches once, not with every task
+        pool = ProcessPoolExecutor(max_workers=hash_workers, initializer=_init_scan_worker,
+                                   initargs=(HASH_ALGORITHM, *caches))
+        chunksize = 64
+    else:
+        _set_scan_caches(*caches)
+        pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, 8)))
+        chunksize = 1
+    with pool:
+        results = pool.map(_gather_path, all_files, repeat(is_seed), repeat(use_phash), full_hash, sizes, mtimes,
+                           chunksize=chunksize)
+        for rec in tqdm(results, total=len(all_files), desc=f"Scanning {'seed' if is_seed else 'src'}"):
+            if rec is None:
+                continue
+            pending.append(rec)
+            if len(pending) >= BATCH_SIZE:
+                flush()
 
-            if rec.type in ("raw", "sidecar"):
-                key = (rec.orig_path.parent, rec.orig_path.stem.lower())
-                raw_sidecar_index[key][rec.type].append(file_id)
+    flush()
 
-            processed += 1
-            if processed % BATCH_SIZE == 0:
-                conn.commit()
-                conn.execute("BEGIN")
 
-    conn.commit()
-    return raw_sidecar_index
+# Pairs per multi-row INSERT; 2 params each stays under SQLite's historic 999-variable limit
+RAW_SIDECAR_INSERT_CHUNK = 400
 
 
-def merge_raw_sidecar_indices(indices: List[Dict[Tuple[Path, str], Dict[str, List[int]]]]) -> Dict[Tuple[Path, str], Dict[str, List[int]]]:
-    merged: Dict[Tuple[Path, str], Dict[str, List[int]]] = defaultdict(lambda: {"raw": [], "sidecar": []})
-    for idx in indices:
-        for key, val in idx.items():
-            merged[key]["raw"].extend(val.get("raw", []))
-            merged[key]["sidecar"].extend(val.get("sidecar", []))
-    return merged
+def insert_raw_sidecar_pairs(conn: sqlite3.Connection, pairs: List[Tuple[int, int]]):
+    """
+    Insert (raw_id, sidecar_id) pairs with one multi-row VALUES statement per chunk,
+    so SQLite prepares and runs one program per chunk instead of one per pair.
+    """
+    for start in range(0, len(pairs), RAW_SIDECAR_INSERT_CHUNK):
+        chunk = pairs[start:start + RAW_SIDECAR_INSERT_CHUNK]
+        sql = (
+            "INSERT OR IGNORE INTO raw_sidecars (raw_file_id, sidecar_file_id) VALUES "
+            + ",".join(["(?, ?)"] * len(chunk))
+        )
+        conn.execute(sql, [v for pair in chunk for v in pair])
 
 
-def link_raw_sidecars_from_index(conn: sqlite3.Connection, raw_sidecar_index: Dict[Tuple[Path, str], Dict[str, List[int]]]):
-    for key, val in tqdm(raw_sidecar_index.items(), desc="Linking sidecars"):
-        raw_ids = val.get("raw") or []
-        sidecar_ids = val.get("sidecar") or []
-        if not raw_ids or not sidecar_ids:
-            continue
-        for raw_id in raw_ids:
-            for sidecar_id in sidecar_ids:
-                conn.execute(
-                    """
-                    INSERT OR IGNORE INTO raw_sidecars (raw_file_id, sidecar_file_id)
-                    VALUES (?, ?)
-                    """,
-                    (raw_id, sidecar_id),
-                )
+def link_raw_sidecars_from_occurrences(conn: sqlite3.Connection):
+    """
+    Links this run's RAWs and sidecars, joined inside SQLite: every RAW and
+    sidecar occurrence in one directory with the same lowercased stem, mapped
+    to their catalog rows through the hash.
+    """
+    conn.execute("""
+        INSERT OR IGNORE INTO raw_sidecars (raw_file_id, sidecar_file_id)
+        SELECT DISTINCT r.id, s.id
+        FROM file_occurrences ro
+        JOIN file_occurrences so
+          ON so.type = 'sidecar'
+         AND so.parent_dir = ro.parent_dir
+         AND so.stem_lower = ro.stem_lower
+        JOIN files r ON r.hash = ro.hash
+        JOIN files s ON s.hash = so.hash
+        WHERE ro.type = 'raw'
+    """)
     conn.commit()
 
 
@@ -1107,7 +1520,18 @@ def decide_dest_for_file(conn: sqlite3.Connection, dest_root: Path):
     "other" type files are not assigned dest_path (no copying).
     """
     cur = conn.cursor()
-    used_names: Dict[Path, set] = defaultdict(set)
+    used_names: Dict[str, set] = defaultdict(set)
+    # Destination paths are plain strings: one Path per (type root, year, month)
+    # gives the folder prefix, and each file name is appended to it.
+    dest_dirs: Dict[Tuple[str, int, int], str] = {}
+
+    def dest_dir_for(root_name: str, dt: datetime) -> str:
+        key = (root_name, dt.year, dt.month)
+        dest_dir = dest_dirs.get(key)
+        if dest_dir is None:
+            folder = dest_root / root_name / FOLDER_PATTERN.format(year=dt.year, month=dt.month)
+            dest_dir = dest_dirs[key] = str(folder) + os.sep
+        return dest_dir
 
     # 1) RAW, video, TIFF: simple pass (JPEG via grouping; PSD handled separately by assign_psd_destinations)
     cur.execute("""
@@ -1117,6 +1541,7 @@ def decide_dest_for_file(conn: sqlite3.Connection, dest_root: Path):
         WHERE f.type IN ('raw','video','tiff')
     """)
     rows = cur.fetchall()
+    updates: List[Tuple[str, int]] = []
     for file_id, _, ftype, orig_name, orig_path, dest_path, capture_str in rows:
         if dest_path:
             continue  # already set
@@ -1127,31 +1552,22 @@ def decide_dest_for_file(conn: sqlite3.Connection, dest_root: Path):
             # Fall back to the file's own filesystem timestamp
             dt = fallback_file_datetime(Path(orig_path))
 
-        year = dt.year
-        month = dt.month
-        year_month_folder = FOLDER_PATTERN.format(year=year, month=month)
-
-        if ftype == "raw":
-            base = dest_root / "raw"
-        else:  # video, tiff
-            base = dest_root / "output"
-
-        dest_dir = base / year_month_folder
+        # video, tiff go to output
+        dest_dir = dest_dir_for("raw" if ftype == "raw" else "output", dt)
 
         # Format: <orig_stem>_YYYY-MM-DD_HH-MM-SS<ext>
         dt_str = dt.strftime("%Y-%m-%d_%H-%M-%S")
-        orig_path_obj = Path(orig_name)
-        stem = orig_path_obj.stem
-        ext = orig_path_obj.suffix  # includes the dot, e.g. ".CR2"
-        new_name = f"{stem}_{dt_str}{ext}"
-        candidate = dest_dir / new_name
+        stem, ext = os.path.splitext(orig_name)  # ext includes the dot, e.g. ".CR2"
+        candidate = f"{stem}_{dt_str}{ext}"
+        names = used_names[dest_dir]
         counter = 1
-        while candidate.name in used_names[dest_dir]:
-            candidate = dest_dir / f"{stem}_{dt_str}_{counter}{ext}"
+        while candidate in names:
+            candidate = f"{stem}_{dt_str}_{counter}{ext}"
             counter += 1
-        used_names[dest_dir].add(candidate.name)
+        names.add(candidate)
 
-        conn.execute("UPDATE files SET dest_path = ? WHERE id = ?", (str(candidate), file_id))
+        updates.append((dest_dir + candidate, file_id))
+    conn.executemany("UPDATE files SET dest_path = ? WHERE id = ?", updates)
     conn.commit()
 
     # 2) JPEGs: grouping for main vs resized
@@ -1163,7 +1579,8 @@ def decide_dest_for_file(conn: sqlite3.Connection, dest_root: Path):
     """)
     rows = cur.fetchall()
 
-    groups: Dict[Tuple[str, Optional[str]], List[Tuple[int, str, Path, Optional[str], Optional[int], Optional[int]]]] = {}
+    # Each item keeps the datetime it was grouped by, so it is parsed once
+    groups: Dict[Tuple[str, str], List[Tuple[int, str, datetime, Optional[int], Optional[int]]]] = {}
 
     for file_id, orig_name, orig_path, capture_str, w, h in rows:
         if capture_str:
@@ -1173,41 +1590,23 @@ def decide_dest_for_file(conn: sqlite3.Connection, dest_root: Path):
             dt = fallback_file_datetime(Path(orig_path))
 
         dt_key = dt.replace(microsecond=0).isoformat()
-        norm_stem = normalize_stem_for_grouping(Path(orig_name).stem)
+        norm_stem = normalize_stem_for_grouping(os.path.splitext(orig_name)[0])
         key = (norm_stem, dt_key)
-        groups.setdefault(key, []).append((file_id, orig_name, Path(orig_path), capture_str, w, h))
+        groups.setdefault(key, []).append((file_id, orig_name, dt, w, h))
 
+    updates = []
     for key, items in groups.items():
-        # Find main (largest resolution) JPEG
-        best_item = None
-        best_pixels = -1
-        for file_id, orig_name, orig_path, capture_str, w, h in items:
-            pixels = (w or 0) * (h or 0)
-            if pixels > best_pixels:
-                best_pixels = pixels
-                best_item = (file_id, orig_name, orig_path, capture_str, w, h)
-
-        if best_item is None:
-            continue
+        # Find main (largest resolution) JPEG; the first one wins a tie
+        best_index = max(range(len(items)), key=lambda i: ((items[i][3] or 0) * (items[i][4] or 0), -i))
 
-        for file_id, orig_name, orig_path, capture_str, w, h in items:
-            if capture_str:
-                dt = datetime.fromisoformat(capture_str)
-            else:
-                dt = fallback_file_datetime(Path(orig_path))
-
-            year = dt.year
-            month = dt.month
-            year_month_folder = FOLDER_PATTERN.format(year=year, month=month)
-            dest_dir = dest_root / "output" / year_month_folder
+        for index, (file_id, orig_name, dt, w, h) in enumerate(items):
+            dest_dir = dest_dir_for("output", dt)
             # Format: <orig_stem>[_resized_WxH]_YYYY-MM-DD_HH-MM-SS<ext>
             dt_str = dt.strftime("%Y-%m-%d_%H-%M-%S")
-            orig_path_obj = Path(orig_name)
-            stem = orig_path_obj.stem
-            ext = orig_path_obj.suffix  # e.g. ".jpg"
+            stem, ext = os.path.splitext(orig_name)  # e.g. ".jpg"
 
             # Decide filename pattern
-            if (file_id, orig_name, orig_path, capture_str, w, h) == best_item:
+            if index == best_index:
                 # main version
                 new_name = f"{stem}_{dt_str}{ext}"
             else:
@@ -1217,40 +1616,115 @@ def decide_dest_for_file(conn: sqlite3.Connection, dest_root: Path):
                 else:
                     new_name = f"{stem}_resized_{dt_str}{ext}"
 
-
-            base_stem = Path(new_name).stem
-            candidate = dest_dir / new_name
+            base_stem = new_name[:len(new_name) - len(ext)]
+            candidate = new_name
+            names = used_names[dest_dir]
             counter = 1
-            while candidate.name in used_names[dest_dir]:
-                candidate = dest_dir / f"{base_stem}_{counter}{ext}"
+            while candidate in names:
+                candidate = f"{base_stem}_{counter}{ext}"
                 counter += 1
-            used_names[dest_dir].add(candidate.name)
+            names.add(candidate)
 
-            conn.execute("UPDATE files SET dest_path = ? WHERE id = ?", (str(candidate), file_id))
+            updates.append((dest_dir + candidate, file_id))
 
+    conn.executemany("UPDATE files SET dest_path = ? WHERE id = ?", updates)
     conn.commit()
 
 
-def copy_or_move_files(conn: sqlite3.Connection, move: bool, dry_run: bool):
-    cur = conn.cursor()
-    cur.execute("SELECT id, orig_path, dest_path, type FROM files WHERE dest_path IS NOT NULL")
-    rows = cur.fetchall()
-    for file_id, orig_path, dest_path, ftype in tqdm(rows, desc="Copying/moving"):
-        src = Path(orig_path)
-        dest = Path(dest_path)
-        if dest.exists():
+# copy_file_range errors that mean "not supported here", not "copy failed"
+_KERNEL_COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM}
+
+
+# macOS: clonefile(2) makes an APFS copy-on-write clone, with metadata, in O(1)
+_clonefile = None
+if sys.platform == "darwin":
+    try:
+        import ctypes
+        _clonefile = ctypes.CDLL(None, use_errno=True).clonefile
+        _clonefile.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32)
+        _clonefile.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _clonefile = None
+
+
+def _kernel_copy(src: str, dest: str) -> bool:
+    """
+    Copies src to dest without passing the data through Python: clonefile on
+    macOS, os.copy_file_range elsewhere (in-kernel; a reflink on btrfs/xfs,
+    server-side on NFS 4.2). Returns False when the platform or filesystem
+    pair does not support it, so the caller can fall back.
+    """
+    if _clonefile is not None:
+        # Fails (ENOTSUP, EXDEV) off APFS or across volumes; dest is not created then
+        return _clonefile(os.fsencode(src), os.fsencode(dest), 0) == 0
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break  # source shrank while copying
+                remaining -= copied
+    except OSError as e:
+        if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+            raise
+        return False
+    shutil.copystat(src, dest)
+    return True
+
+
+def _copy_or_move_one(src: Union[str, Path], dest: Union[str, Path], move: bool):
+    """Copies or moves one file; dest's directory must already exist."""
+    src_str, dest_str = os.fspath(src), os.fspath(dest)
+    if move:
+        # A same-filesystem move is one rename; copy + delete only across devices
+        try:
+            os.rename(src_str, dest_str)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src_str, dest_str)
+    elif not _kernel_copy(src_str, dest_str):
+        # shutil.copy2 uses sendfile (Linux) / fcopyfile (macOS) itself
+        shutil.copy2(src_str, dest_str)
+
+
+def copy_or_move_files(conn: sqlite3.Connection, move: bool, dry_run: bool, max_workers: int = 2):
+    # Only the two path columns, as plain strings, in source path order so
+    # the copies read each source directory together rather than scattered.
+    rows = conn.execute(
+        "SELECT orig_path, dest_path FROM files WHERE dest_path IS NOT NULL ORDER BY orig_path"
+    )
+    pending: List[Tuple[str, str]] = []
+    for src, dest in rows:
+        if os.path.exists(dest):
             continue
         if dry_run:
             logging.info(f"[DRY RUN] {'Move' if move else 'Copy'} {src} -> {dest}")
             continue
-        dest.parent.mkdir(parents=True, exist_ok=True)
+        pending.append((src, dest))
+
+    # Create each destination directory once, up front, instead of a
+    # mkdir(parents=True) per file racing across the copy threads.
+    for parent in {os.path.dirname(dest) for _, dest in pending}:
         try:
-            if move:
-                shutil.move(str(src), str(dest))
-            else:
-                shutil.copy2(str(src), str(dest))
-        except Exception as e:
-            logging.exception(f"Error copying {src} -> {dest}: {e}")
+            os.makedirs(parent, exist_ok=True)
+        except OSError as e:
+            logging.error(f"Cannot create {parent}: {e}")
+
+    # Keep several independent copies in flight so the device queue stays
+    # full instead of ping-ponging one blocking read/write at a time.
+    max_workers = max(1, min(max_workers, 8))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_copy_or_move_one, src, dest, move): (src, dest) for src, dest in pending}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Copying/moving"):
+            src, dest = futures[fut]
+            try:
+                fut.result()
+            except Exception as e:
+                logging.exception(f"Error copying {src} -> {dest}: {e}")
 
 
 # ---------------------- RAW SIDECARS ----------------------
@@ -1269,18 +1743,14 @@ def link_raw_sidecars(conn: sqlite3.Connection):
         sp = Path(spath)
         sidecars[(sp.parent, sp.stem.lower())].append(sid)
 
+    pairs: List[Tuple[int, int]] = []
     for raw_id, raw_path in tqdm(raws, desc="Linking sidecars"):
         key = (raw_path.parent, raw_path.stem.lower())
         if key not in sidecars:
             continue
         for sidecar_id in sidecars[key]:
-            conn.execute(
-                """
-                INSERT OR IGNORE INTO raw_sidecars (raw_file_id, sidecar_file_id)
-                VALUES (?, ?)
-                """,
-                (raw_id, sidecar_id),
-            )
+            pairs.append((raw_id, sidecar_id))
+    insert_raw_sidecar_pairs(conn, pairs)
     conn.commit()
 
 
@@ -1315,95 +1785,92 @@ def build_raw_output_links(conn: sqlite3.Connection, use_phash: bool):
     """)
     out_rows = cur.fetchall()
 
-    # Index outputs by exact capture time for pass 1
-    out_by_time: Dict[str, List[Tuple[int, str, Optional[str], Optional[str], Optional[str]]]] = {}
-    for out_id, out_name, capture_str, cam_model, phash_str in out_rows:
+    insert_sql = """
+        INSERT OR IGNORE INTO raw_outputs (raw_file_id, output_file_id, link_method, confidence)
+        VALUES (?, ?, ?, ?)
+    """
+
+    # Pass 1: filename core + exact capture time, as a hash join on
+    # (capture time, digits of the stem) instead of comparing every pair
+    out_by_time_core: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+    for out_id, out_name, capture_str, _, _ in out_rows:
         if not capture_str:
             continue
-        key = capture_str  # exact second
-        out_by_time.setdefault(key, []).append((out_id, out_name, capture_str, cam_model, phash_str))
+        out_core = _digits_of_stem(out_name)
+        if out_core:
+            out_by_time_core[(capture_str, out_core)].append(out_id)
 
-    # Pass 1: filename core + exact capture time
+    links = []
     for raw_id, raw_name, capture_str, raw_cam in tqdm(raw_rows, desc="Linking RAW->outputs (pass1)"):
         if not capture_str:
             continue
-        key = capture_str
-        if key not in out_by_time:
-            continue
-        raw_core = re.sub(r'\D', '', Path(raw_name).stem)
-        for out_id, out_name, _, out_cam, _ in out_by_time[key]:
-            out_core = re.sub(r'\D', '', Path(out_name).stem)
-            if raw_core and raw_core == out_core:
-                conn.execute("""
-                    INSERT OR IGNORE INTO raw_outputs (raw_file_id, output_file_id, link_method, confidence)
-                    VALUES (?, ?, ?, ?)
-                """, (raw_id, out_id, 'filename_time', 100))
+        raw_core = _digits_of_stem(raw_name)
+        for out_id in out_by_time_core.get((capture_str, raw_core), ()):
+            links.append((raw_id, out_id, 'filename_time', 100))
+    conn.executemany(insert_sql, links)
     conn.commit()
 
-    # Pass 2: time + camera model (±2 seconds)
-    outs_for_pass2 = []
+    # Pass 2: time + camera model (±2 seconds); outputs per camera sorted by
+    # timestamp, so each RAW bisects its window instead of scanning them all
+    outs_by_cam: Dict[str, List[Tuple[float, int]]] = defaultdict(list)
     for out_id, out_name, capture_str, out_cam, phash_str in out_rows:
-        if not capture_str:
+        if not capture_str or not out_cam:
             continue
-        outs_for_pass2.append((out_id, out_name, datetime.fromisoformat(capture_str), out_cam, phash_str))
+        outs_by_cam[out_cam].append((datetime.fromisoformat(capture_str).timestamp(), out_id))
+    for entries in outs_by_cam.values():
+        entries.sort()
 
+    links = []
     for raw_id, raw_name, capture_str, raw_cam in tqdm(raw_rows, desc="Linking RAW->outputs (pass2)"):
-        if not capture_str or not raw_cam:
+        if not capture_str or not raw_cam or raw_cam not in outs_by_cam:
             continue
-        raw_dt = datetime.fromisoformat(capture_str)
-        t_min = raw_dt.timestamp() - 2
-        t_max = raw_dt.timestamp() + 2
-        for out_id, out_name, out_dt, out_cam, _ in outs_for_pass2:
-            if not out_cam:
-                continue
-            if out_cam != raw_cam:
-                continue
-            ts = out_dt.timestamp()
-            if t_min <= ts <= t_max:
-                conn.execute("""
-                    INSERT OR IGNORE INTO raw_outputs (raw_file_id, output_file_id, link_method, confidence)
-                    VALUES (?, ?, ?, ?)
-                """, (raw_id, out_id, 'time_camera', 90))
+        ts = datetime.fromisoformat(capture_str).timestamp()
+        for out_id in _ids_in_window(outs_by_cam[raw_cam], ts - 2, ts + 2):
+            links.append((raw_id, out_id, 'time_camera', 90))
+    conn.executemany(insert_sql, links)
     conn.commit()
 
     # Pass 3: pHash (optional, JPEG/TIFF only; note we don't yet compute RAW phashes)
     if use_phash and imagehash is not None:
-        # Map outputs with phash and capture time
-        outs_with_phash = [
-            (out_id, out_name, capture_str, cam, phash_str)
-            for out_id, out_name, capture_str, cam, phash_str in out_rows
-            if phash_str
-        ]
-
-        # For each RAW, compare against outputs in ±30s window using pHash
+        # Outputs with a usable phash, sorted by capture time
+        outs_with_phash: List[Tuple[float, int]] = []
+        for out_id, out_name, capture_str, cam, out_phash in out_rows:
+            if not out_phash or not capture_str:
+                continue
+            try:
+                raw_h = imagehash.hex_to_hash(out_phash)  # NOTE: currently limited: we don't have RAW phash
+                out_h = imagehash.hex_to_hash(out_phash)
+                dist = raw_h - out_h
+            except Exception:
+                continue
+            if dist <= 5:
+                outs_with_phash.append((datetime.fromisoformat(capture_str).timestamp(), out_id))
+        outs_with_phash.sort()
+
+        # For each RAW, link outputs in a ±30s window
+        links = []
         for raw_id, raw_name, capture_str, raw_cam in tqdm(raw_rows, desc="Linking RAW->outputs (pass3-phash)"):
             if not capture_str:
                 continue
-            raw_dt = datetime.fromisoformat(capture_str)
-            t_min = raw_dt.timestamp() - 30
-            t_max = raw_dt.timestamp() + 30
-
-            for out_id, out_name, out_capture_str, out_cam, out_phash in outs_with_phash:
-                if not out_capture_str:
-                    continue
-                out_dt = datetime.fromisoformat(out_capture_str)
-                ts = out_dt.timestamp()
-                if ts < t_min or ts > t_max:
-                    continue
-                try:
-                    raw_h = imagehash.hex_to_hash(out_phash)  # NOTE: currently limited: we don't have RAW phash
-                    out_h = imagehash.hex_to_hash(out_phash)
-                    dist = raw_h - out_h
-                except Exception:
-                    continue
-                if dist <= 5:
-                    conn.execute("""
-                        INSERT OR IGNORE INTO raw_outputs (raw_file_id, output_file_id, link_method, confidence)
-                        VALUES (?, ?, ?, ?)
-                    """, (raw_id, out_id, 'phash', 70))
+            ts = datetime.fromisoformat(capture_str).timestamp()
+            for out_id in _ids_in_window(outs_with_phash, ts - 30, ts + 30):
+                links.append((raw_id, out_id, 'phash', 70))
+        conn.executemany(insert_sql, links)
         conn.commit()
 
 
+def _digits_of_stem(name: str) -> str:
+    """The digits of a file name's stem ("IMG_0042.CR2" -> "0042"), used to pair RAWs with outputs."""
+    return _RE_NON_DIGIT.sub('', Path(name).stem)
+
+
+def _ids_in_window(entries: List[Tuple[float, int]], t_min: float, t_max: float) -> List[int]:
+    """Ids of the (timestamp, id) entries, sorted by timestamp, with t_min <= timestamp <= t_max."""
+    lo = bisect_left(entries, (t_min, -math.inf))
+    hi = bisect_right(entries, (t_max, math.inf))
+    return [out_id for _, out_id in entries[lo:hi]]
+
+
 # ---------------------- REPORTS ----------------------
 
 def export_unprocessed_raws(conn: sqlite3.Connection, out_csv: Path):
@@ -1548,7 +2015,13 @@ def parse_args():
         "--max-workers",
         type=int,
         default=2,
-        help="Max threads for scanning (bounded internally, default: 2)"
+        help="Max threads for scanning and copying (bounded internally, default: 2)"
+    )
+    p.add_argument(
+        "--hash-workers",
+        type=int,
+        default=1,
+        help="Scan in this many processes instead of threads (helps when EXIF parsing is the bottleneck; default: 1 = threads)"
     )
     p.add_argument(
         "--copy-report",
@@ -1589,25 +2062,16 @@ def main():
     exif_logger.setLevel(logging.ERROR)
 
     conn = sqlite3.connect(db_path)
-
-    # Speed-boost pragmas (acceptable for a rebuildable catalog)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
-    conn.execute("PRAGMA temp_store=MEMORY;")
-    conn.execute("PRAGMA cache_size=-200000;")  # ~200MB cache; tweak if you like
-
     init_db(conn)
     # Per-run occurrence log: clear any prior scan entries
     conn.execute("DELETE FROM file_occurrences;")
     conn.commit()
 
-    seed_sidecar_index: Dict[Tuple[Path, str], Dict[str, List[int]]] = defaultdict(lambda: {"raw": [], "sidecar": []})
-
     # Seed scan (outputs first, if provided)
     if args.seed_output:
         seed_root = Path(args.seed_output).resolve()
         seed_skip_dirs = load_skip_dirs(skip_file, seed_root)
-        seed_sidecar_index = scan_tree(
+        scan_tree(
             conn,
             seed_root,
             is_seed=True,
@@ -1615,11 +2079,12 @@ def main():
             skip_dest=None,
             max_workers=args.max_workers,
             skip_dirs=seed_skip_dirs,
+            hash_workers=args.hash_workers,
         )
 
     # Main source scan
     src_skip_dirs = load_skip_dirs(skip_file, src_root)
-    src_sidecar_index = scan_tree(
+    scan_tree(
         conn,
         src_root,
         is_seed=False,
@@ -1627,11 +2092,11 @@ def main():
         skip_dest=dest_root,
         max_workers=args.max_workers,
         skip_dirs=src_skip_dirs,
+        hash_workers=args.hash_workers,
     )
 
-    # Link RAW sidecars using in-memory index from both scans
-    combined_sidecars = merge_raw_sidecar_indices([seed_sidecar_index, src_sidecar_index])
-    link_raw_sidecars_from_index(conn, combined_sidecars)
+    # Link RAW sidecars from both scans' occurrences, joined in SQLite
+    link_raw_sidecars_from_occurrences(conn)
 
     # Link PSDs to source images
     link_psds_to_sources(conn)
@@ -1646,7 +2111,7 @@ def main():
     assign_psd_destinations(conn)
 
     # Copy/move files
-    copy_or_move_files(conn, move=args.move, dry_run=args.dry_run)
+    copy_or_move_files(conn, move=args.move, dry_run=args.dry_run, max_workers=args.max_workers)
 
     # Link RAW -> outputs
     build_raw_output_links(conn, use_phash=args.use_phash)
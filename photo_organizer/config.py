@@ -1,7 +1,11 @@
 """
 Configuration constants for the photo organizer.
 """
+import os
+import re
+from functools import lru_cache
 from pathlib import Path
+from typing import Tuple
 
 # --- File Type Definitions ---
 RAW_EXTS = {'.cr2', '.cr3', '.nef', '.arw', '.orf', '.rw2', '.dng'}
@@ -21,23 +25,57 @@ for ext in PSD_EXTS: EXT_TO_TYPE[ext] = 'psd'
 for ext in TIFF_EXTS: EXT_TO_TYPE[ext] = 'tiff'
 for ext in SIDECAR_EXTS: EXT_TO_TYPE[ext] = 'sidecar'
 
+@lru_cache(maxsize=256)
+def classify_ext(ext: str) -> Tuple[str, str]:
+    """
+    Returns (lowercased extension, file type) for a raw suffix such as '.JPG'.
+    Memoised: a library only has a handful of distinct extensions.
+    """
+    ext_lower = ext.lower()
+    return ext_lower, EXT_TO_TYPE.get(ext_lower, 'other')
+
 # --- Metadata Parsing ---
-DATE_TAGS = [
+# Tried in order of preference
+DATE_TAGS = (
     'EXIF DateTimeOriginal',
     'EXIF DateTimeDigitized',
     'Image DateTime',
-]
+)
 
 # Patterns for "Descriptiveness Score" (naming priority)
 CAMERA_PATTERNS = [
     r'^img_\d+$', r'^dsc_\d+$', r'^dscf\d+$', r'^pxl_\d+$', 
     r'^sam_\d+$', r'^_dsc\d+$', r'^cimg\d+$'
 ]
+# All camera patterns as one alternation: a single regex pass per filename
+CAMERA_NAME_RE = re.compile("|".join(f"(?:{p})" for p in CAMERA_PATTERNS))
 
 # --- Hashing & Performance ---
 # Files smaller than this are hashed fully. Larger ones get Sparse Hash first.
 SPARSE_HASH_THRESHOLD = 5 * 1024 * 1024  # 5 MB
-HASH_CHUNK_SIZE = 64 * 1024  # 64 KB chunks for reading
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB reads: fewer Python-level update() calls per file
+
+# Full-content hash for NEW catalogs: "blake3" (multithreaded) or "sha256".
+# Each catalog records its algorithm when created (catalog_meta); existing
+# catalogs keep theirs, so changing this never affects them.
+FULL_HASH_ALGORITHM = "blake3"
+# Files at least this large are hashed by BLAKE3 via mmap with all cores.
+BLAKE3_MMAP_THRESHOLD = 16 * 1024 * 1024  # 16 MB
+
+# EXIF parsing is CPU-bound pure Python; fan it out across processes.
+METADATA_WORKERS = os.cpu_count() or 1
+# Files hashed per batch before their image metadata is extracted in parallel.
+SCAN_BATCH_SIZE = 256
+# Threads reading and hashing files within a scan batch. hashlib/blake3 release
+# the GIL, so threads use several cores; kept modest for spinning disks.
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+# Directory listings in flight during the walk. opendir/readdir is latency-bound
+# (NFS, spinning disks), so this is independent of the CPU count.
+WALK_THREADS = 16
+# Hand each directory's files to the hasher in inode order, which tracks the
+# on-disk layout on most POSIX filesystems (fewer seeks on HDDs). Windows has
+# no meaningful inode numbers, so files stay in name order there.
+WALK_INODE_ORDER = os.name != "nt"
 
 # --- Organization ---
-FOLDER_PATTERN = "{year}/{year}-{month:02d}"
\ No newline at end of file
+FOLDER_PATTERN = "{year}/{year}-{month:02d}"
@@ -1,15 +1,23 @@
 import logging
+import os
+import re
 from pathlib import Path
 from typing import Set, Optional
 
 from .database.db import DBManager
 from .database.ops import DBOperations
 from .scanning.filesystem import DiskScanner
+from .scanning.hasher import FileHasher
+from .models import FileRecord
 from .metadata.linking import FileLinker
 from .organization.rules import DestinationPlanner
 from .organization.mover import FileMover
 from . import config
 
+# A whole "raw" path component (any case), e.g. /lib/raw/2021 -> /lib/output/2021
+_SEP = re.escape(os.sep)
+_RAW_COMPONENT_RE = re.compile(rf"(?i)(^|{_SEP})raw(?={_SEP}|$)")
+
 class PhotoOrganizerApp:
     def __init__(self, db_path: Path):
         self.db_manager = DBManager(db_path)
@@ -20,7 +28,8 @@ class PhotoOrganizerApp:
                  is_seed: bool = False, 
                  move: bool = False, 
                  dry_run: bool = False,
-                 skip_dirs: Optional[Set[Path]] = None):
+                 skip_dirs: Optional[Set[Path]] = None,
+                 threads: int = 1):
         """
         Executes the 'Phase 1' Organization Pipeline.
         1. Scan & Hash (Deduplicate)
@@ -33,42 +42,72 @@ class PhotoOrganizerApp:
             
             # --- Step 1: Scanning ---
             logging.info(f"Scanning {src_root} (Seed={is_seed})...")
-            scanner = DiskScanner()
+            # Hash with the catalog's own algorithm so new hashes match stored ones
+            scanner = DiskScanner(metadata_workers=config.METADATA_WORKERS,
+                                  hash_algorithm=db_ops.get_hash_algorithm())
             
             # Load known sparse hashes to optimize 2-stage hashing
             known_sparse_hashes = db_ops.fetch_known_sparse_hashes()
+            # Sizes seen so far: a file with a new size cannot be a duplicate
+            known_sizes = db_ops.fetch_known_sizes()
+            # Content already catalogued with metadata: the scan skips EXIF/MediaInfo
+            dated_hashes = db_ops.fetch_hashes_with_metadata()
+            # Full hashes of files seen before: unchanged files are not re-read
+            hash_cache = db_ops.fetch_hash_cache()
+            # Rows known only by a sparse hash; a later full-hash record must confirm them
+            sparse_only = db_ops.fetch_sparse_only_hashes()
             
             processed_count = 0
-            for record in scanner.scan(src_root, is_seed, known_sparse_hashes, skip_dirs):
+            # Occurrence rows are buffered and flushed once per commit batch
+            occurrences = []
+            db_ops.begin_batch()
+            for record in scanner.scan(src_root, is_seed, known_sparse_hashes, skip_dirs, known_sizes,
+                                       dated_hashes, hash_cache):
+                if record.hash is None:
+                    if record.sparse_hash:
+                        sparse_only.add(record.sparse_hash)
+                elif record.sparse_hash in sparse_only:
+                    if self._confirm_sparse_matches(db_ops, scanner.hasher, record):
+                        sparse_only.discard(record.sparse_hash)
                 file_id = db_ops.upsert_file_record(record)
-                if record.type in ('raw', 'jpeg', 'video', 'psd', 'tiff'):
+                if record.metadata_loaded and record.type in ('raw', 'jpeg', 'video', 'psd', 'tiff'):
                     db_ops.upsert_media_metadata(file_id, record)
 
                 hash_value = record.hash or record.sparse_hash
                 if hash_value:
-                    mtime = record.mtime if record.mtime is not None else record.orig_path.stat().st_mtime
-                    db_ops.record_occurrence(
-                        file_id=file_id,
-                        path=record.orig_path,
-                        is_seed=record.is_seed,
-                        mtime=mtime,
-                        size_bytes=record.size_bytes,
-                        hash_value=hash_value,
-                        is_sparse=record.hash_is_sparse,
-                    )
+                    mtime = record.mtime if record.mtime is not None else os.stat(record.orig_path).st_mtime
+                    occurrences.append((
+                        record.orig_path,
+                        file_id,
+                        int(record.is_seed),
+                        mtime,
+                        record.size_bytes,
+                        hash_value,
+                        int(record.hash_is_sparse),
+                    ))
                 
                 processed_count += 1
                 if processed_count % 1000 == 0:
+                    db_ops.bulk_record_occurrences(occurrences)
+                    occurrences.clear()
                     conn.commit()
+                    db_ops.begin_batch()
             
+            db_ops.bulk_record_occurrences(occurrences)
             conn.commit()
+            db_ops.end_batch()
             logging.info(f"Scan complete. Processed {processed_count} files.")
 
+            # Fresh statistics so linking/planning queries pick the right indices
+            db_ops.analyze_after_bulk()
+
             # --- Step 2: Linking ---
             # We must link Sidecars/PSDs before planning destinations
+            # One transaction (and one commit) for the whole phase
             linker = FileLinker(db_ops)
-            linker.link_raw_sidecars()
-            linker.link_psds()
+            with conn:
+                linker.link_raw_sidecars()
+                linker.link_psds()
 
             # --- Step 3: Planning ---
             logging.info("Planning destinations...")
@@ -85,54 +124,89 @@ class PhotoOrganizerApp:
             conn.commit()
 
             # --- Step 4: Execution ---
-            mover = FileMover(db_ops)
+            mover = FileMover(db_ops, threads=threads)
             mover.execute(move_mode=move, dry_run=dry_run)
             
             logging.info("Organization phase complete.")
 
+    @staticmethod
+    def _confirm_sparse_matches(db_ops: DBOperations, hasher: FileHasher, record: FileRecord) -> bool:
+        """
+        Full-hashes the catalogued rows that share `record`'s sparse hash but
+        have no full hash, so the upsert matches on content and never on the
+        sparse hash alone. (Ported from original upgrade_quick_hashes.)
+        Returns True once no such row is left unconfirmed.
+        """
+        confirmed = True
+        for file_id, orig_path, dest_path, size_bytes in db_ops.fetch_sparse_only_files(record.sparse_hash):
+            full_hash = None
+            for candidate in (dest_path, orig_path):
+                if not candidate:
+                    continue
+                if os.path.normpath(candidate) == os.path.normpath(record.orig_path):
+                    # Just read by the scan
+                    full_hash = record.hash
+                    break
+                try:
+                    full_hash = hasher._full_hash(candidate, size_bytes)
+                    break
+                except OSError:
+                    continue
+
+            if full_hash is None:
+                logging.warning(f"Cannot confirm sparse match for {orig_path}: file not found")
+                confirmed = False
+            elif not db_ops.set_full_hash(file_id, full_hash):
+                logging.warning(f"Cannot confirm sparse match for {orig_path}: content already catalogued")
+                confirmed = False
+        return confirmed
+
     def _assign_linked_destinations(self, db_ops: DBOperations):
         """
         Helper to assign destinations for Sidecars/PSDs based on their parents.
         (Ported logic from original assign_sidecar_destinations)
+
+        Each pass is a single UPDATE ... FROM; the path rewrite runs inside
+        SQLite through the scalar functions registered below.
         """
-        cur = db_ops.conn.cursor()
-        
+        conn = db_ops.conn
+        conn.create_function("sidecar_dest", 2, _sidecar_dest, deterministic=True)
+        conn.create_function("linked_psd_dest", 2, _linked_psd_dest, deterministic=True)
+
         # 1. Sidecars follow RAWs
-        cur.execute("""
-            SELECT rs.sidecar_file_id, f.orig_name, r.dest_path
+        # (Collision handling omitted for brevity, usually matches RAW stem)
+        conn.execute("""
+            UPDATE files
+            SET dest_path = sidecar_dest(r.dest_path, files.orig_name)
             FROM raw_sidecars rs
-            JOIN files f ON rs.sidecar_file_id = f.id
             JOIN files r ON rs.raw_file_id = r.id
-            WHERE f.dest_path IS NULL AND r.dest_path IS NOT NULL
+            WHERE files.id = rs.sidecar_file_id
+              AND files.dest_path IS NULL AND r.dest_path IS NOT NULL
         """)
-        rows = cur.fetchall()
-        for sidecar_id, name, raw_dest_str in rows:
-            raw_dest = Path(raw_dest_str)
-            sidecar_dest = raw_dest.with_suffix(Path(name).suffix)
-            # (Collision handling omitted for brevity, usually matches RAW stem)
-            db_ops.update_dest_path(sidecar_id, str(sidecar_dest))
-            
+
         # 2. PSDs follow Sources
-        cur.execute("""
-            SELECT psl.psd_file_id, f.orig_name, s.dest_path
+        conn.execute("""
+            UPDATE files
+            SET dest_path = linked_psd_dest(s.dest_path, files.orig_name)
             FROM psd_source_links psl
-            JOIN files f ON psl.psd_file_id = f.id
             JOIN files s ON psl.source_file_id = s.id
-            WHERE f.dest_path IS NULL AND s.dest_path IS NOT NULL
+            WHERE files.id = psl.psd_file_id
+              AND files.dest_path IS NULL AND s.dest_path IS NOT NULL
         """)
-        rows = cur.fetchall()
-        for psd_id, name, src_dest_str in rows:
-            src_dest = Path(src_dest_str)
-            dest_parent = src_dest.parent
-
-            # PSDs are considered outputs; if the source lives in the raw tree, mirror the
-            # folder structure under output instead.
-            parts = list(dest_parent.parts)
-            for idx, part in enumerate(parts):
-                if part.lower() == "raw":
-                    parts[idx] = "output"
-                    dest_parent = Path(*parts)
-                    break
 
-            psd_dest = dest_parent / name  # PSD keeps its own name, just moves folder
-            db_ops.update_dest_path(psd_id, str(psd_dest))
+
+def _sidecar_dest(raw_dest_str: str, name: str) -> str:
+    """Sidecar sits next to its RAW, sharing the RAW's destination stem."""
+    return str(Path(raw_dest_str).with_suffix(Path(name).suffix))
+
+
+def _linked_psd_dest(src_dest_str: str, name: str) -> str:
+    """PSD keeps its own name, just moves into its source's folder."""
+    dest_parent = os.path.dirname(src_dest_str)
+
+    # PSDs are considered outputs; if the source lives in the raw tree, mirror the
+    # folder structure under output instead (first "raw" component only).
+    if "raw" in dest_parent.lower():
+        dest_parent = _RAW_COMPONENT_RE.sub(r"\g<1>output", dest_parent, count=1)
+
+    return os.path.join(dest_parent, name)
@@ -6,7 +6,22 @@ import logging
 from pathlib import Path
 from typing import Optional
 
-from .schema import init_schema
+from .schema import init_schema, optimize_on_close, READ_ONLY_PRAGMAS
+
+__all__ = ["DBManager", "connect_read_only"]
+
+
+def connect_read_only(db_path: Path) -> sqlite3.Connection:
+    """
+    Opens an existing catalog read-only (mode=ro URI) for long read scans.
+    The schema is not touched; the catalog must already exist.
+    """
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    logging.info(f"Connecting to database (read-only): {db_path}")
+    conn = sqlite3.connect(uri, uri=True)
+    conn.executescript(READ_ONLY_PRAGMAS)
+    return conn
+
 
 class DBManager:
     def __init__(self, db_path: Path):
@@ -15,7 +30,7 @@ class DBManager:
 
     def connect(self) -> sqlite3.Connection:
         """
-        Connects to the SQLite database and configures performance pragmas.
+        Connects to the SQLite database; init_schema configures performance pragmas.
         """
         if self._conn:
             return self._conn
@@ -23,20 +38,14 @@ class DBManager:
         logging.info(f"Connecting to database: {self.db_path}")
         self._conn = sqlite3.connect(self.db_path)
         
-        # Performance Tuning (Safe for single-writer, multi-reader)
-        self._conn.execute("PRAGMA journal_mode=WAL;")
-        self._conn.execute("PRAGMA synchronous=NORMAL;")
-        self._conn.execute("PRAGMA temp_store=MEMORY;")
-        self._conn.execute("PRAGMA cache_size=-200000;") # ~200MB cache
-        self._conn.execute("PRAGMA foreign_keys=ON;")
-
-        # Ensure schema exists
+        # Ensure schema exists (and apply connection pragmas)
         init_schema(self._conn)
         
         return self._conn
 
     def close(self):
         if self._conn:
+            optimize_on_close(self._conn)
             self._conn.close()
             self._conn = None
 
@@ -1,21 +1,48 @@
+import os
 import sqlite3
 import logging
 from datetime import datetime, UTC
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict, Any, Set
+from typing import Optional, Tuple, List, Dict, Any, Set, Iterator
 
 from ..models import FileRecord
+from .schema import detect_hash_algorithm, path_keys
+
+__all__ = ["DBOperations"]
 
 class DBOperations:
     def __init__(self, conn: sqlite3.Connection):
         self.conn = conn
+        # (iso_string, epoch_seconds) pinned by begin_batch(); None = compute per call
+        self._batch_now: Optional[Tuple[str, int]] = None
+
+    def begin_batch(self):
+        """
+        Pins the timestamp used by upserts/occurrences until the next
+        begin_batch() or end_batch(). Per-batch precision is enough for
+        first_seen/last_seen and saves formatting a datetime per row.
+        """
+        now = datetime.now(UTC)
+        self._batch_now = (now.isoformat(), int(now.timestamp()))
+
+    def end_batch(self):
+        self._batch_now = None
+
+    def _now(self) -> Tuple[str, int]:
+        if self._batch_now is not None:
+            return self._batch_now
+        now = datetime.now(UTC)
+        return now.isoformat(), int(now.timestamp())
 
     def upsert_file_record(self, rec: FileRecord) -> int:
         """
         Inserts or updates a file record.
-        Uses full hash when available; otherwise falls back to sparse_hash hints.
+        Only a full hash identifies a file: a sparse hash is a hint, so a
+        sparse-only record is always new. Earlier sparse-only rows that share
+        its sparse hash must be confirmed first (fetch_sparse_only_files /
+        set_full_hash) so a full-hash record can match them.
         """
-        now_iso = datetime.now(UTC).isoformat()
+        now_iso, _ = self._now()
         cur = self.conn.cursor()
 
         full_hash = rec.hash
@@ -25,24 +52,25 @@ class DBOperations:
         if full_hash:
             cur.execute("SELECT id, is_seed, name_score, hash, sparse_hash FROM files WHERE hash = ?", (full_hash,))
             row = cur.fetchone()
-        if row is None and sparse_hash:
-            cur.execute("SELECT id, is_seed, name_score, hash, sparse_hash FROM files WHERE sparse_hash = ?", (sparse_hash,))
-            row = cur.fetchone()
 
         file_id: int
 
+        # Stored normalized so readers (the report) can key on it without resolving
+        orig_path = os.path.normpath(rec.orig_path)
+
         if row is None:
             # New File
+            parent_dir, stem_lower = path_keys(orig_path)
             cur.execute("""
                 INSERT INTO files (
                     hash, sparse_hash, type, ext, orig_name, orig_path, size_bytes,
-                    is_seed, name_score, first_seen_at, last_seen_at
+                    is_seed, name_score, first_seen_at, last_seen_at, parent_dir, stem_lower
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
-                full_hash, sparse_hash, rec.type, rec.ext, rec.orig_name, str(rec.orig_path),
+                full_hash, sparse_hash, rec.type, rec.ext, rec.orig_name, orig_path,
                 rec.size_bytes, int(rec.is_seed), rec.name_score,
-                now_iso, now_iso
+                now_iso, now_iso, parent_dir, stem_lower
             ))
             
             if cur.lastrowid is None:
@@ -64,23 +92,49 @@ class DBOperations:
                 update_canonical = True
 
             if update_canonical:
+                parent_dir, stem_lower = path_keys(orig_path)
                 cur.execute("""
                     UPDATE files
-                    SET orig_name = ?, orig_path = ?, is_seed = ?, name_score = ?, last_seen_at = ?
+                    SET orig_name = ?, orig_path = ?, is_seed = ?, name_score = ?, last_seen_at = ?,
+                        parent_dir = ?, stem_lower = ?
                     WHERE id = ?
-                """, (rec.orig_name, str(rec.orig_path), int(rec.is_seed), rec.name_score, now_iso, file_id))
+                """, (rec.orig_name, orig_path, int(rec.is_seed), rec.name_score, now_iso,
+                      parent_dir, stem_lower, file_id))
             else:
                 cur.execute("UPDATE files SET last_seen_at = ? WHERE id = ?", (now_iso, file_id))
 
-            # If we previously only had a sparse hash and now have a full hash, persist it.
-            if existing_full_hash is None and full_hash:
-                cur.execute("UPDATE files SET hash = ? WHERE id = ?", (full_hash, file_id))
             # Keep sparse_hash up to date (in case it was missing)
             if existing_sparse is None and sparse_hash:
                 cur.execute("UPDATE files SET sparse_hash = ? WHERE id = ?", (sparse_hash, file_id))
             
             return file_id
 
+    def fetch_sparse_only_hashes(self) -> Set[str]:
+        """Sparse hashes of rows that have no full hash yet."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT sparse_hash FROM files WHERE hash IS NULL AND sparse_hash IS NOT NULL")
+        return {h for (h,) in cur.fetchall()}
+
+    def fetch_sparse_only_files(self, sparse_hash: str) -> List[Tuple[int, str, Optional[str], int]]:
+        """Returns (id, orig_path, dest_path, size_bytes) of rows known only by this sparse hash."""
+        cur = self.conn.cursor()
+        cur.execute("""
+            SELECT id, orig_path, dest_path, size_bytes
+            FROM files WHERE sparse_hash = ? AND hash IS NULL
+        """, (sparse_hash,))
+        return cur.fetchall()
+
+    def set_full_hash(self, file_id: int, full_hash: str) -> bool:
+        """
+        Records the confirmed full hash of a sparse-only row. Returns False
+        (leaving the row as it was) if another row already has that hash.
+        """
+        try:
+            self.conn.execute("UPDATE files SET hash = ? WHERE id = ?", (full_hash, file_id))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
     def upsert_media_metadata(self, file_id: int, rec: FileRecord):
         """Updates content metadata (Dimensions, Duration, Time)."""
         capture_str = rec.capture_datetime.isoformat() if rec.capture_datetime else None
@@ -89,15 +143,32 @@ class DBOperations:
         if rec.width and rec.height:
             aspect = rec.width / rec.height
 
+        # UPSERT updates in place; INSERT OR REPLACE would delete + re-insert
         self.conn.execute("""
-            INSERT OR REPLACE INTO media_metadata
+            INSERT INTO media_metadata
             (file_id, capture_datetime, camera_model, lens_model, width, height, duration_sec, aspect_ratio, phash)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(file_id) DO UPDATE SET
+                capture_datetime = excluded.capture_datetime,
+                camera_model = excluded.camera_model,
+                lens_model = excluded.lens_model,
+                width = excluded.width,
+                height = excluded.height,
+                duration_sec = excluded.duration_sec,
+                aspect_ratio = excluded.aspect_ratio,
+                phash = excluded.phash
         """, (
             file_id, capture_str, rec.camera_model, rec.lens_model, 
             rec.width, rec.height, rec.duration_sec, aspect, rec.phash
         ))
 
+    def analyze_after_bulk(self):
+        """Refreshes planner statistics once a bulk ingest has finished."""
+        self.conn.execute("ANALYZE files;")
+        self.conn.execute("ANALYZE file_occurrences;")
+        self.conn.execute("ANALYZE media_metadata;")
+        self.conn.commit()
+
     def fetch_primary_files(self) -> List[Tuple[int, str, str, str, Optional[str]]]:
         """Fetches RAW, VIDEO, TIFF files that need destination assignment."""
         cur = self.conn.cursor()
@@ -109,8 +180,11 @@ class DBOperations:
         """)
         return cur.fetchall()
 
-    def fetch_jpeg_groups(self) -> List[Dict[str, Any]]:
-        """Fetches JPEGs to group them by visual content/time."""
+    def fetch_jpeg_groups(self) -> Iterator[Tuple[int, str, str, Optional[str], Optional[int], Optional[int]]]:
+        """
+        Fetches JPEGs to group them by visual content/time.
+        Streams (id, orig_name, orig_path, capture_datetime, width, height) tuples.
+        """
         cur = self.conn.cursor()
         cur.execute("""
             SELECT f.id, f.orig_name, f.orig_path, m.capture_datetime, m.width, m.height
@@ -118,14 +192,7 @@ class DBOperations:
             LEFT JOIN media_metadata m ON f.id = m.file_id
             WHERE f.type = 'jpeg'
         """)
-        # We return dicts to make the logic layer cleaner
-        return [
-            {
-                'id': r[0], 'name': r[1], 'path': r[2], 
-                'capture_dt': r[3], 'w': r[4], 'h': r[5]
-            } 
-            for r in cur.fetchall()
-        ]
+        yield from cur
 
     def update_dest_path(self, file_id: int, dest_path: str):
         self.conn.execute("UPDATE files SET dest_path = ? WHERE id = ?", (dest_path, file_id))
@@ -142,10 +209,16 @@ class DBOperations:
             used[p.parent].add(p.name)
         return used
 
-    def get_pending_moves(self) -> List[Tuple[int, str, str, str, Optional[str], Optional[str]]]:
-        """Returns (id, orig_path, dest_path, type, hash, sparse_hash) for files ready to move."""
+    def get_pending_moves(self) -> List[Tuple[int, str, str, str, Optional[str], Optional[str], int, Optional[int]]]:
+        """
+        Returns (id, orig_path, dest_path, type, hash, sparse_hash, is_seed, size_bytes)
+        for files ready to move.
+        """
         cur = self.conn.cursor()
-        cur.execute("SELECT id, orig_path, dest_path, type, hash, sparse_hash FROM files WHERE dest_path IS NOT NULL")
+        cur.execute("""
+            SELECT id, orig_path, dest_path, type, hash, sparse_hash, is_seed, size_bytes
+            FROM files WHERE dest_path IS NOT NULL
+        """)
         return cur.fetchall()
 
     def fetch_known_sparse_hashes(self) -> Set[str]:
@@ -160,6 +233,55 @@ class DBOperations:
         hashes.update(h[0] for h in cur.fetchall() if h[0])
         return hashes
 
+    def fetch_hashes_with_metadata(self) -> Set[str]:
+        """
+        Returns the full hashes of catalogued files that already have a
+        media_metadata row, and the sparse hashes of those known only by one
+        (sparse hashes are 's-' prefixed, so one set holds both).
+        """
+        cur = self.conn.cursor()
+        cur.execute("""
+            SELECT f.hash, f.sparse_hash
+            FROM files f
+            JOIN media_metadata m ON m.file_id = f.id
+        """)
+        hashes: Set[str] = set()
+        for full_hash, sparse_hash in cur:
+            if full_hash:
+                hashes.add(full_hash)
+            elif sparse_hash:
+                hashes.add(sparse_hash)
+        return hashes
+
+    def fetch_known_sizes(self) -> Set[int]:
+        """Returns every file size in the catalog (for the hashing size prefilter)."""
+        cur = self.conn.cursor()
+        cur.execute("SELECT DISTINCT size_bytes FROM files WHERE size_bytes IS NOT NULL")
+        return {row[0] for row in cur.fetchall()}
+
+    def get_hash_algorithm(self) -> str:
+        """The catalog's full-hash algorithm ("blake3" or "sha256"), fixed at creation."""
+        try:
+            row = self.conn.execute("SELECT value FROM catalog_meta WHERE key = 'hash_algorithm'").fetchone()
+        except sqlite3.OperationalError:
+            row = None  # older catalog opened read-only, before init_schema recorded it
+        return row[0] if row else detect_hash_algorithm(self.conn)
+
+    def fetch_hash_cache(self) -> Dict[str, Tuple[float, int, str, Optional[str]]]:
+        """
+        path -> (mtime, size_bytes, full hash, sparse hash) for every occurrence
+        recorded with a full hash. The scanner reuses the hash of a file whose
+        mtime and size are unchanged instead of reading it again.
+        """
+        cur = self.conn.execute("""
+            SELECT o.path, o.mtime, o.size_bytes, o.hash, f.sparse_hash
+            FROM file_occurrences o
+            JOIN files f ON f.id = o.file_id
+            WHERE o.hash_is_sparse = 0
+        """)
+        return {path: (mtime, size, full_hash, sparse_hash)
+                for path, mtime, size, full_hash, sparse_hash in cur}
+
     def record_occurrence(
         self,
         file_id: int,
@@ -171,11 +293,31 @@ class DBOperations:
         is_sparse: bool,
     ):
         """Tracks a specific on-disk occurrence (source or destination) for reporting/dedup."""
-        self.conn.execute(
+        self.bulk_record_occurrences(
+            [(str(path), file_id, int(is_seed), mtime, size_bytes, hash_value, int(is_sparse))]
+        )
+
+    def bulk_record_occurrences(self, rows: List[Tuple[str, int, int, float, int, str, int]]):
+        """
+        Records many occurrences with one executemany.
+        Rows are (path, file_id, is_seed, mtime, size_bytes, hash, hash_is_sparse);
+        paths are stored normalized, like files.orig_path.
+        """
+        _, now_epoch = self._now()
+        self.conn.executemany(
             """
-            INSERT OR REPLACE INTO file_occurrences
+            INSERT INTO file_occurrences
             (path, file_id, is_seed, seen_at, mtime, size_bytes, hash, hash_is_sparse)
-            VALUES (?, ?, ?, strftime('%s','now'), ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                file_id = excluded.file_id,
+                is_seed = excluded.is_seed,
+                seen_at = excluded.seen_at,
+                mtime = excluded.mtime,
+                size_bytes = excluded.size_bytes,
+                hash = excluded.hash,
+                hash_is_sparse = excluded.hash_is_sparse
             """,
-            (str(path), file_id, int(is_seed), mtime, size_bytes, hash_value, int(is_sparse)),
+            ((os.path.normpath(path), file_id, is_seed, now_epoch, mtime, size_bytes, hash_value, is_sparse)
+             for path, file_id, is_seed, mtime, size_bytes, hash_value, is_sparse in rows),
         )
@@ -1,16 +1,63 @@
 """
 Database schema definitions.
 """
+import os
 import sqlite3
 import logging
 
-CURRENT_SCHEMA_VERSION = 1
+from .. import config
+
+CURRENT_SCHEMA_VERSION = 4
+
+# Performance Tuning (Safe for single-writer, multi-reader)
+# ~200MB cache, 1GB mmap window, fewer mid-scan WAL checkpoints.
+# page_size only takes effect on a new (empty) DB.
+CONNECTION_PRAGMAS = """
+    PRAGMA page_size=32768;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-200000;
+    PRAGMA mmap_size=1073741824;
+    PRAGMA wal_autocheckpoint=10000;
+    PRAGMA busy_timeout=5000;
+    PRAGMA foreign_keys=ON;
+"""
+
+# Read-only connections (reporting): same cache/mmap sizing, and query_only
+# guards against accidental writes. WAL lets them read while a writer runs.
+READ_ONLY_PRAGMAS = """
+    PRAGMA query_only=1;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-200000;
+    PRAGMA mmap_size=1073741824;
+    PRAGMA busy_timeout=5000;
+"""
+
+# WITHOUT ROWID: rows live directly in the path-keyed b-tree, so there is
+# no hidden rowid and no separate unique index on path to maintain.
+FILE_OCCURRENCES_DDL = """
+    CREATE TABLE IF NOT EXISTS file_occurrences (
+        path TEXT PRIMARY KEY,
+        file_id INTEGER NOT NULL,
+        is_seed INTEGER NOT NULL DEFAULT 0,
+        seen_at REAL NOT NULL, 
+        mtime REAL NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        hash_is_sparse INTEGER NOT NULL DEFAULT 0,         
+        FOREIGN KEY(file_id) REFERENCES files(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+"""
 
 def init_schema(conn: sqlite3.Connection):
     """
     Applies the core schema to the database.
     Idempotent: safe to run on every startup.
     """
+    # Connection-level settings; applied before the schema transaction
+    conn.executescript(CONNECTION_PRAGMAS)
+
     with conn:
         # 1. Version Tracking (For future migrations)
         conn.execute("""
@@ -22,15 +69,25 @@ def init_schema(conn: sqlite3.Connection):
         # Initialize version if missing
         cur = conn.cursor()
         cur.execute("SELECT version FROM schema_version")
-        if not cur.fetchone():
+        row = cur.fetchone()
+        if not row:
             conn.execute("INSERT INTO schema_version (version) VALUES (?)", (CURRENT_SCHEMA_VERSION,))
+        stored_version = row[0] if row else CURRENT_SCHEMA_VERSION
+
+        # Per-catalog settings that must never change once files are hashed
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
 
         # 2. Core File Table
         # Stores the "Identity" of the file (Size, Hash, Path)
         conn.execute("""
         CREATE TABLE IF NOT EXISTS files (
             id              INTEGER PRIMARY KEY AUTOINCREMENT,
-            hash            TEXT UNIQUE,          -- Full SHA-256 if known
+            hash            TEXT UNIQUE,          -- Full hash if known (catalog_meta.hash_algorithm)
             sparse_hash     TEXT,                 -- Sparse fingerprint hint for large files
             type            TEXT NOT NULL,
             ext             TEXT NOT NULL,
@@ -41,9 +98,12 @@ def init_schema(conn: sqlite3.Connection):
             is_seed         INTEGER NOT NULL DEFAULT 0,
             name_score      INTEGER NOT NULL DEFAULT 0,
             first_seen_at   TEXT NOT NULL,
-            last_seen_at    TEXT NOT NULL
+            last_seen_at    TEXT NOT NULL,
+            parent_dir      TEXT,                 -- Directory of orig_path (sidecar join key)
+            stem_lower      TEXT                  -- Lowercased stem of orig_path (sidecar join key)
         );
         """)
+        _migrate_files_path_keys(conn)
 
         # 3. Media Metadata (Enrichment Phase)
         # Stores "Content" info (Time, Dimensions, Camera)
@@ -99,26 +159,102 @@ def init_schema(conn: sqlite3.Connection):
 
         # 5. Indices for Performance
         conn.execute("CREATE INDEX IF NOT EXISTS idx_files_type ON files(type);")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_hash ON files(hash);")
+        # files.hash is UNIQUE, which already gives it an index
+        if stored_version < 3:
+            conn.execute("DROP INDEX IF EXISTS idx_files_hash;")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_files_sparse_hash ON files(sparse_hash);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_parent_stem ON files(type, parent_dir, stem_lower);")
+        # Covering index for PSD/source name lookups (rowid id rides along implicitly)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_type_name ON files(type, orig_name);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_media_capture_dt ON media_metadata(capture_datetime);")
 
         # 6. Logging (Scan Session Data)
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS file_occurrences (
-            path TEXT PRIMARY KEY,
-            file_id INTEGER NOT NULL,
-            is_seed INTEGER NOT NULL DEFAULT 0,
-            seen_at REAL NOT NULL, 
-            mtime REAL NOT NULL,
-            size_bytes INTEGER NOT NULL,
-            hash TEXT NOT NULL,
-            hash_is_sparse INTEGER NOT NULL DEFAULT 0,         
-            FOREIGN KEY(file_id) REFERENCES files(id) ON DELETE CASCADE
-        )
-    """)
+        if stored_version < 4:
+            _migrate_file_occurrences_without_rowid(conn)
+        conn.execute(FILE_OCCURRENCES_DDL)
         conn.execute("CREATE INDEX IF NOT EXISTS idx_file_occurrences_hash ON file_occurrences(hash);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_file_occurrences_file_id ON file_occurrences(file_id);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_file_occurrences_mtime ON file_occurrences(mtime);")
 
+        _init_hash_algorithm(conn)
+
+        conn.execute("UPDATE schema_version SET version = ?", (CURRENT_SCHEMA_VERSION,))
+
     logging.debug("Database schema initialized.")
+
+
+def optimize_on_close(conn: sqlite3.Connection):
+    """Lets SQLite refresh planner statistics that went stale during this session."""
+    try:
+        conn.execute("PRAGMA analysis_limit=400;")
+        conn.execute("PRAGMA optimize;")
+    except sqlite3.Error as e:
+        logging.debug(f"PRAGMA optimize failed: {e}")
+
+
+def path_keys(path_str: str) -> tuple[str, str]:
+    """(parent_dir, stem_lower) for a path, as stored on the files table."""
+    parent, name = os.path.split(path_str)
+    stem = os.path.splitext(name)[0]
+    return parent, stem.lower()
+
+
+def detect_hash_algorithm(conn: sqlite3.Connection) -> str:
+    """
+    The algorithm a catalog's stored full hashes were made with (BLAKE3
+    digests carry a 'b3-' prefix, SHA-256 ones none); config.FULL_HASH_ALGORITHM
+    when it has none yet.
+    """
+    row = conn.execute("SELECT hash FROM files WHERE hash IS NOT NULL LIMIT 1").fetchone()
+    if row is None:
+        return config.FULL_HASH_ALGORITHM
+    return "blake3" if row[0].startswith("b3-") else "sha256"
+
+
+def _init_hash_algorithm(conn: sqlite3.Connection):
+    """
+    Records which full-hash algorithm this catalog uses, once. Catalogs that
+    predate the record keep the algorithm of the hashes they already hold.
+    """
+    if conn.execute("SELECT 1 FROM catalog_meta WHERE key = 'hash_algorithm'").fetchone():
+        return
+    conn.execute("INSERT INTO catalog_meta (key, value) VALUES ('hash_algorithm', ?)",
+                 (detect_hash_algorithm(conn),))
+
+
+def _migrate_files_path_keys(conn: sqlite3.Connection):
+    """v2: add parent_dir/stem_lower to catalogs created before they existed."""
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+    if "parent_dir" in cols:
+        return
+
+    logging.info("Migrating catalog: adding parent_dir/stem_lower to files...")
+    conn.execute("ALTER TABLE files ADD COLUMN parent_dir TEXT")
+    conn.execute("ALTER TABLE files ADD COLUMN stem_lower TEXT")
+    rows = conn.execute("SELECT id, orig_path FROM files").fetchall()
+    conn.executemany(
+        "UPDATE files SET parent_dir = ?, stem_lower = ? WHERE id = ?",
+        ((*path_keys(path_str), fid) for fid, path_str in rows),
+    )
+
+
+def _migrate_file_occurrences_without_rowid(conn: sqlite3.Connection):
+    """v4: rebuild a rowid file_occurrences table as WITHOUT ROWID."""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'file_occurrences'"
+    ).fetchone()
+    if row is None or "WITHOUT ROWID" in row[0].upper():
+        return
+
+    logging.info("Migrating catalog: rebuilding file_occurrences as WITHOUT ROWID...")
+    # The old table's indices go with it; init_schema recreates them on the new one
+    conn.execute("ALTER TABLE file_occurrences RENAME TO file_occurrences_old")
+    conn.execute(FILE_OCCURRENCES_DDL)
+    conn.execute("""
+        INSERT OR IGNORE INTO file_occurrences
+            (path, file_id, is_seed, seen_at, mtime, size_bytes, hash, hash_is_sparse)
+        SELECT path, file_id, is_seed, seen_at, mtime, size_bytes, hash, hash_is_sparse
+        FROM file_occurrences_old
+        WHERE path IS NOT NULL
+    """)
+    conn.execute("DROP TABLE file_occurrences_old")
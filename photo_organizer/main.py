@@ -1,10 +1,10 @@
 import argparse
 import logging
-import sqlite3
 import sys
 from pathlib import Path
 
 from .core import PhotoOrganizerApp
+from .database.db import connect_read_only
 from .database.ops import DBOperations
 from .database.schema import init_schema
 from .reporting import ReportGenerator
@@ -40,6 +40,7 @@ def parse_args():
     p.add_argument("--move", action="store_true", help="Move files instead of Copying")
     p.add_argument("--dry-run", action="store_true", help="Simulate actions without modifying disk")
     p.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    p.add_argument("--threads", type=int, default=1, help="Files to copy/move concurrently (default: 1)")
     
     p.add_argument("--db", type=Path, default=None, help="Custom path for SQLite DB (default: dest/photo_catalog.db)")
     p.add_argument("--skip-dirs-file", type=Path, default=None, help="File containing paths to ignore")
@@ -90,8 +91,8 @@ def main():
         
         logging.info("ENTERING REPORT MODE")
         try:
-            # Manually connect for reporting to avoid initializing the full App
-            conn = sqlite3.connect(db_path)
+            # Reporting only reads: a read-only connection, no schema init
+            conn = connect_read_only(db_path)
             db_ops = DBOperations(conn)
             
             reporter = ReportGenerator(db_ops)
@@ -114,7 +115,8 @@ def main():
             is_seed=args.seed,
             move=args.move,
             dry_run=args.dry_run,
-            skip_dirs=skip_dirs
+            skip_dirs=skip_dirs,
+            threads=args.threads
         )
     except KeyboardInterrupt:
         logging.warning("Operation cancelled by user.")
@@ -1,9 +1,12 @@
+import io
 import logging
+import os
 import subprocess
 import json
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, List, Union
 
 from .. import config
 
@@ -21,6 +24,100 @@ except ImportError:
     MediaInfo = None
 
 
+# exifread matches stop_tag against the bare tag name (no "EXIF " prefix).
+# LensModel (0xA434) sorts after every date tag in config.DATE_TAGS.
+_EXIF_STOP_TAG = "LensModel"
+
+# Bytes read up front for image EXIF: covers JPEG APP1 (max 64 KB) and the
+# leading IFDs of TIFF-based RAW formats.
+_EXIF_HEADER_BYTES = 128 * 1024
+
+# "YYYY:MM:DD HH:MM:SS", as written by cameras and reported by exiftool
+_EXIF_DATE_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# The only tags MetadataExtractor._exiftool_data reads; asking for just these
+# keeps exiftool from formatting (and us from parsing) hundreds of others.
+_EXIFTOOL_TAGS = (
+    "-CreateDate", "-CreationDate", "-DateTimeOriginal", "-MediaCreateDate",
+    "-Duration", "-Model", "-CameraModelName", "-Make",
+)
+
+# One extractor per worker process, reused for every file it is handed
+_worker_extractor: Optional["MetadataExtractor"] = None
+
+def _extract_image_worker(path_str: str) -> Tuple[str, Optional[datetime], Optional[str], Optional[str]]:
+    """ProcessPoolExecutor entry point: (path_str, capture_datetime, camera, lens)."""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = MetadataExtractor()
+    dt, camera, lens = _worker_extractor.get_image_metadata(path_str)
+    return path_str, dt, camera, lens
+
+
+class ExifToolSession:
+    """
+    A single long-lived `exiftool -stay_open` process.
+
+    Starting exiftool means starting a Perl interpreter (~100 ms), which used to
+    be paid once per video. The session is started lazily on first use and
+    every request is streamed to the same process via its argfile on stdin.
+    """
+
+    def __init__(self, executable: str = "exiftool"):
+        self.executable = executable
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def execute(self, paths: List[str]) -> List[Dict[str, Any]]:
+        """Returns exiftool's JSON entries (-j -n) for `paths`, in one round trip."""
+        if not paths:
+            return []
+        with self._lock:
+            proc = self._ensure_started()
+            assert proc.stdin is not None and proc.stdout is not None
+            proc.stdin.write("\n".join(paths) + "\n-execute\n")
+            proc.stdin.flush()
+
+            lines = []
+            while True:
+                line = proc.stdout.readline()
+                if not line:
+                    self._proc = None
+                    raise RuntimeError("exiftool exited unexpectedly")
+                if line.rstrip() == "{ready}":
+                    break
+                lines.append(line)
+
+        out = "".join(lines).strip()
+        return json.loads(out) if out else []
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            if proc.stdin:
+                proc.stdin.write("-stay_open\nFalse\n")
+                proc.stdin.flush()
+            proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+
+    def _ensure_started(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            # -common_args applies -j/-n to every -execute'd request
+            self._proc = subprocess.Popen(
+                [self.executable, "-stay_open", "True", "-@", "-",
+                 "-common_args", "-j", "-n", "-charset", "filename=utf8", *_EXIFTOOL_TAGS],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+            )
+        return self._proc
+
+
 class MetadataExtractor:
     """
     Unified interface for extracting metadata from various file types.
@@ -30,7 +127,14 @@ class MetadataExtractor:
       - Video: Uses 'pymediainfo' (fast wrapper) -> falls back to 'exiftool' (robust).
     """
 
-    def get_image_metadata(self, path: Path) -> Tuple[Optional[datetime], Optional[str], Optional[str]]:
+    def __init__(self):
+        self._exiftool = ExifToolSession()
+
+    def close(self):
+        """Stops the background exiftool process, if one was started."""
+        self._exiftool.close()
+
+    def get_image_metadata(self, path: Union[str, Path]) -> Tuple[Optional[datetime], Optional[str], Optional[str]]:
         """
         Extracts metadata from image files (RAW, JPEG, TIFF).
         
@@ -42,9 +146,15 @@ class MetadataExtractor:
             return None, None, None
 
         try:
-            with path.open('rb') as f:
-                # details=False speeds up processing significantly
-                tags = exifread.process_file(f, details=False)
+            with open(path, 'rb', buffering=0) as f:
+                # JPEG APP1 and the TIFF/RAW IFD0 + EXIF IFD sit at the start of
+                # the file: parse an in-memory header and only go back to the
+                # file when that did not yield a date (truncated or late IFDs).
+                head = f.read(_EXIF_HEADER_BYTES)
+                tags = self._process_exif(io.BytesIO(head))
+                if len(head) == _EXIF_HEADER_BYTES and self._parse_exif_date(tags) is None:
+                    f.seek(0)
+                    tags = self._process_exif(io.BufferedReader(f, buffer_size=65536))
 
             dt = self._parse_exif_date(tags)
             
@@ -64,95 +174,137 @@ class MetadataExtractor:
             logging.warning(f"ExifRead failed for {path}: {e}")
             return None, None, None
 
-    def get_video_metadata(self, path: Path) -> Tuple[Optional[datetime], Optional[float], Optional[str]]:
+    def _process_exif(self, fh) -> Dict[str, Any]:
+        """exifread over `fh`; a header cut mid-structure yields {} instead of raising."""
+        try:
+            # details=False speeds up processing significantly;
+            # stop_tag ends the EXIF IFD at the last tag we read
+            return exifread.process_file(fh, details=False, stop_tag=_EXIF_STOP_TAG)
+        except Exception:
+            if isinstance(fh, io.BytesIO):
+                return {}
+            raise
+
+    def get_video_metadata(self, path: Union[str, Path]) -> Tuple[Optional[datetime], Optional[float], Optional[str]]:
         """
         Extracts metadata from video files.
         
         Returns:
             (capture_datetime, duration_sec, camera_model)
         """
-        # Strategy 1: Try MediaInfo (Fastest, usually sufficient)
-        if MediaInfo is not None:
-            try:
-                mi_data = self._extract_mediainfo(path)
-                # Only return if we actually got useful data. 
-                # If both are None, we might as well try ExifTool.
-                if mi_data['dt'] or mi_data['duration']:
-                    return mi_data['dt'], mi_data['duration'], mi_data['camera']
-            except Exception as e:
-                logging.debug(f"MediaInfo failed for {path}: {e}")
+        return self.get_videos_metadata([path])[0]
+
+    def get_videos_metadata(self, paths: List[Union[str, Path]]) -> List[Tuple[Optional[datetime], Optional[float], Optional[str]]]:
+        """
+        get_video_metadata() for many files: MediaInfo per file, then every file
+        it could not date goes to exiftool in a single request.
+        """
+        results: List[Tuple[Optional[datetime], Optional[float], Optional[str]]] = [(None, None, None)] * len(paths)
+        leftovers = []
+
+        for i, path in enumerate(paths):
+            # Strategy 1: Try MediaInfo (Fastest, usually sufficient)
+            if MediaInfo is not None:
+                try:
+                    mi_data = self._extract_mediainfo(path)
+                    # Only return if we actually got useful data. 
+                    # If both are None, we might as well try ExifTool.
+                    if mi_data['dt'] or mi_data['duration']:
+                        results[i] = (mi_data['dt'], mi_data['duration'], mi_data['camera'])
+                        continue
+                except Exception as e:
+                    logging.debug(f"MediaInfo failed for {path}: {e}")
+            leftovers.append(i)
+
+        if not leftovers:
+            return results
 
         # Strategy 2: Try ExifTool (Robust fallback, requires system install)
         # We do NOT use ffmpeg here as requested.
         try:
-            et_data = self._extract_exiftool(path)
-            if et_data['dt'] or et_data['duration']:
-                return et_data['dt'], et_data['duration'], et_data['camera']
+            batch = self.extract_videos_batch([paths[i] for i in leftovers])
         except Exception as e:
             # Only log at debug level to avoid spamming console if tool is missing
-            logging.debug(f"ExifTool failed for {path}: {e}")
+            logging.debug(f"ExifTool failed for {len(leftovers)} file(s): {e}")
+            return results
 
-        return None, None, None
+        for i, et_data in zip(leftovers, batch):
+            if et_data['dt'] or et_data['duration']:
+                results[i] = (et_data['dt'], et_data['duration'], et_data['camera'])
+        return results
 
     # --- Internal Extraction Helpers ---
 
-    def _extract_mediainfo(self, path: Path) -> Dict[str, Any]:
+    def _extract_mediainfo(self, path: Union[str, Path]) -> Dict[str, Any]:
         """Parses video using pymediainfo."""
-        mi = MediaInfo.parse(str(path))
+        # parse_speed=0 reads only the container headers; we never need stream
+        # details, only the General track's duration, dates and device fields.
+        mi = MediaInfo.parse(str(path), parse_speed=0)
         data: Dict[str, Any] = {'dt': None, 'duration': None, 'camera': None}
-        
-        for track in mi.tracks:
-            if track.track_type == "General":
-                if getattr(track, "duration", None):
-                    # MediaInfo duration is in milliseconds
-                    data['duration'] = float(track.duration) / 1000.0
-
-                # Priority: Original -> Encoded -> Tagged -> Modified
-                # We check multiple fields because different cameras write to different tags.
-                date_candidates = [
-                    "recorded_date", 
-                    "encoded_date", 
-                    "tagged_date", 
-                    "file_last_modification_date"
-                ]
-                
-                for field in date_candidates:
-                    val = getattr(track, field, None)
-                    if val:
-                        dt = self._parse_flexible_date(val)
-                        if dt:
-                            data['dt'] = dt
-                            break
-
-                # Attempt to find camera model in common fields
-                data['camera'] = (
-                    getattr(track, "performer", None) or
-                    getattr(track, "device_model", None) or
-                    getattr(track, "encoded_library", None)
-                )
+
+        track = next((t for t in mi.tracks if t.track_type == "General"), None)
+        if track is None:
+            return data
+
+        if getattr(track, "duration", None):
+            # MediaInfo duration is in milliseconds
+            data['duration'] = float(track.duration) / 1000.0
+
+        # Priority: Original -> Encoded -> Tagged -> Modified
+        # We check multiple fields because different cameras write to different tags.
+        date_candidates = [
+            "recorded_date", 
+            "encoded_date", 
+            "tagged_date", 
+            "file_last_modification_date"
+        ]
+
+        for field in date_candidates:
+            val = getattr(track, field, None)
+            if val:
+                dt = self._parse_flexible_date(val)
+                if dt:
+                    data['dt'] = dt
+                    break
+
+        # Attempt to find camera model in common fields
+        data['camera'] = (
+            getattr(track, "performer", None) or
+            getattr(track, "device_model", None) or
+            getattr(track, "encoded_library", None)
+        )
         return data
 
-    def _extract_exiftool(self, path: Path) -> Dict[str, Any]:
+    def extract_videos_batch(self, paths: List[Union[str, Path]]) -> List[Dict[str, Any]]:
+        """
+        Runs exiftool over many files in a single request.
+        Returns one {'dt', 'duration', 'camera'} dict per input path, in order.
+        """
+        entries = self._exiftool.execute([str(p) for p in paths])
+        # exiftool drops unreadable files from its output, so match on SourceFile
+        by_source = {
+            os.path.normpath(e.get("SourceFile", "")): e for e in entries
+        }
+        return [
+            self._exiftool_data(by_source.get(os.path.normpath(str(p)), {}))
+            for p in paths
+        ]
+
+    def _extract_exiftool(self, path: Union[str, Path]) -> Dict[str, Any]:
         """
         Wraps the 'exiftool' command line utility.
         Must be installed and on the system PATH.
         """
-        # -j = JSON output
-        # -n = No formatting (returns seconds as float, clean dates)
-        cmd = ["exiftool", "-j", "-n", str(path)]
-        
-        # subprocess.check_output is safer than os.system
-        out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
-        data_list = json.loads(out)
+        return self.extract_videos_batch([path])[0]
 
+    def _exiftool_data(self, tags: Dict[str, Any]) -> Dict[str, Any]:
+        """Maps one exiftool JSON entry (-j -n) to our metadata fields."""
         # Explicit type annotation here as well
         data: Dict[str, Any] = {'dt': None, 'duration': None, 'camera': None}
         
-        if not data_list:
+        if not tags:
             return data
         
-        tags = data_list[0]
-        
         # Date Parsing
         date_fields = ["CreateDate", "CreationDate", "DateTimeOriginal", "MediaCreateDate"]
         for field in date_fields:
@@ -182,13 +334,16 @@ class MetadataExtractor:
     def _parse_exif_date(self, tags) -> Optional[datetime]:
         """Helper to parse standard EXIF date strings from exifread."""
         for tag in config.DATE_TAGS:
-            if tag in tags:
-                try:
-                    # EXIF format is usually "YYYY:MM:DD HH:MM:SS"
-                    dt_str = str(tags[tag]).replace(':', '-', 2)
-                    return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    continue
+            val = tags.get(tag)
+            if val is None:
+                continue
+            try:
+                # EXIF format is usually "YYYY:MM:DD HH:MM:SS"; some editors
+                # write "YYYY-MM-DD", so the date's two separators are normalised
+                dt_str = str(val).strip()
+                return datetime.strptime(dt_str[:10].replace('-', ':', 2) + dt_str[10:], _EXIF_DATE_FORMAT)
+            except ValueError:
+                continue
         return None
 
     def _parse_flexible_date(self, dt_str: str) -> Optional[datetime]:
@@ -202,20 +357,21 @@ class MetadataExtractor:
         # Clean up common suffixes/prefixes
         clean = dt_str.replace("UTC", "").strip()
         
-        # 1. Try ISO format (e.g. 2020-01-01T12:00:00)
+        # 1. EXIF style "YYYY:MM:DD HH:MM:SS" (exiftool): fromisoformat would
+        #    only raise on these, so go straight to strptime.
+        if clean[4:5] == ":":
+            return self._parse_exif_style(clean)
+
+        # 2. Try ISO format (e.g. 2020-01-01T12:00:00)
         try:
             return datetime.fromisoformat(clean)
         except ValueError:
-            pass
-            
-        # 2. Try Standard EXIF style "YYYY:MM:DD HH:MM:SS"
+            return None
+
+    def _parse_exif_style(self, clean: str) -> Optional[datetime]:
+        """'YYYY:MM:DD HH:MM:SS[.fff]' -> datetime; sub-seconds are dropped."""
         try:
-            clean_exif = clean.replace(":", "-", 2)
             # Handle potential sub-second precision which strptime hates
-            if "." in clean_exif:
-                clean_exif = clean_exif.split(".")[0]
-            return datetime.strptime(clean_exif, "%Y-%m-%d %H:%M:%S")
+            return datetime.strptime(clean.partition(".")[0], _EXIF_DATE_FORMAT)
         except ValueError:
-            pass
-
-        return None
\ No newline at end of file
+            return None
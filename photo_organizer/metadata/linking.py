@@ -1,10 +1,12 @@
 import logging
+import os
 import re
-from pathlib import Path
-from typing import List, cast, Any
+from typing import List, Tuple, Any
 from collections import defaultdict
 
 # Optional import for PSD analysis
+# Typed as Any once here (as MediaInfo is in extract.py) so call sites need no casts
+PSDImage: Any = None
 try:
     from psd_tools import PSDImage
 except ImportError:
@@ -13,10 +15,21 @@ except ImportError:
 from .. import config
 from ..database.ops import DBOperations
 
+# Trailing duplicate markers stripped from every stem, one after another in
+# this order: "(copy)", then "_copy", then "(2)" -- so "a(1)_copy" -> "a"
+_RE_NORMALIZE = (
+    re.compile(r'\(copy\)$'),
+    re.compile(r'_copy$'),
+    re.compile(r'\(\d+\)$'),
+)
+# Common edit suffixes on PSD names: "_edit", "-final", "_v2", ...
+_RE_EDIT_SUFFIX = re.compile(r'[-_](?:edit|final|v\d+|copy|retouched)$')
+
 class FileLinker:
     """
     Handles relationship discovery between files (RAW<->Sidecar, Source<->PSD).
     These links are critical for Organization Phase to keep files together.
+    Methods do not commit; the caller wraps the linking phase in one transaction.
     """
     def __init__(self, db_ops: DBOperations):
         self.db = db_ops
@@ -24,39 +37,20 @@ class FileLinker:
     def link_raw_sidecars(self):
         """
         Links Sidecar files (.xmp) to RAW files in the same directory with same stem.
+        The join runs inside SQLite on the (type, parent_dir, stem_lower) index.
         """
         logging.info("Linking Sidecar files to RAWs...")
-        cur = self.db.conn.cursor()
-        
-        # Fetch all RAWs and Sidecars
-        # We fetch (id, parent_dir, stem)
-        cur.execute("SELECT id, orig_path FROM files WHERE type = 'raw'")
-        raws = []
-        for rid, path_str in cur.fetchall():
-            p = Path(path_str)
-            raws.append((rid, p.parent, p.stem.lower()))
-
-        cur.execute("SELECT id, orig_path FROM files WHERE type = 'sidecar'")
-        sidecars = defaultdict(list)
-        for sid, path_str in cur.fetchall():
-            p = Path(path_str)
-            # Index by (parent, stem) for O(1) lookup
-            key = (p.parent, p.stem.lower())
-            sidecars[key].append(sid)
-
-        # Match
-        links_made = 0
-        for rid, parent, stem in raws:
-            key = (parent, stem)
-            if key in sidecars:
-                for sid in sidecars[key]:
-                    self.db.conn.execute(
-                        "INSERT OR IGNORE INTO raw_sidecars (raw_file_id, sidecar_file_id) VALUES (?, ?)",
-                        (rid, sid)
-                    )
-                    links_made += 1
-        
-        self.db.conn.commit()
+        cur = self.db.conn.execute("""
+            INSERT OR IGNORE INTO raw_sidecars (raw_file_id, sidecar_file_id)
+            SELECT r.id, s.id
+            FROM files r
+            JOIN files s
+              ON s.type = 'sidecar'
+             AND s.parent_dir = r.parent_dir
+             AND s.stem_lower = r.stem_lower
+            WHERE r.type = 'raw'
+        """)
+        links_made = cur.rowcount
         logging.info(f"Linked {links_made} sidecars.")
 
     def link_psds(self):
@@ -80,69 +74,77 @@ class FileLinker:
         # Build lookup: normalized_stem -> list of IDs
         source_map = defaultdict(list)
         for sid, name in cur.fetchall():
-            stem = self._normalize_stem(Path(name).stem)
+            # os.path.splitext is far cheaper than building a Path per row
+            stem = self._normalize_stem(os.path.splitext(name)[0])
             source_map[stem].append(sid)
 
+        links = []
         for psd_id, psd_name, psd_path_str in psds:
-            self._process_single_psd(psd_id, psd_name, Path(psd_path_str), source_map)
+            links.extend(self._process_single_psd(psd_id, psd_name, psd_path_str, source_map))
 
-        self.db.conn.commit()
+        self._save_psd_links(links)
 
-    def _process_single_psd(self, psd_id: int, name: str, path: Path, source_map: dict):
+    def _process_single_psd(self, psd_id: int, name: str, path: str, source_map: dict) -> List[Tuple[int, int, int, str]]:
+        """Returns (psd_id, src_id, confidence, method) links for one PSD."""
         # 1. Try Stem Matching
-        psd_stem = self._normalize_stem(Path(name).stem)
+        psd_stem = self._normalize_stem(os.path.splitext(name)[0])
         # Remove common edit suffixes for matching
-        clean_stem = re.sub(r'[-_](edit|final|v\d+|copy|retouched)$', '', psd_stem)
+        clean_stem = _RE_EDIT_SUFFIX.sub('', psd_stem)
         
         if clean_stem in source_map:
-            for src_id in source_map[clean_stem]:
-                self._save_psd_link(psd_id, src_id, 100, "stem")
-            return  # Stop if stem match found (highest priority)
+            # Stop if stem match found (highest priority)
+            return [(psd_id, src_id, 100, "stem") for src_id in source_map[clean_stem]]
+
+        links = []
 
         # 2. Try Smart Object Analysis (slower, requires reading file)
-        if PSDImage and path.exists():
+        if PSDImage and os.path.exists(path):
             try:
                 refs = self._extract_psd_references(path)
                 for ref_name in refs:
-                    ref_stem = self._normalize_stem(Path(ref_name).stem)
+                    # Smart object names may carry a directory from the author's machine
+                    ref_stem = self._normalize_stem(os.path.splitext(os.path.basename(ref_name))[0])
                     if ref_stem in source_map:
                         for src_id in source_map[ref_stem]:
-                            self._save_psd_link(psd_id, src_id, 95, "smart_object")
+                            links.append((psd_id, src_id, 95, "smart_object"))
             except Exception as e:
                 logging.debug(f"Failed to parse PSD {path}: {e}")
+        return links
 
-    def _save_psd_link(self, psd_id: int, src_id: int, conf: int, method: str):
-        self.db.conn.execute("""
-            INSERT OR REPLACE INTO psd_source_links 
+    def _save_psd_links(self, links: List[Tuple[int, int, int, str]]):
+        # UPSERT instead of INSERT OR REPLACE (no delete + re-insert); as before,
+        # the last link written for a PSD wins and linked_at is refreshed.
+        self.db.conn.executemany("""
+            INSERT INTO psd_source_links
             (psd_file_id, source_file_id, confidence, link_method)
             VALUES (?, ?, ?, ?)
-        """, (psd_id, src_id, conf, method))
-
-    def _extract_psd_references(self, path: Path) -> List[str]:
+            ON CONFLICT(psd_file_id) DO UPDATE SET
+                source_file_id = excluded.source_file_id,
+                confidence = excluded.confidence,
+                link_method = excluded.link_method,
+                linked_at = CURRENT_TIMESTAMP
+        """, links)
+
+    def _extract_psd_references(self, path: str) -> List[str]:
         # Pylance guard: If library is missing, return empty
         if PSDImage is None:
             return []
 
         refs = []
-        # cast(Any, ...) tells Pylance "Trust me, this object exists"
-        # This fixes "open is not a known attribute of None"
-        psd_class = cast(Any, PSDImage)
-        psd = psd_class.open(path)
+        psd = PSDImage.open(path)
         
         for layer in psd.descendants():
-            # Cast layer to Any to access dynamic attributes like 'smart_object'
-            # This fixes "Cannot access attribute smart_object for class Layer"
-            l_any = cast(Any, layer)
-            
-            if hasattr(l_any, 'smart_object') and l_any.smart_object:
-                so = l_any.smart_object
-                if hasattr(so, 'filename') and so.filename:
-                    refs.append(so.filename)
+            # getattr covers layer classes without a smart_object attribute
+            so = getattr(layer, 'smart_object', None)
+            if not so:
+                continue
+            filename = getattr(so, 'filename', None)
+            if filename:
+                refs.append(filename)
         return refs
 
     def _normalize_stem(self, stem: str) -> str:
         s = stem.lower().strip()
-        s = re.sub(r'\(copy\)$', '', s)
-        s = re.sub(r'_copy$', '', s)
-        s = re.sub(r'\(\d+\)$', '', s)
+        for pattern in _RE_NORMALIZE:
+            s = pattern.sub('', s)
         return s.strip('_- ')
\ No newline at end of file
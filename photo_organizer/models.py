@@ -1,17 +1,18 @@
+import os
 from dataclasses import dataclass
 from datetime import datetime
-from pathlib import Path
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class FileRecord:
     """
     Represents a file found during a scan.
+    Slotted: scans build one per file, so no per-instance __dict__.
     """
     type: str               # raw/jpeg/video/psd/sidecar/tiff/other
     ext: str
     orig_name: str
-    orig_path: Path
+    orig_path: str          # Plain string as walked; wrap in Path only where needed
     size_bytes: int
     is_seed: bool
     name_score: int
@@ -19,6 +20,7 @@ class FileRecord:
     sparse_hash: Optional[str] = None  # Sparse fingerprint hint for large files
     hash_is_sparse: bool = False       # True when only sparse hash was computed
     mtime: Optional[float] = None
+    metadata_loaded: bool = False      # False when the scan skipped extraction (already catalogued)
     
     # Metadata for Organization (needed for folder structure)
     capture_datetime: Optional[datetime] = None
@@ -30,3 +32,8 @@ class FileRecord:
     height: Optional[int] = None
     duration_sec: Optional[float] = None
     phash: Optional[str] = None
+
+    def __post_init__(self):
+        # Accept Path (or any PathLike) from older callers; store the string
+        if not isinstance(self.orig_path, str):
+            self.orig_path = os.fspath(self.orig_path)
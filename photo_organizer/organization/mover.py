@@ -1,12 +1,62 @@
+import errno
+import os
 import shutil
+import sys
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
 from tqdm import tqdm
 from ..database.ops import DBOperations
 
+# Optional: fcntl is POSIX-only (used for the FICLONE reflink ioctl)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Reflink ioctl; fcntl only defines FICLONE on Linux
+_FICLONE = getattr(fcntl, "FICLONE", None) if fcntl else None
+
+# Clone/copy_file_range errors that mean "not supported here", not "copy failed"
+_KERNEL_COPY_UNSUPPORTED = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM, errno.ENOTTY,
+}
+
+# Platforms where shutil.copy2 already avoids a userspace buffer
+_SHUTIL_ZERO_COPY = sys.platform.startswith(("linux", "darwin"))
+
+# Fallback copy buffer: file size / 16, clamped to this range
+COPY_BUFFER_MIN = 1024 * 1024
+COPY_BUFFER_MAX = 8 * 1024 * 1024
+
+# Destination occurrences written per transaction
+OCCURRENCE_FLUSH_SIZE = 500
+
+# Filesystems there are case-insensitive by default: "IMG.JPG" exists if "img.jpg" does
+_CASE_INSENSITIVE_FS = sys.platform.startswith(("win", "darwin"))
+
+def _name_key(name: str) -> str:
+    return name.casefold() if _CASE_INSENSITIVE_FS else name
+
+def _list_names(directory: str) -> Set[str]:
+    """Entry names in directory (as _name_key); empty if it does not exist yet."""
+    try:
+        with os.scandir(directory) as it:
+            return {_name_key(entry.name) for entry in it}
+    except (FileNotFoundError, NotADirectoryError):
+        return set()
+
 class FileMover:
-    def __init__(self, db_ops: DBOperations):
+    def __init__(self, db_ops: DBOperations, threads: int = 1):
+        """
+        Args:
+            threads: Files copied/moved concurrently. Copies are I/O-bound, so
+                     threads overlap them; all DB access stays on this thread
+                     and the catalog is read once, up front, by get_pending_moves().
+        """
         self.db = db_ops
+        self.threads = max(1, threads)
 
     def execute(self, move_mode: bool = False, dry_run: bool = False):
         """
@@ -17,54 +67,168 @@ class FileMover:
         # Filter out files that already exist at destination (idempotency)
         # logic: if dest exists, we assume it's done or requires manual intervention
         to_process = []
-        for file_id, src, dest, _, _, _ in tasks:
-            if not Path(dest).exists():
+        # Catalog columns needed for the occurrence row, keyed by file id
+        file_info: Dict[int, Tuple[Optional[str], Optional[str], int, Optional[int]]] = {}
+        # One directory listing per destination folder instead of a stat per task
+        existing: Dict[str, Set[str]] = {}
+        for file_id, src, dest, _, full_hash, sparse_hash, is_seed, size_bytes in tasks:
+            parent, name = os.path.split(dest)
+            names = existing.get(parent)
+            if names is None:
+                names = existing[parent] = _list_names(parent)
+            if _name_key(name) not in names:
                 to_process.append((file_id, src, dest))
+                file_info[file_id] = (full_hash, sparse_hash, is_seed, size_bytes)
 
         if not to_process:
             logging.info("No files need moving.")
             return
 
-        logging.info(f"Processing {len(to_process)} files (Move={move_mode}, DryRun={dry_run})...")
+        logging.info(f"Processing {len(to_process)} files (Move={move_mode}, DryRun={dry_run}, Threads={self.threads})...")
         
-        for file_id, src_str, dest_str in tqdm(to_process, desc="Organizing"):
-            src = Path(src_str)
-            dest = Path(dest_str)
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            futures = [
+                executor.submit(self._process_one, file_id, src_str, dest_str, move_mode, dry_run)
+                for file_id, src_str, dest_str in to_process
+            ]
+            occurrences = []
+            self.db.begin_batch()
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Organizing"):
+                result = future.result()
+                if result is None:
+                    continue
+                row = self._occurrence_row(*result, file_info)
+                if row is not None:
+                    occurrences.append(row)
+                if len(occurrences) >= OCCURRENCE_FLUSH_SIZE:
+                    self._flush_occurrences(occurrences)
+            self._flush_occurrences(occurrences)
+            self.db.end_batch()
+
+    def _process_one(self,
+                     file_id: int,
+                     src_str: str,
+                     dest_str: str,
+                     move_mode: bool,
+                     dry_run: bool) -> Optional[Tuple[int, str, os.stat_result]]:
+        """
+        Copies/moves one file (worker thread; no DB access here).
+        Returns (file_id, dest_str, dest_stat) on success, None otherwise.
+        Works on the path strings directly: every call below takes a str.
+        """
+        if dry_run:
+            logging.info(f"[DRY RUN] {'Move' if move_mode else 'Copy'} {src_str} -> {dest_str}")
+            return None
+
+        try:
+            os.makedirs(os.path.dirname(dest_str), exist_ok=True)
             
-            if dry_run:
-                logging.info(f"[DRY RUN] {'Move' if move_mode else 'Copy'} {src} -> {dest}")
-                continue
+            if move_mode:
+                self._move_file(src_str, dest_str)
+            else:
+                self._copy_file(src_str, dest_str)
+
+            return file_id, dest_str, os.stat(dest_str)
+        except Exception as e:
+            logging.error(f"Failed to process {src_str} -> {dest_str}: {e}")
+            return None
 
+    def _occurrence_row(self,
+                        file_id: int,
+                        dest_str: str,
+                        dest_stat: os.stat_result,
+                        file_info: Dict[int, Tuple[Optional[str], Optional[str], int, Optional[int]]]
+                        ) -> Optional[Tuple[str, int, int, float, int, str, int]]:
+        """Builds the occurrence row for a new copy, or None if its file has no hash."""
+        full_hash, sparse_hash, is_seed, size_bytes = file_info[file_id]
+        hash_value = full_hash or sparse_hash
+        if not hash_value:
+            return None
+        return (
+            dest_str,
+            file_id,
+            int(is_seed),
+            dest_stat.st_mtime,
+            size_bytes or dest_stat.st_size,
+            hash_value,
+            int(full_hash is None),
+        )
+
+    def _flush_occurrences(self, rows: List[Tuple[str, int, int, float, int, str, int]]):
+        """Writes buffered occurrence rows in one transaction (calling thread only)."""
+        if not rows:
+            return
+        try:
+            with self.db.conn:
+                self.db.bulk_record_occurrences(rows)
+        except Exception as record_err:
+            logging.error(f"Failed to record {len(rows)} destination occurrences: {record_err}")
+        rows.clear()
+        self.db.begin_batch()
+
+    def _move_file(self, src_str: str, dest_str: str):
+        """
+        Same-filesystem moves are a plain rename; shutil.move's copy + delete
+        only runs when the kernel reports a cross-device move (EXDEV).
+        """
+        try:
+            os.rename(src_str, dest_str)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src_str, dest_str)
+
+    def _copy_file(self, src: Union[str, Path], dest: Union[str, Path]):
+        """
+        Same result as shutil.copy2, but the data is copied in-kernel when the
+        platform allows: a reflink clone (FICLONE) on btrfs/xfs, otherwise
+        copy_file_range (server-side on NFS 4.2). Falls back to shutil.copy2,
+        which itself uses sendfile on Linux.
+        """
+        if _FICLONE is not None or hasattr(os, "copy_file_range"):
             try:
-                dest.parent.mkdir(parents=True, exist_ok=True)
-                
-                if move_mode:
-                    shutil.move(str(src), str(dest))
-                else:
-                    shutil.copy2(str(src), str(dest))
-
-                try:
-                    dest_stat = dest.stat()
-                    cur = self.db.conn.cursor()
-                    cur.execute(
-                        "SELECT hash, sparse_hash, is_seed, size_bytes FROM files WHERE id = ?",
-                        (file_id,),
-                    )
-                    row = cur.fetchone()
-                    if row:
-                        full_hash, sparse_hash, is_seed, size_bytes = row
-                        hash_value = full_hash or sparse_hash
-                        if hash_value:
-                            self.db.record_occurrence(
-                                file_id=file_id,
-                                path=dest,
-                                is_seed=bool(is_seed),
-                                mtime=dest_stat.st_mtime,
-                                size_bytes=size_bytes or dest_stat.st_size,
-                                hash_value=hash_value,
-                                is_sparse=full_hash is None,
-                            )
-                except Exception as record_err:
-                    logging.debug(f"Failed to record occurrence for {dest}: {record_err}")
-            except Exception as e:
-                logging.error(f"Failed to process {src} -> {dest}: {e}")
+                with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+                    self._kernel_copy(fsrc.fileno(), fdst.fileno())
+                shutil.copystat(src, dest)
+                return
+            except OSError as e:
+                if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                    raise
+                logging.debug(f"In-kernel copy unavailable for {src}: {e}")
+
+        if _SHUTIL_ZERO_COPY:
+            # shutil.copy2 uses sendfile (Linux) / fcopyfile (macOS) here
+            shutil.copy2(src, dest)
+        else:
+            self._buffered_copy(src, dest)
+            shutil.copystat(src, dest)
+
+    def _buffered_copy(self, src: Union[str, Path], dest: Union[str, Path]):
+        """
+        Userspace copy with a buffer sized to the file (1-8 MB), read with
+        readinto() into one reused buffer instead of shutil's fixed chunk.
+        """
+        size = os.stat(src).st_size
+        buf = bytearray(min(max(COPY_BUFFER_MIN, size >> 4), COPY_BUFFER_MAX))
+        view = memoryview(buf)
+        with open(src, 'rb', buffering=0) as fsrc, open(dest, 'wb') as fdst:
+            while n := fsrc.readinto(view):
+                fdst.write(view[:n])
+
+    def _kernel_copy(self, fd_in: int, fd_out: int):
+        """Clones fd_in into fd_out, or copies it with copy_file_range."""
+        if _FICLONE is not None:
+            try:
+                fcntl.ioctl(fd_out, _FICLONE, fd_in)
+                return
+            except OSError as e:
+                if e.errno not in _KERNEL_COPY_UNSUPPORTED or not hasattr(os, "copy_file_range"):
+                    raise
+
+        remaining = os.fstat(fd_in).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fd_in, fd_out, remaining)
+            if copied == 0:
+                # Source reports a size it cannot deliver this way (e.g. procfs)
+                raise OSError(errno.EINVAL, "copy_file_range made no progress")
+            remaining -= copied
@@ -12,6 +12,8 @@ class DestinationPlanner:
         self.db = db_ops
         # Cache used names to prevent collisions within a single run
         self.used_names = defaultdict(set) 
+        # Bound once per planner instead of looking the pattern up per file
+        self._folder_name = config.FOLDER_PATTERN.format
 
     def plan_all(self, dest_root: Path):
         """
@@ -40,7 +42,7 @@ class DestinationPlanner:
             
             # Determine Folder: output/YYYY/YYYY-MM or raw/YYYY/YYYY-MM
             base_folder = "raw" if ftype == 'raw' else "output"
-            folder = dest_root / base_folder / config.FOLDER_PATTERN.format(year=dt.year, month=dt.month)
+            folder = dest_root / base_folder / self._folder_name(year=dt.year, month=dt.month)
             
             # Determine Filename
             stem = Path(orig_name).stem
@@ -60,39 +62,38 @@ class DestinationPlanner:
         groups = defaultdict(list)
 
         # Grouping Pass
-        for row in rows:
-            dt = self._parse_or_fallback(row['capture_dt'], row['path'])
+        for fid, name, path_str, capture_str, w, h in rows:
+            dt = self._parse_or_fallback(capture_str, path_str)
             # Normalize stem to group "IMG_123" and "IMG_123 (copy)"
-            norm_stem = self._normalize_stem(Path(row['name']).stem)
+            norm_stem = self._normalize_stem(Path(name).stem)
             
             # Key: (NormalizedName, TimestampToSeconds)
             key = (norm_stem, int(dt.timestamp()))
-            groups[key].append({**row, 'parsed_dt': dt})
+            groups[key].append((fid, name, dt, w, h))
 
         # Assignment Pass
         for group in groups.values():
             # Find "Best" (Main) Image based on pixels
-            best = max(group, key=lambda x: (x['w'] or 0) * (x['h'] or 0))
+            best = max(group, key=lambda x: (x[3] or 0) * (x[4] or 0))
             
             for item in group:
-                dt = item['parsed_dt']
-                folder = dest_root / "output" / config.FOLDER_PATTERN.format(year=dt.year, month=dt.month)
+                fid, name, dt, w, h = item
+                folder = dest_root / "output" / self._folder_name(year=dt.year, month=dt.month)
                 
-                stem = Path(item['name']).stem
-                ext = Path(item['name']).suffix
+                stem = Path(name).stem
+                ext = Path(name).suffix
                 dt_str = dt.strftime("%Y-%m-%d_%H-%M-%S")
 
-                if item == best:
+                if item is best:
                     # Main version
                     new_name = f"{stem}_{dt_str}{ext}"
                 else:
                     # Resized version
-                    w, h = item['w'], item['h']
                     dim_str = f"_{w}x{h}" if w and h else ""
                     new_name = f"{stem}_resized{dim_str}_{dt_str}{ext}"
 
                 final_path = self._resolve_collision(folder, new_name)
-                self.db.update_dest_path(item['id'], str(final_path))
+                self.db.update_dest_path(fid, str(final_path))
 
     
     def _plan_orphaned_psds(self, dest_root: Path):
@@ -116,7 +117,7 @@ class DestinationPlanner:
             dt = self._parse_or_fallback(capture_str, path_str)
             
             # Save to "output/YYYY/..." just like JPEGs
-            folder = dest_root / "output" / config.FOLDER_PATTERN.format(year=dt.year, month=dt.month)
+            folder = dest_root / "output" / self._folder_name(year=dt.year, month=dt.month)
             
             stem = Path(name).stem
             ext = Path(name).suffix
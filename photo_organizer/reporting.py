@@ -1,25 +1,60 @@
 import csv
+import io
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
+from typing import BinaryIO, Iterator, Optional, Dict, List, Set, Tuple
 
 from .database.ops import DBOperations
 from .scanning.filesystem import DiskScanner
 from .scanning.hasher import FileHasher
 from . import config
 
+# Upper bound on remembered hashes; beyond it files are simply re-hashed
+HASH_CACHE_MAX_ENTRIES = 100_000
+
+# Row columns after (path, status) for files of an unsupported type
+_IGNORED_TAIL = ("other", "", "", "Unsupported extension")
+
+# Files analysed (and rows written) per block, and the CSV file's buffer
+REPORT_BATCH_SIZE = 1000
+REPORT_WRITE_BUFFER = 4 << 20
+
+
+def _path_key(path_str: str) -> str:
+    """
+    Comparison key for a path: pure string normalization, no filesystem calls.
+    Scanned paths are stored absolute (the CLI resolves the source root), so
+    resolve() per file and per catalog row was only adding syscalls.
+    """
+    return os.path.normcase(os.path.normpath(path_str))
+
+
+# DBOperations stores paths already normalized, so catalog rows only need
+# normcase -- and off Windows that is the identity, so rows are used as-is.
+_CASE_FOLDING = os.path.normcase("A") != "A"
+
+
 class ReportGenerator:
-    def __init__(self, db_ops: DBOperations):
+    def __init__(self, db_ops: DBOperations, hash_workers: Optional[int] = None):
         self.db = db_ops
-        self.hasher = FileHasher()
-        self.scanner = DiskScanner()
+        # Hashes are compared against the catalog's, so use its algorithm
+        hash_algorithm = db_ops.get_hash_algorithm()
+        self.hasher = FileHasher(hash_algorithm)
+        self.scanner = DiskScanner(hash_algorithm=hash_algorithm)
+        # Threads hashing files that are not found by path (I/O-bound work)
+        self.hash_workers = hash_workers or min(32, (os.cpu_count() or 1) * 4)
+        # (st_dev, st_ino, st_mtime_ns, st_size) -> full hash, for this run only
+        self._hash_cache: Dict[Tuple[int, int, int, int], str] = {}
 
     def generate_source_report(self, source_root: str, output_csv: str):
         """
         Walks the source tree and produces a CSV report detailing the status 
         of every file.
         """
-        root = Path(source_root)
+        # Resolved once here; every walked path below inherits an absolute root
+        root = Path(source_root).resolve()
         if not root.exists():
             raise FileNotFoundError(f"Source path {source_root} does not exist.")
 
@@ -31,15 +66,13 @@ class ReportGenerator:
         # Map: Source Path -> File ID (For files strictly tracked in occurrences)
         path_to_id = self._load_path_map()
         
-        # Map: File ID -> Canonical Source Path (The "Winner" from files table)
-        # This trusts ops.py logic (Seed > Name Score)
-        canonical_map = self._load_canonical_map()
-        
-        # Map: File ID -> Destination Path (Where the winner is going)
-        dest_map = self._load_dest_map()
-        
-        # Map: Hash -> File ID (For identifying duplicates via content)
-        hash_to_id = self._load_hash_map()
+        # One pass over the files table fills:
+        #   File ID -> Canonical Source Path (The "Winner"; trusts ops.py Seed > Name Score)
+        #   File ID -> Destination Path (Where the winner is going)
+        #   Hash -> File ID (For identifying duplicates via content)
+        #   Sparse Hash -> IDs of entries known only by it (to confirm by full hash)
+        #   Catalogued sizes (a file of any other size cannot be a duplicate)
+        canonical_map, dest_map, hash_to_id, sparse_to_ids, known_sizes = self._load_catalog_maps()
 
         headers = [
             "Source Path", 
@@ -52,81 +85,209 @@ class ReportGenerator:
 
         processed_count = 0
         
-        with open(output_csv, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
+        # Files are analysed in blocks: cheap path-map lookups run here, the
+        # files that need hashing go to a thread pool (hashing is I/O-bound and
+        # hashlib releases the GIL). csv.writer formats each block into an
+        # in-memory staging buffer (keeping its quoting rules), which is then
+        # encoded and written to the binary file in one call, in walk order.
+        staging = io.StringIO(newline="")
+        writer = csv.writer(staging)
+        with open(output_csv, "wb", buffering=REPORT_WRITE_BUFFER) as f, \
+                ThreadPoolExecutor(max_workers=self.hash_workers) as executor:
             writer.writerow(headers)
+            batch = []
 
-            for file_path in self._iter_all_files(root):
-                processed_count += 1
-                if processed_count % 1000 == 0:
+            for entry in self._iter_all_files(root):
+                batch.append(entry)
+                if len(batch) == REPORT_BATCH_SIZE:
+                    writer.writerows(self._analyze_batch(
+                        batch, executor, path_to_id, canonical_map, dest_map, hash_to_id, sparse_to_ids, known_sizes
+                    ))
+                    self._flush_staging(staging, f)
+                    processed_count += len(batch)
+                    batch = []
                     logging.info(f"Analyzed {processed_count} files...")
 
-                row = self._analyze_file(
-                    file_path, 
-                    path_to_id, 
-                    canonical_map, 
-                    dest_map, 
-                    hash_to_id
-                )
-                writer.writerow(row)
+            writer.writerows(self._analyze_batch(
+                batch, executor, path_to_id, canonical_map, dest_map, hash_to_id, sparse_to_ids, known_sizes
+            ))
+            self._flush_staging(staging, f)
+            processed_count += len(batch)
 
         logging.info(f"Report complete. Analyzed {processed_count} files.")
 
-    def _iter_all_files(self, root: Path):
-        """Recursively yields all files."""
-        for p in root.rglob("*"):
-            if p.is_file():
-                yield p
-
-    def _analyze_file(self, 
-                      path: Path, 
-                      path_to_id: Dict[str, int], 
-                      canonical_map: Dict[int, str], 
-                      dest_map: Dict[int, str], 
-                      hash_to_id: Dict[str, int]) -> list:
-        
-        str_path = str(path.resolve())
-        ext = path.suffix.lower()
-        file_type = config.EXT_TO_TYPE.get(ext, "other")
+    @staticmethod
+    def _flush_staging(staging: io.StringIO, f: BinaryIO):
+        """Writes the formatted rows in `staging` to `f` and empties it."""
+        f.write(staging.getvalue().encode("utf-8"))
+        staging.seek(0)
+        staging.truncate()
+
+    def _iter_all_files(self, root: Path) -> Iterator[Tuple[str, str]]:
+        """
+        Recursively yields (path, file_type) for all files, using the scanner's
+        os.scandir walker (dirent types, no stat or Path object per entry).
+        Like the scan, symlinks are not followed.
+        """
+        classify_ext = config.classify_ext
+        for path in self.scanner._iter_files(root, set()):
+            yield path, classify_ext(os.path.splitext(path)[1])[1]
+
+    def _analyze_batch(self,
+                       entries: List[Tuple[str, str]],
+                       executor: ThreadPoolExecutor,
+                       path_to_id: Dict[str, int],
+                       canonical_map: Dict[int, str],
+                       dest_map: Dict[int, str],
+                       hash_to_id: Dict[str, int],
+                       sparse_to_ids: Dict[str, List[int]],
+                       known_sizes: Set[int]) -> List[list]:
+        """
+        Rows for `entries` (path, file_type), in order; only files missing from
+        path_to_id are hashed. Ignored types never reach the analyzer: their
+        row is the status plus a shared tail.
+        """
+        classified = []
+        pending = []
+        for path, file_type in entries:
+            str_path = os.path.normpath(path)
+            if file_type == "other":
+                classified.append(self._ignored_row(str_path, path_to_id))
+                continue
+            row = self._classify_file(str_path, file_type, path_to_id, canonical_map, dest_map)
+            if row is None:
+                pending.append((path, str_path, file_type))
+            classified.append(row)
+
+        hashed = iter(executor.map(
+            lambda job: self._match_by_hash(*job, canonical_map, dest_map, hash_to_id,
+                                            sparse_to_ids, known_sizes),
+            pending,
+        ))
+        return [row if row is not None else next(hashed) for row in classified]
 
+    @staticmethod
+    def _ignored_row(str_path: str, path_to_id: Dict[str, int]) -> list:
         # --- CASE 1: Ignored Files (System junk, etc) ---
-        if file_type == "other":
-            # If it happens to be in the DB (path_to_id), we note it, otherwise 'Skipped'
-            status = "Indexed (Ignored Type)" if str_path in path_to_id else "Skipped"
-            return [str_path, status, file_type, "", "", "Unsupported extension"]
+        # If it happens to be in the DB (path_to_id), we note it, otherwise 'Skipped'
+        status = "Indexed (Ignored Type)" if _path_key(str_path) in path_to_id else "Skipped"
+        return [str_path, status, *_IGNORED_TAIL]
+
+    def _classify_file(self,
+                       str_path: str,
+                       file_type: str,
+                       path_to_id: Dict[str, int],
+                       canonical_map: Dict[int, str],
+                       dest_map: Dict[int, str]) -> Optional[list]:
+        """
+        Cheap first pass for a supported type: the row when the file is known
+        by path, None when it must be hashed.
+        """
+        path_key = _path_key(str_path)
 
         # --- Identify the File ID ---
         # Strategy: 1. Check Path Map (Fast) -> 2. Check Hash (Robust)
+        if path_key in path_to_id:
+            return self._status_row(str_path, file_type, path_to_id[path_key], "path_lookup",
+                                    canonical_map, dest_map)
+        return None
+
+    def _match_by_hash(self,
+                       path: str,
+                       str_path: str,
+                       file_type: str,
+                       canonical_map: Dict[int, str],
+                       dest_map: Dict[int, str],
+                       hash_to_id: Dict[str, int],
+                       sparse_to_ids: Dict[str, List[int]],
+                       known_sizes: Set[int]) -> list:
+        """
+        Not found by path? Hash it to see if it's a duplicate or new. (Thread-safe.)
+        Large files are fingerprinted sparse-first, as in the scan: no full read
+        when no catalogued file shares the sparse hash. A shared sparse hash is
+        never a match by itself -- entries known only by one are confirmed by
+        full-hashing the catalogued file.
+        """
         file_id = None
-        match_method = "unknown"
+        match_method = "content_hash"
+        try:
+            st = os.stat(path)
+            # No catalogued file has this size: it cannot match, skip the read
+            if st.st_size not in known_sizes:
+                return [str_path, "Not In Catalog", file_type, "", "", "Pending Import"]
 
-        if str_path in path_to_id:
-            file_id = path_to_id[str_path]
-            match_method = "path_lookup"
-        else:
-            # Not found by path? Hash it to see if it's a duplicate or new.
-            try:
-                # Use full hash for reporting to avoid sparse collisions
-                hash_res = self.hasher.compute_hash(path, set(), force_full=True)
-                file_hash = hash_res.full_hash or hash_res.sparse_hash
-                if file_hash and file_hash in hash_to_id:
-                    file_id = hash_to_id[file_hash]
-                    match_method = "content_hash"
-            except Exception as e:
-                return [str_path, "Error", file_type, "", "", f"Hash failed: {e}"]
+            sparse_hash = None
+            if st.st_size >= config.SPARSE_HASH_THRESHOLD:
+                sparse_hash = self.hasher._sparse_hash(path, st.st_size)
+                if sparse_hash not in sparse_to_ids:
+                    return [str_path, "Not In Catalog", file_type, "", "", "Pending Import"]
+
+            file_hash = self._cached_full_hash(path, st)
+            file_id = hash_to_id.get(file_hash) if file_hash else None
+            if file_id is None and file_hash:
+                if sparse_hash is None:
+                    sparse_hash = self.hasher._sparse_hash(path, st.st_size)
+                for candidate_id in sparse_to_ids.get(sparse_hash, ()):
+                    if self._catalogued_full_hash(candidate_id, canonical_map, dest_map) == file_hash:
+                        file_id = candidate_id
+                        break
+        except Exception as e:
+            return [str_path, "Error", file_type, "", "", f"Hash failed: {e}"]
 
         # --- CASE 2: Not in Catalog ---
         if file_id is None:
              return [str_path, "Not In Catalog", file_type, "", "", "Pending Import"]
 
+        return self._status_row(str_path, file_type, file_id, match_method, canonical_map, dest_map)
+
+    def _cached_full_hash(self, path: str, st: os.stat_result) -> Optional[str]:
+        """
+        Full hash, reusing earlier results for the same on-disk file: hard links
+        (and bind/cross mounts of one volume) share (dev, inode, mtime, size),
+        so their bytes are read once per run.
+        """
+        key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = self._hash_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Use full hash for reporting to avoid sparse collisions
+        hash_res = self.hasher.compute_hash(path, set(), force_full=True, file_size=st.st_size)
+        file_hash = hash_res.full_hash or hash_res.sparse_hash
+        if file_hash and len(self._hash_cache) < HASH_CACHE_MAX_ENTRIES:
+            self._hash_cache[key] = file_hash
+        return file_hash
+
+    def _catalogued_full_hash(self,
+                              file_id: int,
+                              canonical_map: Dict[int, str],
+                              dest_map: Dict[int, str]) -> Optional[str]:
+        """Full hash of a sparse-only entry's bytes (its copy if made, else its source)."""
+        for candidate in (dest_map.get(file_id), canonical_map.get(file_id)):
+            if not candidate:
+                continue
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                continue
+            return self._cached_full_hash(candidate, st)
+        return None
+
+    def _status_row(self,
+                    str_path: str,
+                    file_type: str,
+                    file_id: int,
+                    match_method: str,
+                    canonical_map: Dict[int, str],
+                    dest_map: Dict[int, str]) -> list:
         # --- CASE 3: In Catalog (Determine Status) ---
         # Retrieve the single source of truth for this file ID
         canon_path = canonical_map.get(file_id, "Unknown")
         dest_path = dest_map.get(file_id, "")
         
         # Is THIS file the canonical source?
-        # We compare strings. Resolve() handles slash differences usually, but be careful.
-        is_canonical = (str_path == canon_path)
+        # Both sides are normpath'd; normcase makes the compare case-insensitive on Windows.
+        is_canonical = (_path_key(str_path) == _path_key(canon_path))
 
         if is_canonical:
             if dest_path:
@@ -141,35 +302,48 @@ class ReportGenerator:
     # --- Data Loaders ---
 
     def _load_path_map(self) -> Dict[str, int]:
-        """Returns Dict[path_str] -> file_id from file_occurrences"""
+        """Returns Dict[path key] -> file_id from file_occurrences"""
         # Note: If ops.py isn't populating file_occurrences, this might be empty.
-        # That's okay; the hash fallback in _analyze_file will catch the files.
+        # That's okay; the hash fallback in _analyze_batch will catch the files.
         cur = self.db.conn.cursor()
         try:
             cur.execute("SELECT path, file_id FROM file_occurrences")
-            return {str(Path(row[0]).resolve()): row[1] for row in cur.fetchall()}
+            if _CASE_FOLDING:
+                return {os.path.normcase(path): file_id for path, file_id in cur}
+            return dict(cur)
         except Exception:
             # Graceful fallback if table is empty or missing
             return {}
 
-    def _load_canonical_map(self) -> Dict[int, str]:
+    def _load_catalog_maps(self) -> Tuple[Dict[int, str], Dict[int, str], Dict[str, int],
+                                          Dict[str, List[int]], Set[int]]:
         """
-        Returns Dict[file_id] -> orig_path
-        Trusts the 'files' table as the single source of truth for the 'best' version.
+        Returns (canonical_map, dest_map, hash_to_id, sparse_to_ids, known_sizes) from a
+        single scan of 'files', iterating the cursor instead of materializing the rows
+        with fetchall().
+        sparse_to_ids has every catalogued sparse hash, mapped to the entries
+        that carry it but have no full hash (empty when all are fully hashed).
         """
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT id, orig_path FROM files")
-        # Resolve path to ensure string comparison matches scan
-        return {row[0]: str(Path(row[1]).resolve()) for row in cur.fetchall()}
-
-    def _load_dest_map(self) -> Dict[int, str]:
-        """Returns Dict[file_id] -> dest_path (if assigned)"""
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT id, dest_path FROM files WHERE dest_path IS NOT NULL")
-        return {row[0]: row[1] for row in cur.fetchall()}
+        canonical_map: Dict[int, str] = {}
+        dest_map: Dict[int, str] = {}
+        hash_to_id: Dict[str, int] = {}
+        sparse_to_ids: Dict[str, List[int]] = {}
+        known_sizes: Set[int] = set()
 
-    def _load_hash_map(self) -> Dict[str, int]:
-        """Returns Dict[hash] -> file_id"""
-        cur = self.db.conn.cursor()
-        cur.execute("SELECT hash, id FROM files")
-        return {row[0]: row[1] for row in cur.fetchall() if row[0]}
+        cur = self.db.conn.execute(
+            "SELECT id, orig_path, dest_path, hash, sparse_hash, size_bytes FROM files"
+        )
+        for file_id, orig_path, dest_path, file_hash, sparse_hash, size_bytes in cur:
+            # Stored normalized at scan time; string comparison matches the walk
+            canonical_map[file_id] = orig_path
+            if dest_path is not None:
+                dest_map[file_id] = dest_path
+            if file_hash:
+                hash_to_id[file_hash] = file_id
+            if sparse_hash:
+                sparse_only = sparse_to_ids.setdefault(sparse_hash, [])
+                if file_hash is None:
+                    sparse_only.append(file_id)
+            if size_bytes is not None:
+                known_sizes.add(size_bytes)
+        return canonical_map, dest_map, hash_to_id, sparse_to_ids, known_sizes
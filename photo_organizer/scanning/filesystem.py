@@ -1,158 +1,403 @@
 import os
 import logging
-import re
+import multiprocessing
+import string
 from pathlib import Path
-from typing import Iterator, Set, Optional
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Set, Optional, Tuple
 from datetime import datetime
 
 from .. import config
 from ..models import FileRecord
-from ..metadata.extract import MetadataExtractor
+from ..metadata.extract import MetadataExtractor, _extract_image_worker
 from .hasher import FileHasher, HashResult
 
+# str.translate tables for _calculate_score (stems are lowercased first)
+_DROP_ASCII_LETTERS = str.maketrans('', '', string.ascii_lowercase)
+_DROP_ASCII_DIGITS = str.maketrans('', '', string.digits)
+
+def _list_dir(path: str) -> Tuple[List[str], List[os.DirEntry]]:
+    """
+    Lists one directory, sorted by lowercased name: (subdirectory paths,
+    file entries). Symlinks are neither followed nor returned.
+    With WALK_INODE_ORDER the files are then re-sorted by inode (stable, so
+    hard links to one inode keep name order); DirEntry.inode() needs no stat.
+    Each file entry is stat'ed here, on the listing thread: DirEntry caches
+    the result, so the scan loop's entry.stat() makes no syscall.
+    """
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda e: e.name.lower())
+    dirs = []
+    files = []
+    for e in entries:
+        if e.is_dir(follow_symlinks=False):
+            dirs.append(e.path)
+        elif e.is_file(follow_symlinks=False):
+            try:
+                e.stat(follow_symlinks=False)
+            except OSError:
+                pass  # not cached; the scan loop's stat reports it
+            files.append(e)
+    if config.WALK_INODE_ORDER:
+        files.sort(key=os.DirEntry.inode)
+    return dirs, files
+
+@lru_cache(maxsize=4096)
+def _stem_score(stem: str) -> int:
+    """
+    DiskScanner._calculate_score, memoised: a RAW, its JPEG and its sidecar
+    share one stem, and copies of a file repeat it.
+    """
+    s = stem.lower()
+    score = 0
+    
+    # Penalize generic camera names
+    if config.CAMERA_NAME_RE.match(s):
+        score -= 5
+        
+    # Penalize copy suffixes
+    if 'copy' in s: score -= 4
+    
+    # Reward word separators (human named?)
+    if ' ' in s: score += 2
+    if '-' in s or '_' in s: score += 1
+    
+    # Reward more letters than numbers
+    if s.isascii():
+        # Deleting a character class and diffing lengths counts it in C
+        letters = len(s) - len(s.translate(_DROP_ASCII_LETTERS))
+        digits = len(s) - len(s.translate(_DROP_ASCII_DIGITS))
+    else:
+        letters = sum(map(str.isalpha, s))
+        digits = sum(map(str.isdigit, s))
+    if letters > digits:
+        score += 2
+        
+    return score
+
+# File types whose capture metadata comes from EXIF
+IMAGE_TYPES = ('raw', 'jpeg', 'tiff', 'psd')
+# File types that get a media_metadata row
+MEDIA_TYPES = IMAGE_TYPES + ('video',)
+
+def _worker_mp_context():
+    """Start method for the metadata pool: forkserver (POSIX) or spawn, never fork."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
 class DiskScanner:
-    def __init__(self):
-        self.hasher = FileHasher()
+    def __init__(self,
+                 metadata_workers: Optional[int] = None,
+                 walk_threads: Optional[int] = None,
+                 hash_workers: Optional[int] = None,
+                 hash_algorithm: Optional[str] = None):
+        """
+        Args:
+            metadata_workers: Processes used for image EXIF extraction.
+                              None or 1 keeps extraction in this process.
+            walk_threads: Threads listing directories ahead of the walk
+                          (defaults to config.WALK_THREADS).
+            hash_workers: Threads reading/hashing files within a batch
+                          (defaults to config.HASH_WORKERS; 1 hashes inline).
+            hash_algorithm: The catalog's full-hash algorithm
+                            (defaults to config.FULL_HASH_ALGORITHM).
+        """
+        self.hasher = FileHasher(hash_algorithm)
         self.metadata = MetadataExtractor()
-        
-        # Camera patterns for "Descriptiveness Score" logic
-        self.cam_patterns = [re.compile(p) for p in config.CAMERA_PATTERNS]
+        self.metadata_workers = metadata_workers
+        self.walk_threads = max(1, walk_threads or config.WALK_THREADS)
+        self.hash_workers = max(1, hash_workers or config.HASH_WORKERS)
 
     def scan(self, 
              root: Path, 
              is_seed: bool, 
              known_sparse_hashes: Set[str], 
-             skip_dirs: Optional[Set[Path]] = None) -> Iterator[FileRecord]:
+             skip_dirs: Optional[Set[Path]] = None,
+             known_sizes: Optional[Set[int]] = None,
+             dated_hashes: Optional[Set[str]] = None,
+             hash_cache: Optional[Dict[str, Tuple[float, int, str, Optional[str]]]] = None) -> Iterator[FileRecord]:
         """
         Generator that yields FileRecords for every valid file in root.
         
+        Files are handled in batches of SCAN_BATCH_SIZE: each file is stat'ed
+        and classified in walk order, the batch is hashed (reads spread over
+        hash_workers threads, decisions still in walk order), then its image
+        metadata is extracted (across processes when metadata_workers > 1)
+        before records are yielded.
+
+        Hashing and metadata extraction are two background stages, one
+        thread each: while the walk fills batch N+2, batch N+1 is hashed,
+        batch N has its metadata read and the caller consumes batch N-1.
+        Each stage takes batches one at a time in walk order, so the known
+        sets and dated_hashes evolve exactly as in a sequential scan.
+
         Args:
             known_sparse_hashes: Sparse hashes already observed (DB + current run).
                                  Used to decide when to fall back to full hashing.
+            known_sizes: File sizes already observed (DB + current run). When given,
+                         files of a new size skip full hashing entirely.
+            dated_hashes: Full/sparse hashes whose metadata is already catalogued
+                          (DB + current run). Files matching one are not opened for
+                          metadata and come back with metadata_loaded=False. A
+                          file's sparse hash is only checked when it has no full hash.
+            hash_cache: path -> (mtime, size, full hash, sparse hash) from earlier
+                        scans (DBOperations.fetch_hash_cache). A file whose mtime
+                        and size still match is not read again.
         """
         skip_dirs = skip_dirs or set()
-        
-        for path in self._iter_files(root, skip_dirs):
+        pool = None
+        if self.metadata_workers and self.metadata_workers > 1:
+            # Workers start lazily from the scan-meta thread while the walk and
+            # hash threads run; fork would copy locks those threads hold.
+            pool = ProcessPoolExecutor(max_workers=self.metadata_workers,
+                                       mp_context=_worker_mp_context())
+        hash_pool = None
+        if self.hash_workers > 1:
+            hash_pool = ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="hash")
+
+        hash_stage = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan-hash")
+        meta_stage = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan-meta")
+
+        def finish(hashed: Future) -> List[FileRecord]:
+            return list(self._finish_batch(hashed.result(), pool, dated_hashes))
+
+        def submit(batch: List[FileRecord]) -> Future:
+            hashed = hash_stage.submit(self._hash_batch, batch, known_sparse_hashes, known_sizes, hash_pool,
+                                       hash_cache)
+            return meta_stage.submit(finish, hashed)
+
+        try:
+            pending: Deque[Future] = deque()
+            batch = []
+            for entry in self._iter_entries(root, skip_dirs):
+                record = self._describe_file(entry, is_seed)
+                if record is not None:
+                    batch.append(record)
+                if len(batch) >= config.SCAN_BATCH_SIZE:
+                    # Queue this batch before handing out the oldest one
+                    pending.append(submit(batch))
+                    if len(pending) > 2:
+                        yield from pending.popleft().result()
+                    batch = []
+            pending.append(submit(batch))
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Let in-flight batches finish before their pools go away
+            hash_stage.shutdown(wait=False, cancel_futures=True)
+            meta_stage.shutdown(wait=True, cancel_futures=True)
+            hash_stage.shutdown(wait=True)
+            if pool is not None:
+                pool.shutdown()
+            if hash_pool is not None:
+                hash_pool.shutdown()
+            # Stop the background exiftool session started by video fallbacks
+            self.metadata.close()
+
+    def _describe_file(self, entry: os.DirEntry, is_seed: bool) -> Optional[FileRecord]:
+        """
+        Stats and classifies one file. Hashes are filled in by _hash_batch,
+        metadata by _finish_batch.
+        """
+        path = entry.path
+        try:
+            # The one stat per file (free on Windows, done by _list_dir's thread
+            # elsewhere); its size and mtime are reused by the hasher and the date fallback.
+            stat_result = entry.stat(follow_symlinks=False)
+
+            # 1. Classify (DirEntry already carries the name; classify_ext is
+            # memoised, so a repeated extension costs one dict probe)
+            name = entry.name
+            stem, ext = os.path.splitext(name)
+            ext, ftype = config.classify_ext(ext)
+            if name[:2] == "._":
+                ftype = 'other'
+
+            # 4. Score Name
+            name_score = self._calculate_score(stem)
+
+            return FileRecord(
+                hash=None,
+                type=ftype,
+                ext=ext,
+                orig_name=name,
+                orig_path=path,
+                size_bytes=stat_result.st_size,
+                mtime=stat_result.st_mtime,
+                is_seed=is_seed,
+                name_score=name_score,
+            )
+
+        except Exception as e:
+            logging.error(f"Failed to scan {path}: {e}")
+            return None
+
+    def _hash_batch(self,
+                    batch: List[FileRecord],
+                    known_sparse_hashes: Set[str],
+                    known_sizes: Optional[Set[int]],
+                    hash_pool: Optional[ThreadPoolExecutor],
+                    hash_cache: Optional[Dict[str, Tuple[float, int, str, Optional[str]]]] = None) -> List[FileRecord]:
+        """
+        Fills in the batch's hashes and returns the records that could be hashed,
+        in order. Every type is hashed ('other' too) so duplicates are detected.
+        FileHasher.hash_batch adds each new sparse hash and size to the known
+        sets, so later files in this same scan collide with them.
+        Files unchanged since a cached full hash (same mtime and size) reuse it
+        and only add their size and sparse hash to the known sets.
+        """
+        results: List[Optional[HashResult]] = [None] * len(batch)
+        to_hash = []
+        for i, r in enumerate(batch):
+            cached = hash_cache.get(r.orig_path) if hash_cache else None
+            if cached is not None and cached[0] == r.mtime and cached[1] == r.size_bytes:
+                results[i] = HashResult(full_hash=cached[2], sparse_hash=cached[3], is_sparse=False)
+                if known_sizes is not None:
+                    known_sizes.add(r.size_bytes)
+                if cached[3]:
+                    known_sparse_hashes.add(cached[3])
+            else:
+                to_hash.append(i)
+
+        fresh = self.hasher.hash_batch(
+            [(batch[i].orig_path, batch[i].size_bytes) for i in to_hash], known_sparse_hashes, known_sizes, hash_pool
+        )
+        for i, hash_res in zip(to_hash, fresh):
+            results[i] = hash_res
+
+        hashed = []
+        for record, hash_res in zip(batch, results):
+            if hash_res is None:
+                continue
+            record.hash = hash_res.full_hash
+            record.sparse_hash = hash_res.sparse_hash
+            record.hash_is_sparse = hash_res.is_sparse
+            hashed.append(record)
+        return hashed
+
+    def _finish_batch(self,
+                      batch: List[FileRecord],
+                      pool: Optional[ProcessPoolExecutor],
+                      dated_hashes: Optional[Set[str]] = None) -> Iterator[FileRecord]:
+        """Fills in capture metadata for a hashed batch and yields its records."""
+        # Metadata is only read when consumed: a file whose content is already
+        # catalogued with metadata would only rewrite the same values.
+        skipped = set()
+        if dated_hashes:
+            # A sparse hash is only a hint: it decides only for sparse-only records
+            skipped = {id(r) for r in batch
+                       if (r.hash or r.sparse_hash) in dated_hashes}
+        to_extract = [r for r in batch if id(r) not in skipped] if skipped else batch
+
+        # 3. Basic Metadata (for Organization Phase)
+        # We need capture_time to know where to sort it (YYYY/MM).
+        # We do NOT calculate pHash here (too slow).
+        image_meta = {}
+        if pool is not None:
+            image_paths = [r.orig_path for r in to_extract if r.type in IMAGE_TYPES]
             try:
-                stat_result = path.stat()
-                size_bytes = stat_result.st_size
-                mtime = stat_result.st_mtime
-
-                # 1. Classify
-                ext = path.suffix.lower()
-                if path.name.startswith("._"):
-                    ftype = 'other'
-                else:
-                    ftype = config.EXT_TO_TYPE.get(ext, 'other')
-                
-                # 2. Compute Hash (The Performance Logic)
-                # If ftype is 'other', we might skip hashing entirely if you want,
-                # but for safety we usually hash everything to detect duplicates.
-                hash_res = self.hasher.compute_hash(path, known_sparse_hashes)
-                
-                # If we found a NEW sparse hash, add it to our local set 
-                # so future files in this same scan don't collide.
-                if hash_res.sparse_hash:
-                    known_sparse_hashes.add(hash_res.sparse_hash)
-
-                # 3. Basic Metadata (for Organization Phase)
-                # We need capture_time to know where to sort it (YYYY/MM).
-                # We do NOT calculate pHash here (too slow).
-                capture_dt = None
-                cam_model = None
-                lens_model = None
-                duration = None
-                
-                if ftype == 'video':
-                    capture_dt, duration, cam_model = self.metadata.get_video_metadata(path)
-                elif ftype in ('raw', 'jpeg', 'tiff', 'psd'):
-                    capture_dt, cam_model, lens_model = self.metadata.get_image_metadata(path)
+                for path_str, dt, camera, lens in pool.map(_extract_image_worker, image_paths, chunksize=64):
+                    image_meta[path_str] = (dt, camera, lens)
+            except Exception as e:
+                # e.g. BrokenProcessPool; the per-file path below still runs
+                logging.warning(f"Parallel metadata extraction failed, retrying serially: {e}")
+                image_meta.clear()
+
+        # Videos MediaInfo cannot date share one exiftool round trip per batch
+        video_paths = [r.orig_path for r in to_extract if r.type == 'video']
+        video_meta = dict(zip(video_paths, self.metadata.get_videos_metadata(video_paths)))
+
+        for record in batch:
+            if id(record) in skipped:
+                yield record
+                continue
+
+            path = record.orig_path
+            try:
+                if record.type == 'video':
+                    record.capture_datetime, record.duration_sec, record.camera_model = video_meta[path]
+                elif record.type in IMAGE_TYPES:
+                    meta = image_meta.get(path)
+                    if meta is None:
+                        meta = self.metadata.get_image_metadata(path)
+                    record.capture_datetime, record.camera_model, record.lens_model = meta
                 
                 # Fallback: If metadata failed, check if we can parse the path?
                 # (You can re-add your 'infer_datetime_from_path' logic here if desired)
-                if not capture_dt:
-                    capture_dt = self._fallback_file_datetime(path, mtime)
-
-                # 4. Score Name
-                name_score = self._calculate_score(path.stem)
-
-                yield FileRecord(
-                    hash=hash_res.full_hash,
-                    sparse_hash=hash_res.sparse_hash,
-                    hash_is_sparse=hash_res.is_sparse,
-                    type=ftype,
-                    ext=ext,
-                    orig_name=path.name,
-                    orig_path=path,
-                    size_bytes=size_bytes,
-                    mtime=mtime,
-                    is_seed=is_seed,
-                    name_score=name_score,
-                    capture_datetime=capture_dt,
-                    camera_model=cam_model,
-                    lens_model=lens_model,
-                    duration_sec=duration
-                )
+                if not record.capture_datetime:
+                    record.capture_datetime = self._fallback_file_datetime(path, record.mtime)
+                record.metadata_loaded = True
+
+                # Later copies of this content in the run can skip extraction
+                content_key = record.hash or record.sparse_hash
+                if dated_hashes is not None and content_key and record.type in MEDIA_TYPES:
+                    dated_hashes.add(content_key)
 
             except Exception as e:
                 logging.error(f"Failed to scan {path}: {e}")
                 continue
 
-    def _iter_files(self, root: Path, skip_dirs: Set[Path]) -> Iterator[Path]:
-        """Depth-first walker using os.scandir for speed."""
-        stack = [root]
-        while stack:
-            current = stack.pop()
-            if skip_dirs and any(sd == current or sd in current.parents for sd in skip_dirs):
-                continue
-            
-            try:
-                with os.scandir(current) as it:
-                    entries = list(it)
-            except (OSError, PermissionError):
-                logging.warning(f"Permission denied: {current}")
-                continue
+            yield record
 
-            # Sort for stable traversal order
-            entries.sort(key=lambda e: e.name.lower())
-            
-            dirs = []
-            files = []
-            for e in entries:
-                if e.is_dir(follow_symlinks=False):
-                    dirs.append(Path(e.path))
-                elif e.is_file(follow_symlinks=False):
-                    files.append(Path(e.path))
-
-            # Push dirs to stack (reversed so we process A before Z)
-            for d in reversed(dirs):
-                stack.append(d)
-                
-            for f in files:
-                yield f
+    def _iter_files(self, root: Path, skip_dirs: Set[Path]) -> Iterator[str]:
+        """Yields plain path strings (DirEntry.path); no Path objects per file."""
+        for entry in self._iter_entries(root, skip_dirs):
+            yield entry.path
+
+    def _iter_entries(self, root: Path, skip_dirs: Set[Path]) -> Iterator[os.DirEntry]:
+        """
+        Depth-first walker using os.scandir for speed; yields file DirEntries.
+        Directory listings run ahead on a thread pool (opendir/readdir latency
+        dominates on NFS and cold disks), while entries are still yielded in
+        the same sorted depth-first order as a sequential walk.
+        """
+        # Skip checks become string compares: equal to, or below, a skip dir
+        skip_exact = {os.path.normpath(os.fspath(sd)) for sd in skip_dirs}
+        skip_prefixes = tuple(sd.rstrip(os.sep) + os.sep for sd in skip_exact)
+
+        def skipped(path: str) -> bool:
+            return bool(skip_exact) and (path in skip_exact or path.startswith(skip_prefixes))
+
+        root_str = os.path.normpath(os.fspath(root))
+        if skipped(root_str):
+            return
+
+        pool = ThreadPoolExecutor(max_workers=self.walk_threads, thread_name_prefix="scandir")
+        # Only the next few directories are listed ahead, so wide trees do not
+        # hold thousands of listings in memory.
+        lookahead = self.walk_threads * 2
+        try:
+            # Stack items are [path, listing future or None until prefetched]
+            stack = [[root_str, pool.submit(_list_dir, root_str)]]
+            while stack:
+                current, listing = stack.pop()
+                try:
+                    dirs, files = listing.result()
+                except OSError:
+                    logging.warning(f"Permission denied: {current}")
+                    continue
+
+                # Push dirs to stack (reversed so we process A before Z)
+                for d in reversed(dirs):
+                    if not skipped(d):
+                        stack.append([d, None])
+
+                # Start the upcoming listings before handing out this directory's files
+                for item in stack[-lookahead:]:
+                    if item[1] is None:
+                        item[1] = pool.submit(_list_dir, item[0])
+
+                yield from files
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
     def _calculate_score(self, stem: str) -> int:
         """Higher score = 'Better' filename (more descriptive)."""
-        s = stem.lower()
-        score = 0
-        
-        # Penalize generic camera names
-        if any(pat.match(s) for pat in self.cam_patterns):
-            score -= 5
-            
-        # Penalize copy suffixes
-        if 'copy' in s: score -= 4
-        
-        # Reward word separators (human named?)
-        if ' ' in s: score += 2
-        if '-' in s or '_' in s: score += 1
-        
-        # Reward more letters than numbers
-        if sum(c.isalpha() for c in s) > sum(c.isdigit() for c in s):
-            score += 2
-            
-        return score
-
-    def _fallback_file_datetime(self, path: Path, mtime: Optional[float] = None) -> datetime:
-        ts = mtime if mtime is not None else path.stat().st_mtime
+        return _stem_score(stem)
+
+    def _fallback_file_datetime(self, path: str, mtime: Optional[float] = None) -> datetime:
+        ts = mtime if mtime is not None else os.stat(path).st_mtime
         return datetime.fromtimestamp(ts)
@@ -1,63 +1,244 @@
 import hashlib
+import logging
+import os
+from concurrent.futures import Executor
 from pathlib import Path
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional, Set, Tuple, Union
 from .. import config
 
+# BLAKE3 hashes a single large file across all cores (SIMD + threads).
+# A declared dependency; a catalog that uses it refuses to hash without it
+# rather than silently storing hashes that never match (see FileHasher).
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# Sparse sampling: positioned reads (POSIX) and a no-readahead hint (Linux)
+_HAS_PREAD = hasattr(os, "pread")
+_FADV_RANDOM = getattr(os, "POSIX_FADV_RANDOM", None) if hasattr(os, "posix_fadvise") else None
+# Full reads: larger readahead window, and no atime write-back (Linux)
+_FADV_SEQUENTIAL = getattr(os, "POSIX_FADV_SEQUENTIAL", None) if hasattr(os, "posix_fadvise") else None
+_O_NOATIME = getattr(os, "O_NOATIME", 0)
+_O_BINARY = getattr(os, "O_BINARY", 0)
+
+def _open_sequential(path: Union[str, Path]) -> int:
+    """Raw fd for one front-to-back read, hinted as sequential."""
+    flags = os.O_RDONLY | _O_BINARY
+    try:
+        fd = os.open(path, flags | _O_NOATIME)
+    except PermissionError:
+        # O_NOATIME is only allowed on files we own
+        if not _O_NOATIME:
+            raise
+        fd = os.open(path, flags)
+    if _FADV_SEQUENTIAL is not None:
+        try:
+            os.posix_fadvise(fd, 0, 0, _FADV_SEQUENTIAL)
+        except OSError:
+            pass  # advisory only (e.g. not supported by the filesystem)
+    return fd
+
+def _attempt(fn, *args):
+    """fn(*args), or the exception it raised (so one bad file cannot fail a batch map)."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
 @dataclass
 class HashResult:
     full_hash: Optional[str]
     sparse_hash: Optional[str]
     is_sparse: bool  # True if we only read partial file (identity not fully confirmed)
 
+FULL_HASH_ALGORITHMS = ("blake3", "sha256")
+
 class FileHasher:
-    def compute_hash(self, path: Path, known_sparse_hashes: set[str], force_full: bool = False) -> HashResult:
+    def __init__(self, algorithm: Optional[str] = None):
+        """
+        Args:
+            algorithm: Full-hash algorithm; pass the catalog's own
+                       (DBOperations.get_hash_algorithm) so new hashes match
+                       stored ones. Defaults to config.FULL_HASH_ALGORITHM.
+        """
+        self.algorithm = algorithm or config.FULL_HASH_ALGORITHM
+        if self.algorithm not in FULL_HASH_ALGORITHMS:
+            raise ValueError(f"Unknown hash algorithm: {self.algorithm}")
+        if self.algorithm == "blake3" and blake3 is None:
+            raise RuntimeError("This catalog hashes with BLAKE3 but the blake3 module is not installed")
+
+    def compute_hash(self,
+                     path: Union[str, Path],
+                     known_sparse_hashes: set[str],
+                     force_full: bool = False,
+                     known_sizes: Optional[set[int]] = None,
+                     file_size: Optional[int] = None) -> HashResult:
         """
         Computes a fingerprint for the file.
+        `file_size` may be passed when the caller has already stat'ed the file.
         
         Strategy:
+        0. If `known_sizes` is given and no catalogued file has this size:
+           -> Nothing can be a duplicate yet; keep only the Sparse Hash.
+
         1. If file < SPARSE_HASH_THRESHOLD:
-           -> Full Read (SHA-256).
+           -> Full Read (BLAKE3, or SHA-256 fallback).
            
         2. If file >= SPARSE_HASH_THRESHOLD:
            -> Compute Sparse Hash (Header + Middle + Footer + Size).
            -> Check against `known_sparse_hashes` (from DB or current scan).
            -> If UNIQUE: Return Sparse Hash (Fast!).
-           -> If COLLISION: Fallback to Full Read (SHA-256) to be safe.
+           -> If COLLISION: Fallback to Full Read to be safe.
         """
-        try:
-            file_size = path.stat().st_size
-        except FileNotFoundError:
-            # File might have been moved/deleted during scan
-            return HashResult("error", False)
+        if file_size is None:
+            try:
+                file_size = os.stat(path).st_size
+            except FileNotFoundError:
+                # File might have been moved/deleted during scan
+                return HashResult("error", False)
+
+        # 0. Size prefilter: files of a never-seen size cannot match anything,
+        # so skip the full read entirely (the sparse hash embeds the size).
+        if not force_full and known_sizes is not None and file_size not in known_sizes:
+            sparse_h = self._sparse_hash(path, file_size)
+            return HashResult(full_hash=None, sparse_hash=sparse_h, is_sparse=True)
 
         # 1. Force full hash path (e.g., reporting) or small files: just read them.
         if force_full or file_size < config.SPARSE_HASH_THRESHOLD:
-            full_hash = self._full_sha256(path)
-            return HashResult(full_hash=full_hash, sparse_hash=None, is_sparse=False)
+            full_hash = self._full_hash(path, file_size)
+            # With the size prefilter active, an earlier file of this size may
+            # only have a sparse hash on record; carry one so they can match.
+            sparse_h = None
+            if known_sizes is not None and not force_full:
+                sparse_h = self._sparse_hash(path, file_size)
+            return HashResult(full_hash=full_hash, sparse_hash=sparse_h, is_sparse=False)
 
         # 2. Large files: Try Sparse Hash first.
         sparse_h = self._sparse_hash(path, file_size)
         
         # KEY LOGIC: If this sparse fingerprint has not been seen before
         # (DB or current run), we keep the sparse hash as a hint and skip
-        # the full read. Otherwise, compute the full SHA to resolve collision.
+        # the full read. Otherwise, compute the full hash to resolve collision.
         if sparse_h not in known_sparse_hashes:
             return HashResult(full_hash=None, sparse_hash=sparse_h, is_sparse=True)
         
         # 3. Collision detected! Fall back to full hash to disambiguate.
-        full_hash = self._full_sha256(path)
+        full_hash = self._full_hash(path, file_size)
         return HashResult(full_hash=full_hash, sparse_hash=sparse_h, is_sparse=False)
 
-    def _full_sha256(self, path: Path) -> str:
-        """Reads entire file. High I/O cost."""
+    def hash_batch(self,
+                   files: List[Tuple[str, int]],
+                   known_sparse_hashes: Set[str],
+                   known_sizes: Optional[Set[int]] = None,
+                   executor: Optional[Executor] = None) -> List[Optional[HashResult]]:
+        """
+        compute_hash() for a batch of (path, size) pairs, with the reads spread
+        over `executor` (hashlib and blake3 release the GIL, so threads suffice).
+
+        Decisions are made in batch order exactly as if each file went through
+        compute_hash() in turn and its sparse hash and size were then added to
+        the known sets -- which this method does. Only the I/O is parallel:
+        1. sizes decide the prefilter (no reads),
+        2. sparse hashes are read in parallel,
+        3. collisions are resolved in order,
+        4. the full hashes that are still needed are read in parallel.
+        Files that could not be read get None (and are logged).
+        """
+        run = executor.map if executor is not None else map
+        threshold = config.SPARSE_HASH_THRESHOLD
+
+        # 1. Size prefilter, in order (sizes count as seen once decided)
+        prefiltered = []
+        for _, size in files:
+            if known_sizes is None:
+                prefiltered.append(False)
+            else:
+                prefiltered.append(size not in known_sizes)
+                known_sizes.add(size)
+
+        # 2. Sparse hashes: large files, and every file while the prefilter is on
+        need_sparse = [i for i, (_, size) in enumerate(files)
+                       if known_sizes is not None or size >= threshold]
+        sparse: List[Optional[str]] = [None] * len(files)
+        failed: List[Optional[Exception]] = [None] * len(files)
+        for i, value in zip(need_sparse, run(lambda i: _attempt(self._sparse_hash, *files[i]), need_sparse)):
+            if isinstance(value, Exception):
+                failed[i] = value
+            else:
+                sparse[i] = value
+
+        # 3. Which files need a full read, deciding in order
+        need_full = []
+        for i, (_, size) in enumerate(files):
+            if failed[i] is not None:
+                continue
+            if not prefiltered[i] and (size < threshold or sparse[i] in known_sparse_hashes):
+                need_full.append(i)
+            if sparse[i]:
+                known_sparse_hashes.add(sparse[i])
+
+        # 4. Full hashes
+        full: List[Optional[str]] = [None] * len(files)
+        for i, value in zip(need_full, run(lambda i: _attempt(self._full_hash, *files[i]), need_full)):
+            if isinstance(value, Exception):
+                failed[i] = value
+            else:
+                full[i] = value
+
+        results: List[Optional[HashResult]] = []
+        for i, (path, _) in enumerate(files):
+            if failed[i] is not None:
+                logging.error(f"Failed to hash {path}: {failed[i]}")
+                results.append(None)
+            else:
+                results.append(HashResult(full_hash=full[i], sparse_hash=sparse[i], is_sparse=full[i] is None))
+        return results
+
+    def _full_hash(self, path: Union[str, Path], file_size: int) -> str:
+        """
+        Full-content fingerprint using this hasher's algorithm.
+        BLAKE3 digests are prefixed with 'b3-' so they never compare equal
+        to SHA-256 digests already stored in older catalogs.
+        """
+        if self.algorithm == "blake3":
+            return f"b3-{self._full_blake3(path, file_size)}"
+        return self._full_sha256(path, file_size)
+
+    def _full_blake3(self, path: Union[str, Path], file_size: int) -> str:
+        """Multithreaded BLAKE3. Large files are mmapped instead of read()."""
+        if file_size >= config.BLAKE3_MMAP_THRESHOLD:
+            h = blake3.blake3(max_threads=blake3.blake3.AUTO)
+            h.update_mmap(path)
+            return h.hexdigest()
+
+        h = blake3.blake3()
+        self._update_from_file(h, path, file_size)
+        return h.hexdigest()
+
+    def _full_sha256(self, path: Union[str, Path], file_size: int) -> str:
+        """
+        Reads entire file. High I/O cost.
+        hashlib's sha256 is OpenSSL's, which uses the SHA-NI / ARMv8 SHA
+        instructions where the CPU has them; large chunks keep the time in it.
+        """
         h = hashlib.sha256()
-        with open(path, 'rb') as f:
-            while chunk := f.read(config.HASH_CHUNK_SIZE):
-                h.update(chunk)
+        self._update_from_file(h, path, file_size)
         return h.hexdigest()
 
-    def _sparse_hash(self, path: Path, file_size: int) -> str:
+    def _update_from_file(self, h, path: Union[str, Path], file_size: int):
+        """
+        Feeds the whole file to `h` through one reused buffer (readinto on an
+        unbuffered file), sized to the file up to HASH_CHUNK_SIZE.
+        """
+        buf = bytearray(min(config.HASH_CHUNK_SIZE, max(file_size, 4096)))
+        view = memoryview(buf)
+        with open(_open_sequential(path), 'rb', buffering=0) as f:
+            while n := f.readinto(buf):
+                h.update(view[:n])
+
+    def _sparse_hash(self, path: Union[str, Path], file_size: int) -> str:
         """
         Reads Header (4KB), Middle (4KB), Footer (4KB) and mixes in file size.
         Prefixes with 's-' to distinguish from full hashes.
@@ -68,24 +249,57 @@ class FileHasher:
         # Mix file size into the hash prevents collisions between 
         # files with same data but different lengths (rare but possible in sparse)
         h.update(str(file_size).encode('ascii')) 
-        
+
+        if _HAS_PREAD:
+            for block in self._sparse_blocks_pread(path, file_size, chunk_size):
+                h.update(block)
+        else:
+            for block in self._sparse_blocks_seek(path, file_size, chunk_size):
+                h.update(block)
+                
+        return f"s-{h.hexdigest()}"
+
+    def _sparse_blocks_pread(self, path: Union[str, Path], file_size: int, chunk_size: int) -> List[bytes]:
+        """
+        One positioned read per block (no seek round-trips), with readahead
+        turned off: the kernel would otherwise pull in ~128KB around each 4KB.
+        """
+        blocks = []
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            if _FADV_RANDOM is not None:
+                os.posix_fadvise(fd, 0, 0, _FADV_RANDOM)
+            # 1. Start (Header)
+            blocks.append(os.pread(fd, chunk_size, 0))
+            # 2. Middle
+            if file_size > chunk_size * 3:
+                blocks.append(os.pread(fd, chunk_size, file_size // 2))
+            # 3. End (Footer)
+            if file_size > chunk_size * 2:
+                blocks.append(os.pread(fd, chunk_size, file_size - chunk_size))
+        finally:
+            os.close(fd)
+        return blocks
+
+    def _sparse_blocks_seek(self, path: Union[str, Path], file_size: int, chunk_size: int) -> List[bytes]:
+        """Same blocks as _sparse_blocks_pread, for platforms without os.pread."""
+        blocks = []
         with open(path, 'rb') as f:
             # 1. Start (Header)
-            h.update(f.read(chunk_size))
+            blocks.append(f.read(chunk_size))
             
             # 2. Middle
             if file_size > chunk_size * 3:
                 f.seek(file_size // 2)
-                h.update(f.read(chunk_size))
+                blocks.append(f.read(chunk_size))
             
             # 3. End (Footer)
             if file_size > chunk_size * 2:
                 # Seek from end (2 = SEEK_END)
                 try:
                     f.seek(-chunk_size, 2)
-                    h.update(f.read(chunk_size))
+                    blocks.append(f.read(chunk_size))
                 except OSError:
                     # Handle edge case where file changed size or is special
                     pass
-                
-        return f"s-{h.hexdigest()}"
+        return blocks
@@ -2,6 +2,8 @@ import pytest
 from pathlib import Path
 from datetime import datetime
 from photo_organizer.models import FileRecord
+from photo_organizer.core import PhotoOrganizerApp
+from photo_organizer.scanning.hasher import FileHasher
 
 def test_deduplication_logic(db_ops):
     """Verify that same hash yields same ID, and priority rules work."""
@@ -42,41 +44,208 @@ def test_deduplication_logic(db_ops):
     cur.execute("SELECT orig_name FROM files WHERE id = ?", (id1,))
     assert cur.fetchone()[0] == "photo2.dng"
 
-def test_sparse_hash_upgraded_to_full(db_ops, tmp_path):
-    """Sparse-only insert should upgrade to full hash when available."""
-    rec_sparse = FileRecord(
-        hash=None,
-        sparse_hash="s-sparse-1",
-        hash_is_sparse=True,
-        type="raw",
-        ext=".dng",
-        orig_name="photo_sparse.dng",
-        orig_path=Path("/src/photo_sparse.dng"),
-        size_bytes=1000,
-        is_seed=False,
-        name_score=1,
-    )
-    sparse_id = db_ops.upsert_file_record(rec_sparse)
+def test_sparse_hash_alone_never_merges(db_ops):
+    """A shared sparse hash is only a hint: without a full-hash match, records stay apart."""
+    common = dict(type="raw", ext=".dng", size_bytes=1000, is_seed=False)
+    sparse_id = db_ops.upsert_file_record(FileRecord(
+        hash=None, sparse_hash="s-sparse-1", hash_is_sparse=True,
+        orig_name="photo_sparse.dng", orig_path=Path("/src/photo_sparse.dng"), name_score=1, **common,
+    ))
+    full_id = db_ops.upsert_file_record(FileRecord(
+        hash="fullhash-1", sparse_hash="s-sparse-1",
+        orig_name="photo_full.dng", orig_path=Path("/src/photo_full.dng"), name_score=2, **common,
+    ))
+    assert sparse_id != full_id
 
-    rec_full = FileRecord(
-        hash="fullhash-1",
-        sparse_hash="s-sparse-1",
-        hash_is_sparse=False,
-        type="raw",
-        ext=".dng",
-        orig_name="photo_full.dng",
-        orig_path=Path("/src/photo_full.dng"),
-        size_bytes=1000,
+    cur = db_ops.conn.cursor()
+    cur.execute("SELECT hash FROM files WHERE id = ?", (sparse_id,))
+    assert cur.fetchone()[0] is None
+
+def test_sparse_only_rows_are_confirmed_by_full_hash(db_ops, tmp_path):
+    """Same size and same sampled blocks, different bytes: only identical content merges."""
+    hasher = FileHasher()
+    head = b"h" * 4096
+    first = tmp_path / "first.xmp"
+    first.write_bytes(head + b"a" * 2048)
+    other = tmp_path / "other.xmp"
+    other.write_bytes(head + b"b" * 2048)
+    copy = tmp_path / "copy.xmp"
+    copy.write_bytes(first.read_bytes())
+
+    size = first.stat().st_size
+    sparse = hasher._sparse_hash(first, size)
+    assert hasher._sparse_hash(other, size) == sparse
+
+    def record(path, full_hash):
+        return FileRecord(
+            hash=full_hash, sparse_hash=sparse, hash_is_sparse=full_hash is None,
+            type="sidecar", ext=".xmp", orig_name=path.name, orig_path=path,
+            size_bytes=size, is_seed=False, name_score=0,
+        )
+
+    def upsert(path, full_hash):
+        rec = record(path, full_hash)
+        if full_hash:
+            PhotoOrganizerApp._confirm_sparse_matches(db_ops, hasher, rec)
+        return db_ops.upsert_file_record(rec)
+
+    first_id = upsert(first, None)
+    other_id = upsert(other, hasher._full_hash(other, size))
+    copy_id = upsert(copy, hasher._full_hash(copy, size))
+
+    assert other_id != first_id
+    assert copy_id == first_id
+    cur = db_ops.conn.cursor()
+    cur.execute("SELECT hash FROM files WHERE id = ?", (first_id,))
+    assert cur.fetchone()[0] == hasher._full_hash(first, size)
+
+def test_media_metadata_upsert_updates_in_place(db_ops):
+    rec = FileRecord(
+        hash="hash-meta",
+        type="jpeg",
+        ext=".jpg",
+        orig_name="a.jpg",
+        orig_path=Path("/src/a.jpg"),
+        size_bytes=10,
         is_seed=False,
-        name_score=2,
+        name_score=0,
+        width=10,
+        height=20,
     )
-    full_id = db_ops.upsert_file_record(rec_full)
+    file_id = db_ops.upsert_file_record(rec)
+    db_ops.upsert_media_metadata(file_id, rec)
 
-    assert sparse_id == full_id
+    rec.width = 40
+    db_ops.upsert_media_metadata(file_id, rec)
 
     cur = db_ops.conn.cursor()
-    cur.execute("SELECT hash, sparse_hash, orig_name FROM files WHERE id = ?", (sparse_id,))
-    stored_hash, stored_sparse, stored_name = cur.fetchone()
-    assert stored_hash == "fullhash-1"
-    assert stored_sparse == "s-sparse-1"
-    assert stored_name == "photo_full.dng"
+    cur.execute("SELECT COUNT(*), MAX(width) FROM media_metadata WHERE file_id = ?", (file_id,))
+    assert cur.fetchone() == (1, 40)
+
+def test_init_schema_migrates_path_keys():
+    import sqlite3
+    from photo_organizer.database.schema import init_schema
+
+    conn = sqlite3.connect(":memory:")
+    # A v1 catalog: files table without parent_dir/stem_lower
+    conn.execute("""
+        CREATE TABLE files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT UNIQUE, sparse_hash TEXT,
+            type TEXT NOT NULL, ext TEXT NOT NULL, orig_name TEXT NOT NULL,
+            orig_path TEXT NOT NULL, dest_path TEXT, size_bytes INTEGER,
+            is_seed INTEGER NOT NULL DEFAULT 0, name_score INTEGER NOT NULL DEFAULT 0,
+            first_seen_at TEXT NOT NULL, last_seen_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT INTO files (hash, type, ext, orig_name, orig_path, first_seen_at, last_seen_at)
+        VALUES ('h', 'raw', '.dng', 'IMG_1.DNG', '/src/IMG_1.DNG', 'x', 'x')
+    """)
+    conn.commit()
+
+    init_schema(conn)
+
+    row = conn.execute("SELECT parent_dir, stem_lower FROM files").fetchone()
+    assert row == ("/src", "img_1")
+    conn.close()
+
+def test_init_schema_drops_redundant_hash_index():
+    import sqlite3
+    from photo_organizer.database.schema import init_schema, CURRENT_SCHEMA_VERSION
+
+    conn = sqlite3.connect(":memory:")
+    init_schema(conn)
+    # Simulate a v2 catalog, which still carried the explicit hash index
+    conn.execute("CREATE INDEX idx_files_hash ON files(hash)")
+    conn.execute("UPDATE schema_version SET version = 2")
+    conn.commit()
+
+    init_schema(conn)
+
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_files_hash" not in names
+    assert conn.execute("SELECT version FROM schema_version").fetchone() == (CURRENT_SCHEMA_VERSION,)
+    conn.close()
+
+def test_init_schema_rebuilds_occurrences_without_rowid():
+    import sqlite3
+    from photo_organizer.database.schema import init_schema
+
+    conn = sqlite3.connect(":memory:")
+    init_schema(conn)
+    # Recreate the v3 rowid layout with one row in it
+    conn.execute("DROP TABLE file_occurrences")
+    conn.execute("""
+        CREATE TABLE file_occurrences (
+            path TEXT PRIMARY KEY, file_id INTEGER NOT NULL, is_seed INTEGER NOT NULL DEFAULT 0,
+            seen_at REAL NOT NULL, mtime REAL NOT NULL, size_bytes INTEGER NOT NULL,
+            hash TEXT NOT NULL, hash_is_sparse INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        INSERT INTO files (hash, type, ext, orig_name, orig_path, first_seen_at, last_seen_at)
+        VALUES ('h', 'raw', '.dng', 'a.dng', '/src/a.dng', 'x', 'x')
+    """)
+    conn.execute("INSERT INTO file_occurrences VALUES ('/src/a.dng', 1, 0, 1.0, 2.0, 3, 'h', 0)")
+    conn.execute("UPDATE schema_version SET version = 3")
+    conn.commit()
+
+    init_schema(conn)
+
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'file_occurrences'").fetchone()[0]
+    assert "WITHOUT ROWID" in sql
+    assert conn.execute("SELECT path, hash FROM file_occurrences").fetchall() == [("/src/a.dng", "h")]
+    indices = {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'file_occurrences'")}
+    assert "idx_file_occurrences_hash" in indices
+    conn.close()
+
+
+def test_init_schema_keeps_hash_algorithm_of_existing_catalog(monkeypatch):
+    import sqlite3
+    from photo_organizer import config
+    from photo_organizer.database.ops import DBOperations
+    from photo_organizer.database.schema import init_schema
+
+    monkeypatch.setattr(config, "FULL_HASH_ALGORITHM", "blake3")
+    conn = sqlite3.connect(":memory:")
+    init_schema(conn)
+    # A catalog from before the algorithm was recorded, holding SHA-256 hashes
+    conn.execute("DELETE FROM catalog_meta")
+    conn.execute("""
+        INSERT INTO files (hash, type, ext, orig_name, orig_path, first_seen_at, last_seen_at)
+        VALUES ('0faa', 'raw', '.dng', 'a.dng', '/src/a.dng', 'x', 'x')
+    """)
+    conn.commit()
+
+    init_schema(conn)
+    assert DBOperations(conn).get_hash_algorithm() == "sha256"
+
+    # Once recorded, the config default no longer matters
+    monkeypatch.setattr(config, "FULL_HASH_ALGORITHM", "sha256")
+    conn.execute("DELETE FROM files")
+    conn.execute("UPDATE catalog_meta SET value = 'blake3'")
+    init_schema(conn)
+    assert DBOperations(conn).get_hash_algorithm() == "blake3"
+    conn.close()
+
+
+def test_connect_read_only_reads_but_refuses_writes(tmp_path):
+    import sqlite3
+    from photo_organizer.database.db import DBManager, connect_read_only
+
+    db_path = tmp_path / "catalog db.sqlite"
+    with DBManager(db_path) as writer:
+        writer.execute(
+            "INSERT INTO files (type, ext, orig_name, orig_path, size_bytes, first_seen_at, last_seen_at) "
+            "VALUES ('jpeg', '.jpg', 'a.jpg', '/a.jpg', 1, 'now', 'now')"
+        )
+        writer.commit()
+
+    conn = connect_read_only(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM files")
+    finally:
+        conn.close()
@@ -1,3 +1,4 @@
+import sys
 import pytest
 from pathlib import Path
 from datetime import datetime, timezone
@@ -15,7 +16,7 @@ class MockMediaInfo:
         self.tracks = tracks
     
     @classmethod
-    def parse(cls, path):
+    def parse(cls, path, **kwargs):
         # Return specific data based on path for testing
         return cls([MockTrack(
             duration=5000, 
@@ -36,4 +37,128 @@ def test_video_metadata_extraction(monkeypatch, tmp_path):
 
     assert dt == datetime(2023, 1, 1, 12, 0, 0)
     assert dur == 5.0
-    assert cam == "TestCam"
\ No newline at end of file
+    assert cam == "TestCam"
+
+FAKE_EXIFTOOL = '''\
+import json, sys
+paths = []
+for line in sys.stdin:
+    line = line.rstrip("\\n")
+    if line == "-execute":
+        out = [{"SourceFile": p, "CreateDate": "2022:05:06 07:08:09", "Duration": 2.5}
+               for p in paths if not p.endswith("missing.mp4")]
+        print(json.dumps(out) if out else "")
+        print("{ready}", flush=True)
+        paths = []
+    elif line == "-stay_open":
+        continue
+    elif line == "False":
+        break
+    else:
+        paths.append(line)
+'''
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses a shebang script as exiftool")
+def test_exiftool_batch_reuses_one_session(tmp_path):
+    fake = tmp_path / "exiftool"
+    fake.write_text(f"#!{sys.executable}\n" + FAKE_EXIFTOOL)
+    fake.chmod(0o755)
+
+    extractor = MetadataExtractor()
+    extractor._exiftool.executable = str(fake)
+    try:
+        a, missing, b = tmp_path / "a.mp4", tmp_path / "missing.mp4", tmp_path / "b.mp4"
+        results = extractor.extract_videos_batch([a, missing, b])
+        proc = extractor._exiftool._proc
+
+        assert results[0]['dt'] == datetime(2022, 5, 6, 7, 8, 9)
+        assert results[0]['duration'] == 2.5
+        assert results[1] == {'dt': None, 'duration': None, 'camera': None}
+        assert results[2]['duration'] == 2.5
+
+        # Single-file fallback goes through the same process
+        assert extractor._extract_exiftool(a)['duration'] == 2.5
+        assert extractor._exiftool._proc is proc
+    finally:
+        extractor.close()
+    assert proc.poll() is not None
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses a shebang script as exiftool")
+def test_videos_metadata_batches_exiftool_fallback(monkeypatch, tmp_path):
+    import photo_organizer.metadata.extract as extract_module
+    monkeypatch.setattr(extract_module, "MediaInfo", None)
+    fake = tmp_path / "exiftool"
+    fake.write_text(f"#!{sys.executable}\n" + FAKE_EXIFTOOL)
+    fake.chmod(0o755)
+
+    extractor = MetadataExtractor()
+    extractor._exiftool.executable = str(fake)
+    calls = []
+    real_execute = extractor._exiftool.execute
+    def counting_execute(paths):
+        calls.append(list(paths))
+        return real_execute(paths)
+    extractor._exiftool.execute = counting_execute
+    try:
+        paths = [str(tmp_path / "a.mp4"), str(tmp_path / "missing.mp4"), str(tmp_path / "b.mp4")]
+        results = extractor.get_videos_metadata(paths)
+    finally:
+        extractor.close()
+
+    assert len(calls) == 1
+    assert results[0] == (datetime(2022, 5, 6, 7, 8, 9), 2.5, None)
+    assert results[1] == (None, None, None)
+    assert results[2][1] == 2.5
+
+def test_parse_flexible_date_formats():
+    extractor = MetadataExtractor()
+    expected = datetime(2023, 1, 1, 12, 0, 0)
+
+    assert extractor._parse_flexible_date("2023:01:01 12:00:00") == expected
+    assert extractor._parse_flexible_date("2023:01:01 12:00:00.55") == expected
+    assert extractor._parse_flexible_date("UTC 2023-01-01 12:00:00") == expected
+    assert extractor._parse_flexible_date("2023-01-01T12:00:00") == expected
+    assert extractor._parse_flexible_date("not a date") is None
+
+def test_parse_exif_date_accepts_colon_and_dash_dates():
+    extractor = MetadataExtractor()
+    expected = datetime(2023, 1, 1, 12, 0, 0)
+
+    assert extractor._parse_exif_date({"EXIF DateTimeOriginal": "2023:01:01 12:00:00"}) == expected
+    assert extractor._parse_exif_date({"EXIF DateTimeOriginal": "2023-01-01 12:00:00"}) == expected
+    # A malformed tag falls through to the next one
+    assert extractor._parse_exif_date({"EXIF DateTimeOriginal": "0000:00:00 00:00:00",
+                                       "Image DateTime": "2023-01-01 12:00:00"}) == expected
+
+def test_image_metadata_reads_header_then_falls_back(monkeypatch, tmp_path):
+    import io
+    import photo_organizer.metadata.extract as extract_module
+
+    class FakeTag:
+        def __init__(self, value):
+            self.values = value
+        def __str__(self):
+            return self.values
+
+    calls = []
+    class FakeExifread:
+        @staticmethod
+        def process_file(fh, **kwargs):
+            calls.append(type(fh))
+            if isinstance(fh, io.BytesIO) and fh.getbuffer().nbytes >= extract_module._EXIF_HEADER_BYTES:
+                return {}  # date lies beyond the header
+            return {"EXIF DateTimeOriginal": FakeTag("2021:02:03 04:05:06")}
+
+    monkeypatch.setattr(extract_module, "exifread", FakeExifread)
+    extractor = MetadataExtractor()
+
+    small = tmp_path / "small.jpg"
+    small.write_bytes(b"\xff\xd8" + b"\0" * 1000)
+    assert extractor.get_image_metadata(small)[0] == datetime(2021, 2, 3, 4, 5, 6)
+    assert calls == [io.BytesIO]
+
+    calls.clear()
+    big = tmp_path / "big.tif"
+    big.write_bytes(b"\0" * (extract_module._EXIF_HEADER_BYTES + 10))
+    assert extractor.get_image_metadata(big)[0] == datetime(2021, 2, 3, 4, 5, 6)
+    assert calls == [io.BytesIO, io.BufferedReader]
@@ -122,6 +122,48 @@ def test_mover_execute(db_ops, tmp_path):
     assert row[1] == 0
 
 
+def test_mover_execute_threaded(db_ops, tmp_path):
+    dests = []
+    for i in range(6):
+        src = tmp_path / f"f{i}.file"
+        src.write_text(f"content {i}")
+        dest = tmp_path / "dest" / f"sub{i % 2}" / f"f{i}.file"
+        rec = FileRecord(
+            hash=f"h{i}", type="other", ext=".file",
+            orig_name=src.name, orig_path=src,
+            size_bytes=src.stat().st_size, is_seed=False, name_score=1,
+        )
+        fid = db_ops.upsert_file_record(rec)
+        db_ops.update_dest_path(fid, str(dest))
+        dests.append(dest)
+
+    FileMover(db_ops, threads=4).execute(move_mode=False, dry_run=False)
+
+    assert [d.read_text() for d in dests] == [f"content {i}" for i in range(6)]
+    cur = db_ops.conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM file_occurrences WHERE path LIKE ?", (str(tmp_path / "dest") + "%",))
+    assert cur.fetchone()[0] == 6
+
+def test_mover_skips_existing_destinations(db_ops, tmp_path):
+    dest_dir = tmp_path / "dest"
+    dest_dir.mkdir()
+    (dest_dir / "done.file").write_text("already here")
+    for name in ("done.file", "new.file"):
+        src = tmp_path / name
+        src.write_text("source")
+        rec = FileRecord(
+            hash=name, type="other", ext=".file",
+            orig_name=name, orig_path=src,
+            size_bytes=6, is_seed=False, name_score=1,
+        )
+        fid = db_ops.upsert_file_record(rec)
+        db_ops.update_dest_path(fid, str(dest_dir / name))
+
+    FileMover(db_ops).execute(move_mode=False, dry_run=False)
+
+    assert (dest_dir / "done.file").read_text() == "already here"
+    assert (dest_dir / "new.file").read_text() == "source"
+
 def test_linked_psd_prefers_output_folder(db_ops, tmp_path):
     dest_root = tmp_path / "dest"
     dt = datetime(2021, 1, 1)
@@ -161,3 +203,109 @@ def test_linked_psd_prefers_output_folder(db_ops, tmp_path):
     dest_parts = [part.lower() for part in Path(psd_dest).parts]
     assert "output" in dest_parts
     assert "raw" not in dest_parts
+
+
+def test_linked_sidecar_follows_raw_dest(db_ops, tmp_path):
+    dest_root = tmp_path / "dest"
+
+    raw = FileRecord(
+        hash="raw_h", type="raw", ext=".dng",
+        orig_name="img.dng", orig_path=Path("/src/img.dng"),
+        size_bytes=10, is_seed=False, name_score=1,
+        capture_datetime=datetime(2021, 1, 1)
+    )
+    sidecar = FileRecord(
+        hash="xmp_h", type="sidecar", ext=".xmp",
+        orig_name="img.xmp", orig_path=Path("/src/img.xmp"),
+        size_bytes=1, is_seed=False, name_score=0
+    )
+
+    raw_id = db_ops.upsert_file_record(raw)
+    db_ops.upsert_media_metadata(raw_id, raw)
+    sidecar_id = db_ops.upsert_file_record(sidecar)
+
+    FileLinker(db_ops).link_raw_sidecars()
+    DestinationPlanner(db_ops).plan_all(dest_root)
+    PhotoOrganizerApp(Path("dummy.db"))._assign_linked_destinations(db_ops)
+
+    cur = db_ops.conn.cursor()
+    cur.execute("SELECT dest_path FROM files WHERE id = ?", (raw_id,))
+    raw_dest = Path(cur.fetchone()[0])
+    cur.execute("SELECT dest_path FROM files WHERE id = ?", (sidecar_id,))
+    sidecar_dest = Path(cur.fetchone()[0])
+
+    assert sidecar_dest == raw_dest.with_suffix(".xmp")
+
+
+def test_normalize_stem_strips_markers_in_order(db_ops):
+    linker = FileLinker(db_ops)
+    assert linker._normalize_stem("IMG_0001(1)_copy") == "img_0001"
+    assert linker._normalize_stem("IMG_0001(2)(copy)") == "img_0001"
+    assert linker._normalize_stem("IMG_0001_copy(3)") == "img_0001_copy"
+
+def test_psd_relink_replaces_link_and_timestamp(db_ops):
+    psd, first, second, third = (
+        db_ops.upsert_file_record(FileRecord(
+            hash=f"h{i}", type=ftype, ext=ext, orig_name=f"f{i}{ext}",
+            orig_path=Path(f"/src/f{i}{ext}"), size_bytes=10, is_seed=False, name_score=0,
+        ))
+        for i, (ftype, ext) in enumerate([("psd", ".psd"), ("jpeg", ".jpg"), ("jpeg", ".jpg"), ("raw", ".dng")])
+    )
+    linker = FileLinker(db_ops)
+    linker._save_psd_links([(psd, first, 100, "stem"), (psd, second, 100, "stem")])
+    cur = db_ops.conn.cursor()
+    cur.execute("SELECT source_file_id, confidence FROM psd_source_links WHERE psd_file_id = ?", (psd,))
+    assert cur.fetchone() == (second, 100)
+
+    # A later run's link wins even when less confident, like INSERT OR REPLACE
+    db_ops.conn.execute("UPDATE psd_source_links SET linked_at = '2000-01-01 00:00:00'")
+    linker._save_psd_links([(psd, third, 95, "smart_object")])
+    cur.execute("SELECT source_file_id, confidence, linked_at FROM psd_source_links WHERE psd_file_id = ?", (psd,))
+    source_id, confidence, linked_at = cur.fetchone()
+    assert (source_id, confidence) == (third, 95)
+    assert linked_at != "2000-01-01 00:00:00"
+
+def test_planner_uses_current_folder_pattern(db_ops, tmp_path, monkeypatch):
+    monkeypatch.setattr("photo_organizer.config.FOLDER_PATTERN", "{year}_{month:02d}")
+    rec = FileRecord(
+        hash="h1", type="raw", ext=".dng",
+        orig_name="img.dng", orig_path=Path("/src/img.dng"),
+        size_bytes=10, is_seed=False, name_score=1,
+        capture_datetime=datetime(2021, 3, 1)
+    )
+    file_id = db_ops.upsert_file_record(rec)
+    db_ops.upsert_media_metadata(file_id, rec)
+
+    DestinationPlanner(db_ops).plan_all(tmp_path)
+
+    cur = db_ops.conn.cursor()
+    cur.execute("SELECT dest_path FROM files WHERE id = ?", (file_id,))
+    assert Path(cur.fetchone()[0]).parent == tmp_path / "raw" / "2021_03"
+
+def test_mover_buffered_copy_fallback(db_ops, tmp_path):
+    src = tmp_path / "big.bin"
+    data = bytes(range(256)) * 10000  # spans several reads of the minimum buffer
+    src.write_bytes(data)
+    dest = tmp_path / "copy.bin"
+
+    FileMover(db_ops)._buffered_copy(src, dest)
+
+    assert dest.read_bytes() == data
+
+
+def test_mover_move_mode_renames(db_ops, tmp_path):
+    src = tmp_path / "a.file"
+    src.write_text("payload")
+    dest = tmp_path / "dest" / "2021" / "a.file"
+    rec = FileRecord(
+        hash="hm", type="other", ext=".file",
+        orig_name=src.name, orig_path=src,
+        size_bytes=7, is_seed=False, name_score=1,
+    )
+    fid = db_ops.upsert_file_record(rec)
+    db_ops.update_dest_path(fid, str(dest))
+
+    FileMover(db_ops).execute(move_mode=True, dry_run=False)
+
+    assert not src.exists()
+    assert dest.read_text() == "payload"
@@ -0,0 +1,125 @@
+import csv
+import os
+from pathlib import Path
+
+from photo_organizer.models import FileRecord
+from photo_organizer.reporting import ReportGenerator
+from photo_organizer.scanning.hasher import FileHasher
+
+
+def _read_report(path: Path) -> dict:
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0][0] == "Source Path"
+    return {Path(r[0]).name: r for r in rows[1:]}
+
+
+def test_source_report_statuses(db_ops, tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    canonical = src / "a.jpg"
+    canonical.write_bytes(b"same bytes")
+    duplicate = src / "a copy.jpg"
+    duplicate.write_bytes(b"same bytes")
+    (src / "new.jpg").write_bytes(b"never scanned")
+    (src / "notes.txt").write_text("ignored")
+
+    file_hash = FileHasher().compute_hash(canonical, set(), force_full=True).full_hash
+    rec = FileRecord(
+        hash=file_hash, type="jpeg", ext=".jpg",
+        orig_name=canonical.name, orig_path=str(canonical.resolve()),
+        size_bytes=10, is_seed=False, name_score=0,
+    )
+    fid = db_ops.upsert_file_record(rec)
+    db_ops.update_dest_path(fid, "/lib/a.jpg")
+    db_ops.record_occurrence(fid, canonical.resolve(), False, 0.0, 10, file_hash, False)
+
+    out_csv = tmp_path / "report.csv"
+    ReportGenerator(db_ops).generate_source_report(str(src), str(out_csv))
+    report = _read_report(out_csv)
+
+    assert report["a.jpg"][1] == "Scheduled Copy/Move"
+    assert report["a.jpg"][3] == "/lib/a.jpg"
+    assert report["a copy.jpg"][1] == "Duplicate"
+    assert report["a copy.jpg"][4] == str(canonical.resolve())
+    assert report["new.jpg"][1] == "Not In Catalog"
+    assert report["notes.txt"][1] == "Skipped"
+
+
+def test_report_hashes_hard_links_once(db_ops, tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    original = src / "a.jpg"
+    original.write_bytes(b"linked bytes")
+    os.link(original, src / "b.jpg")
+    # A catalogued file of the same size, so the size prefilter lets them through
+    db_ops.upsert_file_record(FileRecord(
+        hash="other", type="jpeg", ext=".jpg",
+        orig_name="c.jpg", orig_path="/elsewhere/c.jpg",
+        size_bytes=len(b"linked bytes"), is_seed=False, name_score=0,
+    ))
+
+    calls = []
+    real_compute = FileHasher.compute_hash
+    def counting_compute(self, path, *args, **kwargs):
+        calls.append(path)
+        return real_compute(self, path, *args, **kwargs)
+    monkeypatch.setattr(FileHasher, "compute_hash", counting_compute)
+
+    out_csv = tmp_path / "report.csv"
+    ReportGenerator(db_ops, hash_workers=1).generate_source_report(str(src), str(out_csv))
+
+    report = _read_report(out_csv)
+    assert report["a.jpg"][1] == report["b.jpg"][1] == "Not In Catalog"
+    assert len(calls) == 1
+
+
+def test_report_skips_hash_for_unseen_sizes(db_ops, tmp_path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "new.jpg").write_bytes(b"a size nothing in the catalog has")
+
+    def failing_compute(self, path, *args, **kwargs):
+        raise AssertionError("size prefilter should have skipped hashing")
+    monkeypatch.setattr(FileHasher, "compute_hash", failing_compute)
+
+    out_csv = tmp_path / "report.csv"
+    ReportGenerator(db_ops).generate_source_report(str(src), str(out_csv))
+
+    assert _read_report(out_csv)["new.jpg"][1] == "Not In Catalog"
+
+
+def test_report_confirms_sparse_only_matches(db_ops, tmp_path, monkeypatch):
+    monkeypatch.setattr("photo_organizer.config.SPARSE_HASH_THRESHOLD", 16)
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    src = tmp_path / "src"
+    src.mkdir()
+    # Catalogued sparse-only: a large clip and a small file (size prefilter)
+    clip = lib / "clip.mp4"
+    clip.write_bytes(b"large video bytes" * 4)
+    note = lib / "note.jpg"
+    note.write_bytes(b"tiny")
+    # Same size as the clip, different bytes; sampled blocks collide by fiat
+    lookalike = b"L" + clip.read_bytes()[1:]
+    monkeypatch.setattr(FileHasher, "_sparse_hash", lambda self, path, size: f"s-{size}")
+
+    hasher = FileHasher()
+    for path, file_type in ((clip, "video"), (note, "jpeg")):
+        size = path.stat().st_size
+        db_ops.upsert_file_record(FileRecord(
+            hash=None, sparse_hash=hasher._sparse_hash(path, size), type=file_type,
+            ext=path.suffix, orig_name=path.name, orig_path=str(path),
+            size_bytes=size, is_seed=False, name_score=0,
+        ))
+    (src / "clip copy.mp4").write_bytes(clip.read_bytes())
+    (src / "note copy.jpg").write_bytes(note.read_bytes())
+    (src / "lookalike.mp4").write_bytes(lookalike)
+
+    out_csv = tmp_path / "report.csv"
+    ReportGenerator(db_ops).generate_source_report(str(src), str(out_csv))
+
+    rows = _read_report(out_csv)
+    assert rows["clip copy.mp4"][1] == "Duplicate"
+    assert rows["note copy.jpg"][1] == "Duplicate"
+    assert rows["lookalike.mp4"][1] == "Not In Catalog"
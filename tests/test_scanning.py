@@ -1,3 +1,4 @@
+import os
 import pytest
 from pathlib import Path
 from datetime import datetime
@@ -32,9 +33,10 @@ def test_scanner_iterates_and_skips(tmp_path):
     # We access the internal _iter_files to verify traversal logic directly
     files = list(scanner._iter_files(root, skip_dirs={skip_dir}))
     
-    assert (skip_dir / "skip.txt") not in files
-    assert (root / "c.txt") in files
-    assert (sub / "b.txt") in files
+    # The walker yields plain path strings
+    assert str(skip_dir / "skip.txt") not in files
+    assert str(root / "c.txt") in files
+    assert str(sub / "b.txt") in files
 
 def test_classify_extension():
     # We can check the config map directly as the logic is now a simple lookup
@@ -63,3 +65,244 @@ def test_scanner_produces_records(monkeypatch, tmp_path):
     assert isinstance(rec, FileRecord)
     assert rec.type == 'raw'
     assert rec.capture_datetime == dt
+
+def test_full_hash_sha256_fallback(monkeypatch, tmp_path):
+    import hashlib
+    p = tmp_path / "sample.bin"
+    data = b"abc" * 100
+    p.write_bytes(data)
+
+    monkeypatch.setattr(config, "FULL_HASH_ALGORITHM", "sha256")
+    res = FileHasher().compute_hash(p, set())
+    assert res.full_hash == hashlib.sha256(data).hexdigest()
+
+def test_hasher_uses_the_algorithm_it_is_given(monkeypatch, tmp_path):
+    import hashlib
+    p = tmp_path / "sample.bin"
+    p.write_bytes(b"abc" * 100)
+
+    # The catalog's algorithm wins over the config default
+    monkeypatch.setattr(config, "FULL_HASH_ALGORITHM", "blake3")
+    assert FileHasher("sha256").compute_hash(p, set()).full_hash == hashlib.sha256(b"abc" * 100).hexdigest()
+    with pytest.raises(ValueError):
+        FileHasher("md5")
+
+def test_size_prefilter_skips_full_hash(tmp_path):
+    a = tmp_path / "a.bin"
+    b = tmp_path / "b.bin"
+    a.write_bytes(b"x" * 100)
+    b.write_bytes(b"x" * 100)
+
+    hasher = FileHasher()
+    known_sparse: set = set()
+    known_sizes: set = set()
+
+    first = hasher.compute_hash(a, known_sparse, known_sizes=known_sizes)
+    assert first.full_hash is None
+    assert first.is_sparse
+    known_sparse.add(first.sparse_hash)
+    known_sizes.add(100)
+
+    # Same size is a duplicate candidate: full hash plus a matching sparse hint
+    second = hasher.compute_hash(b, known_sparse, known_sizes=known_sizes)
+    assert second.full_hash is not None
+    assert second.sparse_hash == first.sparse_hash
+
+def test_calculate_score_penalizes_camera_names():
+    scanner = DiskScanner()
+    assert scanner._calculate_score("IMG_1234") < scanner._calculate_score("img_1234x")
+    assert scanner._calculate_score("DSCF0001") < scanner._calculate_score("beach sunset")
+
+def test_scan_with_metadata_pool_keeps_walk_order(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "SCAN_BATCH_SIZE", 2)
+    names = ["a.jpg", "b.dng", "c.txt", "d.jpg", "e.tif"]
+    for i, name in enumerate(names):
+        (tmp_path / name).write_bytes(bytes([i]) * (10 + i))
+
+    scanner = DiskScanner(metadata_workers=2)
+    results = list(scanner.scan(tmp_path, is_seed=False, known_sparse_hashes=set()))
+
+    assert [r.orig_name for r in results] == names
+    # Every record gets a capture date, from EXIF or the mtime fallback
+    assert all(r.capture_datetime is not None for r in results)
+
+
+def test_threaded_walk_matches_sequential_order(tmp_path):
+    for rel in ["b/z.jpg", "b/a/y.jpg", "A/x.jpg", "A/c/w.jpg", "top.jpg", "b/a/deep/v.jpg"]:
+        f = tmp_path / rel
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text("x")
+
+    def sequential(d):
+        entries = sorted(os.scandir(d), key=lambda e: e.name.lower())
+        for e in entries:
+            if e.is_file():
+                yield e.path
+        for e in entries:
+            if e.is_dir():
+                yield from sequential(e.path)
+
+    expected = list(sequential(tmp_path))
+    for threads in (1, 4):
+        assert list(DiskScanner(walk_threads=threads)._iter_files(tmp_path, set())) == expected
+
+
+def test_sparse_hash_pread_matches_seek_reads(monkeypatch, tmp_path):
+    from photo_organizer.scanning import hasher as hasher_mod
+    f = tmp_path / "big.bin"
+    f.write_bytes(bytes(range(256)) * 100)
+    size = f.stat().st_size
+
+    h = FileHasher()
+    with_pread = h._sparse_hash(f, size)
+    monkeypatch.setattr(hasher_mod, "_HAS_PREAD", False)
+    assert h._sparse_hash(f, size) == with_pread
+
+
+def test_hash_batch_matches_sequential_compute_hash(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(config, "SPARSE_HASH_THRESHOLD", 64)
+    contents = [b"small", b"L" * 100, b"L" * 100, b"M" * 100, b"small", b"x" * 7]
+    files = []
+    for i, data in enumerate(contents):
+        f = tmp_path / f"f{i}.bin"
+        f.write_bytes(data)
+        files.append((str(f), len(data)))
+
+    h = FileHasher()
+    for known_sizes in (None, {5}):
+        seq_sparse, seq_sizes = set(), None if known_sizes is None else set(known_sizes)
+        expected = []
+        for path, size in files:
+            res = h.compute_hash(path, seq_sparse, known_sizes=seq_sizes, file_size=size)
+            if res.sparse_hash:
+                seq_sparse.add(res.sparse_hash)
+            if seq_sizes is not None:
+                seq_sizes.add(size)
+            expected.append(res)
+
+        batch_sparse, batch_sizes = set(), None if known_sizes is None else set(known_sizes)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            got = h.hash_batch(files, batch_sparse, batch_sizes, pool)
+        assert got == expected
+        assert batch_sparse == seq_sparse
+
+
+def test_scan_skips_metadata_for_dated_content(monkeypatch, tmp_path):
+    (tmp_path / "a_known.jpg").write_bytes(b"already catalogued")
+    (tmp_path / "b_new.jpg").write_bytes(b"new content")
+    (tmp_path / "c_copy.jpg").write_bytes(b"new content")
+
+    from photo_organizer.metadata.extract import MetadataExtractor
+    opened = []
+    def fake_meta(self, p):
+        opened.append(os.path.basename(p))
+        return datetime(2020, 1, 1), "cam", None
+    monkeypatch.setattr(MetadataExtractor, "get_image_metadata", fake_meta)
+
+    # One file per batch, so the copy is seen after its original was dated
+    monkeypatch.setattr(config, "SCAN_BATCH_SIZE", 1)
+    known_hash = FileHasher().compute_hash(tmp_path / "a_known.jpg", set()).full_hash
+    dated = {known_hash}
+    scanner = DiskScanner(hash_workers=1)
+    records = {r.orig_name: r for r in scanner.scan(tmp_path, False, set(), dated_hashes=dated)}
+
+    assert opened == ["b_new.jpg"]
+    assert records["a_known.jpg"].metadata_loaded is False
+    assert records["b_new.jpg"].metadata_loaded is True
+    assert records["c_copy.jpg"].metadata_loaded is False
+
+
+def test_scan_reads_metadata_when_only_sparse_hash_is_dated(monkeypatch, tmp_path, db_ops):
+    head = b"h" * 4096
+    (tmp_path / "a_known.jpg").write_bytes(head + b"a" * 2048)
+    (tmp_path / "b_lookalike.jpg").write_bytes(head + b"b" * 2048)
+
+    from photo_organizer.metadata.extract import MetadataExtractor
+    opened = []
+    def fake_meta(self, p):
+        opened.append(os.path.basename(p))
+        return datetime(2020, 1, 1), "cam", None
+    monkeypatch.setattr(MetadataExtractor, "get_image_metadata", fake_meta)
+
+    hasher = FileHasher()
+    known = tmp_path / "a_known.jpg"
+    size = known.stat().st_size
+    sparse = hasher._sparse_hash(known, size)
+    assert hasher._sparse_hash(tmp_path / "b_lookalike.jpg", size) == sparse
+    # Catalogued with both hashes, as a scan stores a file of an already-seen size
+    rec = FileRecord(
+        hash=hasher._full_hash(known, size), sparse_hash=sparse, type="jpeg", ext=".jpg",
+        orig_name=known.name, orig_path=str(known), size_bytes=size, is_seed=False, name_score=0,
+        capture_datetime=datetime(2020, 1, 1),
+    )
+    db_ops.upsert_media_metadata(db_ops.upsert_file_record(rec), rec)
+    dated = db_ops.fetch_hashes_with_metadata()
+    scanner = DiskScanner(hash_workers=1)
+    records = {r.orig_name: r for r in scanner.scan(tmp_path, False, {sparse}, known_sizes={size},
+                                                      dated_hashes=dated)}
+
+    assert opened == ["b_lookalike.jpg"]
+    assert records["a_known.jpg"].metadata_loaded is False
+    assert records["b_lookalike.jpg"].metadata_loaded is True
+
+
+def test_list_dir_orders_files_by_inode(monkeypatch, tmp_path):
+    from photo_organizer import config
+    from photo_organizer.scanning.filesystem import _list_dir
+    for name in ["c.jpg", "a.jpg", "b.jpg"]:
+        (tmp_path / name).write_text("x")
+    (tmp_path / "sub").mkdir()
+
+    monkeypatch.setattr(config, "WALK_INODE_ORDER", True)
+    dirs, files = _list_dir(str(tmp_path))
+    assert dirs == [str(tmp_path / "sub")]
+    assert [e.inode() for e in files] == sorted(e.inode() for e in files)
+
+    monkeypatch.setattr(config, "WALK_INODE_ORDER", False)
+    assert [e.name for e in _list_dir(str(tmp_path))[1]] == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_pipelined_batches_match_single_batch(monkeypatch, tmp_path):
+    for i in range(7):
+        (tmp_path / f"f{i}.txt").write_bytes(b"same" if i % 3 == 0 else f"unique {i}".encode())
+
+    def run(batch_size):
+        monkeypatch.setattr(config, "SCAN_BATCH_SIZE", batch_size)
+        records = DiskScanner(hash_workers=2).scan(tmp_path, False, set(), known_sizes=set())
+        return [(r.orig_name, r.hash, r.sparse_hash) for r in records]
+
+    assert run(2) == run(1000)
+
+def test_file_record_stores_orig_path_as_str():
+    rec = FileRecord(
+        hash="h1", type="raw", ext=".dng",
+        orig_name="img.dng", orig_path=Path("/src/img.dng"),
+        size_bytes=10, is_seed=False, name_score=1,
+    )
+    assert rec.orig_path == os.fspath(Path("/src/img.dng"))
+    assert not hasattr(rec, "__dict__")
+
+
+def test_scan_reuses_cached_full_hash_for_unchanged_files(monkeypatch, tmp_path):
+    p = tmp_path / "a.bin"
+    p.write_bytes(b"content")
+    st = p.stat()
+    other = tmp_path / "b.bin"
+    other.write_bytes(b"changed")
+
+    hash_cache = {
+        str(p): (st.st_mtime, st.st_size, "cached-full", "s-cached"),
+        # Size no longer matches: must be hashed again
+        str(other): (other.stat().st_mtime, 999, "stale", None),
+    }
+    known_sparse: set = set()
+    results = list(DiskScanner().scan(tmp_path, is_seed=False, known_sparse_hashes=known_sparse,
+                                      hash_cache=hash_cache))
+
+    by_name = {r.orig_name: r for r in results}
+    assert by_name["a.bin"].hash == "cached-full"
+    assert by_name["a.bin"].sparse_hash == "s-cached"
+    assert not by_name["a.bin"].hash_is_sparse
+    assert by_name["b.bin"].hash not in (None, "stale")
+    assert "s-cached" in known_sparse
@@ -3,7 +3,10 @@
 Diagnostic tool to compare video metadata extraction across pymediainfo, ffprobe, and exiftool.
 
 Usage:
-  python tools/check_video_metadata.py <sample_dir> [<output_csv>]
+  python tools/check_video_metadata.py [--fast] <sample_dir> [<output_csv>]
+
+  --fast  Skip ffprobe and exiftool for files where pymediainfo already found
+          every field (their rows are noted as skipped).
 
 Example:
   python tools/check_video_metadata.py "D:\\Videos" video_report.csv
@@ -15,9 +18,13 @@ Output:
 """
 
 import csv
+import ctypes.util
 import json
+import os
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
@@ -25,43 +32,118 @@ try:
 except ImportError:
     MediaInfo = None
 
+# libmediainfo resolved once; without library_file, every MediaInfo.parse call
+# searches for and loads the library again. None keeps pymediainfo's own lookup
+# (e.g. the DLL bundled with the Windows wheel).
+_MEDIAINFO_LIB = ctypes.util.find_library("mediainfo") if MediaInfo is not None else None
+
+# Optional: PyAV reads the same libavformat data as ffprobe, in-process
+# (no ffprobe process per file). CHECK_VIDEO_FFPROBE_CLI=1 forces the CLI.
+try:
+    import av
+except ImportError:
+    av = None
+
+
+# MediaInfo JSON field names (new-style, not the pymediainfo attribute names)
+_MI_DATE_FIELDS = ("Recorded_Date", "Encoded_Date", "Tagged_Date", "File_Modified_Date")
+_MI_CAMERA_FIELDS = ("Performer", "Encoded_Library", "Model")
+
+
+def _first_field(track, fields):
+    for field in fields:
+        value = track.get(field)
+        if value:
+            return value
+    return None
+
 
 def media_info_extract(path):
-    """Extract metadata using pymediainfo.MediaInfo.parse()."""
+    """
+    Extract metadata using pymediainfo.MediaInfo.parse().
+    Asks libmediainfo for its JSON report and reads the few fields we need
+    from plain dicts, instead of building a Track object per track.
+    """
     if MediaInfo is None:
         return {"error": "pymediainfo not installed"}
     try:
-        mi = MediaInfo.parse(str(path))
+        report = json.loads(MediaInfo.parse(str(path), library_file=_MEDIAINFO_LIB, output_format="JSON"))
         data = {}
-        for track in mi.tracks:
-            if track.track_type == "General":
-                # Duration is in milliseconds; convert to seconds
-                if hasattr(track, "duration") and track.duration:
-                    data["duration_sec"] = float(track.duration) / 1000.0
-                # Try various date fields
-                for field in ["recorded_date", "encoded_date", "tagged_date", "file_last_modification_date"]:
-                    if hasattr(track, field) and getattr(track, field):
-                        data["capture_datetime"] = getattr(track, field)
-                        break
-                # Camera model from performer (device/manufacturer), encoder, or device_model
-                for field in ["performer", "encoder", "device_model"]:
-                    if hasattr(track, field) and getattr(track, field):
-                        data["camera_model"] = getattr(track, field)
-                        break
-            elif track.track_type == "Video":
-                if hasattr(track, "width") and track.width:
-                    data["width"] = track.width
-                if hasattr(track, "height") and track.height:
-                    data["height"] = track.height
-                if hasattr(track, "format") and track.format:
-                    data["codec"] = track.format
+        for track in report.get("media", {}).get("track", []):
+            track_type = track.get("@type")
+            if track_type == "General":
+                # JSON reports the duration in seconds (the Track objects used ms)
+                duration = track.get("Duration")
+                if duration:
+                    data["duration_sec"] = float(duration)
+                capture = _first_field(track, _MI_DATE_FIELDS)
+                if capture:
+                    data["capture_datetime"] = capture
+                # Camera model from performer (device/manufacturer), encoder, or device model
+                camera = _first_field(track, _MI_CAMERA_FIELDS)
+                if camera:
+                    data["camera_model"] = camera
+            elif track_type == "Video":
+                if track.get("Width"):
+                    data["width"] = int(track["Width"])
+                if track.get("Height"):
+                    data["height"] = int(track["Height"])
+                if track.get("Format"):
+                    data["codec"] = track["Format"]
         return data
     except Exception as e:
         return {"error": str(e)}
 
 
+def _creation_tag(tag_dicts):
+    """First creation time found in ffprobe/libavformat tag dicts."""
+    for tags in tag_dicts:
+        tags = tags or {}
+        creation = (
+            tags.get("creation_time")
+            or tags.get("com.apple.quicktime.creationdate")
+            or tags.get("date")
+        )
+        if creation:
+            return creation
+    return None
+
+
 def ffprobe_extract(path):
-    """Extract metadata using ffprobe (FFmpeg)."""
+    """Extract metadata using FFmpeg: PyAV in-process when installed, else the ffprobe CLI."""
+    if av is not None and not os.environ.get("CHECK_VIDEO_FFPROBE_CLI"):
+        return _libav_extract(path)
+    return _ffprobe_cli_extract(path)
+
+
+def _libav_extract(path):
+    """ffprobe_extract through PyAV: the same container and stream fields."""
+    try:
+        with av.open(str(path)) as container:
+            data = {}
+            if container.duration is not None:
+                data["duration_sec"] = container.duration / av.time_base
+
+            creation = _creation_tag([container.metadata] + [s.metadata for s in container.streams])
+            if creation:
+                data["capture_datetime"] = creation
+
+            video = next((s for s in container.streams if s.type == "video"), None)
+            if video is not None:
+                ctx = video.codec_context
+                if ctx.width:
+                    data["width"] = ctx.width
+                if ctx.height:
+                    data["height"] = ctx.height
+                if ctx.name:
+                    data["codec"] = ctx.name
+            return data
+    except Exception as e:
+        return {"error": f"libav error: {e}"}
+
+
+def _ffprobe_cli_extract(path):
+    """Extract metadata using the ffprobe CLI."""
     cmd = [
         "ffprobe",
         "-v", "quiet",
@@ -88,15 +170,7 @@ def ffprobe_extract(path):
         data["duration_sec"] = float(fmt["duration"])
 
     # Try to find creation_time in tags (format or streams)
-    creation = None
-    for source in [fmt] + j.get("streams", []):
-        tags = source.get("tags", {}) or {}
-        if not creation:
-            creation = (
-                tags.get("creation_time")
-                or tags.get("com.apple.quicktime.creationdate")
-                or tags.get("date")
-            )
+    creation = _creation_tag(source.get("tags") for source in [fmt] + j.get("streams", []))
     if creation:
         data["capture_datetime"] = creation
 
@@ -114,14 +188,69 @@ def ffprobe_extract(path):
     return data
 
 
-def exiftool_extract(path):
-    """Extract metadata using exiftool."""
-    cmd = ["exiftool", "-j", str(path)]
+class ExifToolSession:
+    """
+    One `exiftool -stay_open` process for the whole run, fed a batch of files
+    per -execute through its argfile on stdin. Starting exiftool (a Perl
+    interpreter) per file costs far more than reading a video's tags.
+    Thread-safe: requests are serialized on a lock.
+    """
+
+    def __init__(self):
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def run(self, *paths):
+        """exiftool -j output for the given files, parsed (a list of tag dicts)."""
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                self._proc = subprocess.Popen(
+                    ["exiftool", "-stay_open", "True", "-@", "-",
+                     "-common_args", "-j", "-charset", "filename=utf8"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    encoding="utf-8",
+                )
+            self._proc.stdin.write("".join(f"{path}\n" for path in paths) + "-execute\n")
+            self._proc.stdin.flush()
+            lines = []
+            while True:
+                line = self._proc.stdout.readline()
+                if not line:
+                    self._proc = None
+                    raise RuntimeError("exiftool exited unexpectedly")
+                if line.rstrip() == "{ready}":
+                    break
+                lines.append(line)
+        out = "".join(lines).strip()
+        return json.loads(out) if out else []
+
+    def close(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.write("-stay_open\nFalse\n")
+            proc.stdin.flush()
+            proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+
+
+def exiftool_extract(path, session=None):
+    """Extract metadata using exiftool (through `session` when given)."""
     try:
-        out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
-        arr = json.loads(out)
-        if not arr:
-            return {}
+        if session is not None:
+            arr = session.run(path)
+            if not arr:
+                return {"error": "exiftool error: no output"}
+        else:
+            out = subprocess.check_output(["exiftool", "-j", str(path)], stderr=subprocess.DEVNULL, text=True)
+            arr = json.loads(out)
+            if not arr:
+                return {}
     except FileNotFoundError:
         return {"error": "exiftool not found on PATH"}
     except subprocess.CalledProcessError as e:
@@ -129,7 +258,40 @@ def exiftool_extract(path):
     except Exception as e:
         return {"error": str(e)}
 
-    tagmap = arr[0] if arr else {}
+    return _parse_exif_tags(arr[0] if arr else {})
+
+
+def _source_key(path):
+    """Comparable form of a path and of exiftool's SourceFile (which uses / on Windows)."""
+    return os.path.normcase(os.path.normpath(str(path)))
+
+
+def exiftool_batch(paths, session):
+    """
+    exiftool_extract() for many files with one request to `session`.
+    Returns {path: data}; tag dicts are matched back by SourceFile, since
+    files exiftool cannot read are left out of its output.
+    """
+    if not paths:
+        return {}
+    try:
+        arr = session.run(*paths)
+    except FileNotFoundError:
+        return dict.fromkeys(paths, {"error": "exiftool not found on PATH"})
+    except Exception:
+        # e.g. MemoryError on a huge batch, or exiftool died: go file by file
+        return {p: exiftool_extract(p, session) for p in paths}
+
+    by_source = {_source_key(t.get("SourceFile", "")): t for t in arr}
+    data = {}
+    for p in paths:
+        tagmap = by_source.get(_source_key(p))
+        data[p] = _parse_exif_tags(tagmap) if tagmap else {"error": "exiftool error: no output"}
+    return data
+
+
+def _parse_exif_tags(tagmap):
+    """Report fields from one exiftool -j tag dict."""
     data = {}
 
     # Datetime
@@ -168,25 +330,76 @@ def exiftool_extract(path):
     return data
 
 
+# Report fields; with --fast, a complete MediaInfo result skips the other tools
+_REQUIRED_FIELDS = frozenset({"capture_datetime", "duration_sec", "width", "height", "codec", "camera_model"})
+_SKIPPED = {"error": "skipped (mediainfo complete)"}
+
+
+def process_one(path, fast=False):
+    """
+    Runs pymediainfo and ffprobe on one file; returns (mediainfo, ffprobe) dicts.
+    exiftool runs separately, on whole batches (exiftool_batch).
+    """
+    mi = media_info_extract(path)
+    if fast and _REQUIRED_FIELDS.issubset(mi):
+        return mi, _SKIPPED
+    return mi, ffprobe_extract(path)
+
+
+# Video extensions to check
+VIDEO_EXTS = frozenset({
+    ".mp4", ".mov", ".m4v", ".avi", ".mts", ".m2ts",
+    ".3gp", ".mpg", ".mpeg", ".mkv", ".flv", ".wmv", ".webm"
+})
+
+
+def _is_video_name(name):
+    """Extension check on the bare file name (no Path built for rejected files)."""
+    dot = name.rfind(".")
+    # dot > 0: a leading-dot name like ".mp4" has no extension (as in splitext)
+    return dot > 0 and name[dot:].lower() in VIDEO_EXTS
+
+
+# CSV rows handed to writer.writerows() at a time (three per file)
+_ROW_BLOCK = 3000
+# Files per exiftool request (one -execute for the whole batch)
+_EXIF_BATCH = 256
+
+
+def _walk(root):
+    """
+    Yield the DirEntry of every regular file under root.
+    is_dir()/is_file() answer from the d_type readdir already returned,
+    so no stat() per entry (unlike Path.rglob + Path.is_file).
+    """
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _walk(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+    except OSError:
+        pass  # unreadable directory: skip it rather than abort the report
+
+
 def main():
-    sample_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(".")
-    out_csv = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("video_metadata_report.csv")
+    args = sys.argv[1:]
+    fast = "--fast" in args
+    args = [a for a in args if a != "--fast"]
+    sample_dir = Path(args[0]) if len(args) > 0 else Path(".")
+    out_csv = Path(args[1]) if len(args) > 1 else Path("video_metadata_report.csv")
 
     if not sample_dir.is_dir():
         print(f"Error: {sample_dir} is not a directory", file=sys.stderr)
         sys.exit(1)
 
-    # Video extensions to check
-    video_exts = {
-        ".mp4", ".mov", ".m4v", ".avi", ".mts", ".m2ts",
-        ".3gp", ".mpg", ".mpeg", ".mkv", ".flv", ".wmv", ".webm"
-    }
-
     print(f"Scanning {sample_dir} for video files...")
-    files = [p for p in sample_dir.rglob("*") if p.is_file() and p.suffix.lower() in video_exts]
+    files = [Path(e.path) for e in _walk(sample_dir) if _is_video_name(e.name)]
     print(f"Found {len(files)} video files")
 
-    with out_csv.open("w", newline="", encoding="utf-8") as f:
+    # Large write buffer: rows go out in big blocks, not a write per row
+    with out_csv.open("w", newline="", encoding="utf-8", buffering=1 << 20) as f:
         writer = csv.writer(f)
         writer.writerow([
             "file",
@@ -200,53 +413,53 @@ def main():
             "notes",
         ])
 
-        for i, p in enumerate(sorted(files)):
-            rel_path = p.relative_to(sample_dir)
-            print(f"[{i+1}/{len(files)}] Processing {rel_path}...", end=" ", flush=True)
-
-            # MediaInfo
-            mi_data = media_info_extract(p)
-            writer.writerow([
-                str(rel_path),
-                "mediainfo",
-                mi_data.get("capture_datetime"),
-                mi_data.get("duration_sec"),
-                mi_data.get("width"),
-                mi_data.get("height"),
-                mi_data.get("codec"),
-                mi_data.get("camera_model"),
-                mi_data.get("error", ""),
-            ])
-
-            # ffprobe
-            ff_data = ffprobe_extract(p)
-            writer.writerow([
-                str(rel_path),
-                "ffprobe",
-                ff_data.get("capture_datetime"),
-                ff_data.get("duration_sec"),
-                ff_data.get("width"),
-                ff_data.get("height"),
-                ff_data.get("codec"),
-                ff_data.get("camera_model"),
-                ff_data.get("error", ""),
-            ])
-
-            # exiftool
-            ex_data = exiftool_extract(p)
-            writer.writerow([
-                str(rel_path),
-                "exiftool",
-                ex_data.get("capture_datetime"),
-                ex_data.get("duration_sec"),
-                ex_data.get("width"),
-                ex_data.get("height"),
-                ex_data.get("codec"),
-                ex_data.get("camera_model"),
-                ex_data.get("error", ""),
-            ])
-
-            print("✓")
+        files = sorted(files)
+        # Each file is mostly waiting on ffprobe and libmediainfo (ctypes
+        # releases the GIL), so threads run files in parallel; map() keeps
+        # results in order and the CSV on this thread. exiftool reads each
+        # batch of files in one request, alongside the other tools.
+        exiftool = ExifToolSession()
+        # Rows go to the writer in blocks of _ROW_BLOCK rather than per file
+        rows = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as pool:
+            for start in range(0, len(files), _EXIF_BATCH):
+                batch = files[start:start + _EXIF_BATCH]
+                if not fast:
+                    exif_future = pool.submit(exiftool_batch, batch, exiftool)
+                results = list(pool.map(lambda p: process_one(p, fast), batch))
+                if fast:
+                    # Only files MediaInfo could not fully describe need exiftool
+                    need_exif = [p for p, (_, ff) in zip(batch, results) if ff is not _SKIPPED]
+                    exif = exiftool_batch(need_exif, exiftool)
+                else:
+                    exif = exif_future.result()
+
+                for p, (mi, ff) in zip(batch, results):
+                    rel_path = p.relative_to(sample_dir)
+                    tool_data = (mi, ff, exif.get(p, _SKIPPED))
+                    rows.extend(
+                        [
+                            str(rel_path),
+                            tool,
+                            data.get("capture_datetime"),
+                            data.get("duration_sec"),
+                            data.get("width"),
+                            data.get("height"),
+                            data.get("codec"),
+                            data.get("camera_model"),
+                            data.get("error", ""),
+                        ]
+                        for tool, data in zip(("mediainfo", "ffprobe", "exiftool"), tool_data)
+                    )
+                    if len(rows) >= _ROW_BLOCK:
+                        writer.writerows(rows)
+                        rows.clear()
+                    done += 1
+                    # One progress line per finished file, without forcing a flush
+                    print(f"[{done}/{len(files)}] {rel_path} ✓")
+        writer.writerows(rows)
+        exiftool.close()
 
     print(f"\nReport written to {out_csv}")
 
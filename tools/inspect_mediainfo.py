@@ -34,6 +34,15 @@ def inspect_file(video_path):
         print(f"Error parsing: {e}")
         sys.exit(1)
 
+    # One pass over the tracks: (type, sorted non-empty fields) from
+    # Track.to_data(), shared by both dumps; dir()/getattr on a Track
+    # resolves every name through __getattribute__.
+    track_data = [
+        (track.track_type, [(attr, val) for attr, val in sorted(track.to_data().items())
+                            if val is not None and val != ""])
+        for track in mi.tracks
+    ]
+
     # First, show camera-related fields if any
     print("="*70)
     print("CAMERA-RELATED FIELDS (if present)")
@@ -43,14 +52,11 @@ def inspect_file(video_path):
         'product', 'device', 'equipment_model', 'host_computer'
     }
     found_any = False
-    for track in mi.tracks:
-        attrs = [attr for attr in dir(track) if not attr.startswith('_') and not callable(getattr(track, attr))]
-        for attr in attrs:
-            if any(kw in attr.lower() for kw in camera_keywords):
-                val = getattr(track, attr, None)
-                if val is not None and val != "":
-                    print(f"  [{track.track_type}] {attr}: {val}")
-                    found_any = True
+    for track_type, fields in track_data:
+        for attr, val in fields:
+            if any(kw in attr for kw in camera_keywords):
+                print(f"  [{track_type}] {attr}: {val}")
+                found_any = True
     if not found_any:
         print("  (no camera-related metadata found)")
 
@@ -58,21 +64,16 @@ def inspect_file(video_path):
     print("ALL METADATA BY TRACK")
     print("="*70)
 
-    for i, track in enumerate(mi.tracks):
-        print(f"\nTrack {i}: {track.track_type}")
+    for i, (track_type, fields) in enumerate(track_data):
+        print(f"\nTrack {i}: {track_type}")
         print("-" * 70)
         
-        # Get all attributes, excluding private ones and methods
-        attrs = [attr for attr in dir(track) if not attr.startswith('_') and not callable(getattr(track, attr))]
-        
-        for attr in sorted(attrs):
-            val = getattr(track, attr, None)
-            if val is not None and val != "":
-                # Truncate long values for readability
-                val_str = str(val)
-                if len(val_str) > 60:
-                    val_str = val_str[:57] + "..."
-                print(f"  {attr}: {val_str}")
+        for attr, val in fields:
+            # Truncate long values for readability
+            val_str = str(val)
+            if len(val_str) > 60:
+                val_str = val_str[:57] + "..."
+            print(f"  {attr}: {val_str}")
 
 
 if __name__ == "__main__":